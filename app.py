@@ -6,15 +6,31 @@
 
 """Un juego como el Boggle para jugar en grupo via Telegram."""
 
+import asyncio
+import functools
+import multiprocessing
+import os
 import sys
+import time
+import types
 
 import infoauth  # fades
-from telegram import Update, MessageEntity, ParseMode  # fades python-telegram-bot
-from telegram.ext import Updater, CommandHandler, MessageHandler, Filters, CallbackContext
-
-from botggle.board import Board
-from botggle.game import Game, NotActiveError
-from botggle.messages import get_user_round_result
+from telegram import Chat, Update, User, MessageEntity  # fades python-telegram-bot[job-queue]>=20
+from telegram.constants import ParseMode
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
+
+from botggle.game import Game, NotActiveError, rae_words
+from botggle.generation import BoardQuality, generate_board
+from botggle.history import HistoryStore
+from botggle.languages import DEFAULT_LANGUAGE, LANGUAGES, available_languages, get_language
+from botggle.metrics import Registry
+from botggle.outbound import Outbox
+from botggle.pool import BoardPool
+from botggle.scheduler import RoundScheduler
+from botggle.messages import (
+    get_missed_words_result, get_ranking_result, get_user_round_result)
+from botggle.sharding import LoopJobQueue, PlayerIndex, QueueOutbox, ShardRouter, shard_for
+from botggle.storage import GameStore
 
 # duración de la ronda (en segundos)
 ROUND_TIMEUP = 2 * 60
@@ -22,26 +38,165 @@ ROUND_TIMEUP = 2 * 60
 # duración del juego en puntos
 SCORES_GAME_LIMIT = 50
 
+# calidad mínima de los tableros que se juegan (se descartan los que tienen menos palabras),
+# para cada tamaño de tablero soportado
+BOARD_QUALITY_BY_SIZE = {
+    4: BoardQuality(min_words=30),
+    5: BoardQuality(min_words=80),
+    6: BoardQuality(min_words=150),
+}
+
+# métricas (en formato Prometheus); si no se indica el puerto quedan deshabilitadas
+METRICS_PORT = int(os.environ.get("BOTGGLE_METRICS_PORT", 0))
+METRICS = Registry()
+HANDLER_SECONDS = METRICS.histogram(
+    "botggle_handler_seconds", "Cuánto tarda cada handler", labelnames=("handler",))
+EVALUATE_SECONDS = METRICS.histogram(
+    "botggle_evaluate_words_seconds", "Cuánto tarda evaluar las palabras de una ronda")
+BOARD_GENERATION_SECONDS = METRICS.histogram(
+    "botggle_board_generation_seconds", "Cuánto tarda generar un tablero",
+    labelnames=("language", "size"))
+WORDS_INGESTED = METRICS.counter(
+    "botggle_words", "Palabras nuevas recibidas de les jugadores")
+WORD_LOOKUPS = METRICS.counter(
+    "botggle_word_lookups", "Palabras a clasificar, según si ya estaban clasificadas en la ronda",
+    labelnames=("result",))
+
+
+def _generate_board(language, size):
+    """Genera un tablero de la calidad que corresponde a su tamaño, midiendo cuánto tarda."""
+    with METRICS.time(BOARD_GENERATION_SECONDS.labels(language=language.name, size=size)):
+        return generate_board(BOARD_QUALITY_BY_SIZE[size], size=size, language=language)
+
+
+# cuántos tableros se tienen listos de cada tamaño
+BOARD_POOL_SIZES = {4: 20, 5: 5, 6: 5}
+
+
+def _new_board_pools(language):
+    """Los pools de tableros del idioma, para cada tamaño que tiene dados."""
+    return {
+        size: BoardPool(functools.partial(_generate_board, language, size), size=pool_size)
+        for size, pool_size in BOARD_POOL_SIZES.items() if size in language.dices_by_size}
+
+
+# tableros ya generados y resueltos, para que arrancar la ronda no tenga que esperar; los del
+# idioma default se generan desde el arranque, los de otros desde la primera vez que se juega
+BOARD_POOL_BY_SIZE = _new_board_pools(get_language(DEFAULT_LANGUAGE))
+BOARD_POOLS_BY_LANGUAGE = {DEFAULT_LANGUAGE: BOARD_POOL_BY_SIZE}
+
+
+def get_board_pool(language, size):
+    """El pool de tableros del idioma y tamaño, arrancándolo si es la primera vez."""
+    board_pools = BOARD_POOLS_BY_LANGUAGE.get(language.name)
+    if board_pools is None:
+        board_pools = BOARD_POOLS_BY_LANGUAGE[language.name] = _new_board_pools(language)
+        for board_pool in board_pools.values():
+            board_pool.start()
+    return board_pools[size]
+
+
 # relaciona el username al player
 PLAYER_BY_USERNAME = {}
 
 # relaciona el chat al Game
 GAME_BY_CHAT = {}
 
+# los juegos que están buscando el tablero para arrancar la ronda (todes ya dijeron listo)
+STARTING_GAMES = set()
+
+METRICS.gauge(
+    "botggle_active_games", "Juegos en curso", function=lambda: len(GAME_BY_CHAT))
+METRICS.gauge(
+    "botggle_active_players", "Jugadores en juegos en curso",
+    function=lambda: len(PLAYER_BY_USERNAME))
+
+# todos los mensajes salen por acá, respetando los límites de Telegram; al cerrar el bot se
+# espera (hasta este tiempo, en segundos) a que salga lo que quedó en la cola
+OUTBOX = Outbox()
+OUTBOX_FLUSH_TIMEOUT = 10
+
+# dónde se guardan los juegos en curso (para sobrevivir a un reinicio), y cada cuánto se
+# escriben las palabras que van llegando (en segundos)
+GAME_STATE_PATH = "botggle_state.sqlite"
+GAME_STATE_FLUSH_INTERVAL = 1
+STORE = None
+
+# dónde queda la historia de las rondas terminadas (para los rankings); se escribe junto con
+# las palabras, pero desde otro hilo
+HISTORY_PATH = "botggle_history.sqlite"
+HISTORY = None
+
+# en qué juego está cada jugadore (compartido entre procesos si los juegos se reparten)
+PLAYER_INDEX = PlayerIndex()
 
-def start(update: Update, context: CallbackContext) -> None:
+# si los juegos se reparten entre varios procesos, el que los reparte (en el de entrada), y
+# el que corre los trabajos periódicos (en cada hijo)
+ROUTER = None
+JOB_QUEUE = None
+
+# el que maneja el fin de la ronda de todos los juegos (se arma una vez que está el loop)
+SCHEDULER = None
+METRICS.gauge(
+    "botggle_round_timers", "Rondas en curso esperando que se termine el tiempo",
+    function=lambda: 0 if SCHEDULER is None else len(SCHEDULER))
+
+
+def _log_failure(chat_id, future):
+    """Avisa si un mensaje no se pudo mandar (ni siquiera reintentando)."""
+    if not future.cancelled() and future.exception() is not None:
+        print(f"ERROR mandando mensaje a {chat_id}: {future.exception()!r}")
+
+
+def send(chat, text, **kwargs):
+    """Encola un mensaje para un chat (o usuario); sale cuando lo permitan los límites."""
+    future = OUTBOX.send(chat.id, text, **kwargs)
+    future.add_done_callback(functools.partial(_log_failure, chat.id))
+
+
+def reply(update, text, **kwargs):
+    """Encola una respuesta en el chat de donde vino el mensaje."""
+    send(update.effective_chat, text, **kwargs)
+
+
+def persist(game, deadline=None):
+    """Guarda el estado del juego, si hay dónde."""
+    if STORE is not None:
+        chat = game.chat
+        STORE.save_game(chat.id, game, deadline, chat_type=chat.type, chat_title=chat.title)
+
+
+def broadcast(chats, text):
+    """Manda el mismo mensaje a varios chats (el outbox los despacha en paralelo)."""
+    for chat in chats:
+        send(chat, text)
+
+
+def finish_game(game):
+    """Saca al juego (y a sus jugadores) de las globales y de lo guardado."""
+    SCHEDULER.cancel(game)
+    if STORE is not None:
+        STORE.delete_game(game.chat.id)
+    del GAME_BY_CHAT[game.chat]
+    for player in game.players:
+        del PLAYER_BY_USERNAME[player.username]
+    PLAYER_INDEX.release([player.username for player in game.players])
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /start is issued."""
     user = update.effective_user
     print(f"Bot invited to some chat by {user.username} ({user.full_name!r})")
-    update.message.reply_text(f'Gracias {user.full_name} por invitarme a jugar :)')
+    reply(update, f'Gracias {user.full_name} por invitarme a jugar :)')
 
 
-def help_command(update: Update, context: CallbackContext) -> None:
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /help is issued."""
-    update.message.reply_text('Help!')
+    reply(update, 'Help!')
 
 
-def game_words(update: Update, context: CallbackContext) -> None:
+@METRICS.timed(HANDLER_SECONDS.labels(handler="game_words"))
+async def game_words(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Recibe las palabras de cada player."""
     username = update.effective_user.username
     text = update.message.text
@@ -52,12 +207,17 @@ def game_words(update: Update, context: CallbackContext) -> None:
         return
 
     try:
-        player.game.add_text(username, text)
+        added = player.game.add_text(username, text)
     except NotActiveError:
-        player.chat.send_message(f"La palabra {text!r} llegó tarde")
+        send(player.chat, f"La palabra {text!r} llegó tarde")
+        return
+    WORDS_INGESTED.inc(len(added))
+    if STORE is not None:
+        STORE.add_words(player.game.chat.id, username, added)
 
 
-def start_command(update: Update, context: CallbackContext) -> None:
+@METRICS.timed(HANDLER_SECONDS.labels(handler="start_command"))
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Start the game."""
     entities = update.message.parse_entities()
     usernames = []
@@ -69,78 +229,153 @@ def start_command(update: Update, context: CallbackContext) -> None:
     usernames.append(update.effective_user.username)
     print("====== usernames", usernames)
 
+    # el tamaño del tablero y el idioma se pueden pasar como argumentos (ej: "/comienzo 5 en
+    # @fulane")
+    board_size = 4
+    language = get_language()
+    for arg in context.args or []:
+        if arg.isdigit():
+            board_size = int(arg)
+        elif arg.lower() in LANGUAGES:
+            language = LANGUAGES[arg.lower()]
+    if not language.is_available():
+        names = ", ".join(language.name for language in available_languages())
+        reply(update, f"ERROR: no está el diccionario en {language.title}; hay en: {names}")
+        return
+    sizes = [size for size in BOARD_POOL_SIZES if size in language.dices_by_size]
+    if board_size not in sizes:
+        sizes = ", ".join(map(str, sizes))
+        reply(
+            update,
+            f"ERROR: el tamaño del tablero en {language.title} tiene que ser uno de: {sizes}")
+        return
+
     chat = update.effective_chat
     if chat in GAME_BY_CHAT:
-        update.message.reply_text(
+        reply(
+            update,
             "ERROR: ya hay un juego creado en este chat; hacer /terminar para cancelar el viejo")
         return
 
-    usernames_of_all_games = set()
-    for game in GAME_BY_CHAT.values():
-        usernames_of_all_games.update(p.username for p in game.players)
-    in_other_games = set(usernames) & usernames_of_all_games
+    in_other_games = PLAYER_INDEX.claim(usernames, chat.id)
     if in_other_games:
-        update.message.reply_text(
+        reply(
+            update,
             f"ERROR: estes jugadores ya están en otro juego en otro chat: {in_other_games}")
         return
 
-    game = Game(chat)
+    game = Game(chat, board_size=board_size, language=language)
     GAME_BY_CHAT[chat] = game
     for username in usernames:
         player = game.add_player(username)
         PLAYER_BY_USERNAME[username] = player
 
-    print(f"Nuevo juego creado para el chat {chat.title!r} con los jugadores {usernames}.")
+    persist(game)
+
+    print(
+        f"Nuevo juego creado para el chat {chat.title!r} con los jugadores {usernames} "
+        f"(en {language.title}).")
     print("======= full scores", game.full_scores)
-    update.message.reply_text(
+    reply(
+        update,
         "Juego arrancado, esperando que los jugadores digan /listo **por privado**.",
         parse_mode=ParseMode.MARKDOWN)
 
 
-def time_up(context):
+def evaluate_words(game):
+    """Evalúa las palabras de la ronda, midiendo cuánto tarda."""
+    with METRICS.time(EVALUATE_SECONDS):
+        return game.evaluate_words()
+
+
+@METRICS.timed(HANDLER_SECONDS.labels(handler="time_up"))
+async def time_up(game: Game) -> None:
     """Se acabó el tiempo de la ronda."""
-    print("===== time up", context)
-    payload = context.job.context
-    game = payload['game']
+    print("===== time up", game.chat)
+    if GAME_BY_CHAT.get(game.chat) is not game:
+        # el juego se terminó con /terminar justo cuando se acababa el tiempo
+        return
     game.stop_round()
 
-    # avisamos a todes por privado que listo
-    for player in game.players:
-        player.chat.send_message("Se acabó el tiempo")
-
-    # avisamos en el público que terminó la ronda
-    game.chat.send_message("¡Se terminó la ronda!")
+    # avisamos a todes por privado y en el público que terminó la ronda, y evaluamos las
+    # palabras fuera del loop (para no trabar a los otros juegos)
+    broadcast([player.chat for player in game.players], "Se acabó el tiempo")
+    send(game.chat, "¡Se terminó la ronda!")
+    user_words = await asyncio.to_thread(evaluate_words, game)
+    print("======= outbox", OUTBOX.stats())
+    WORD_LOOKUPS.labels(result="hit").inc(game.lookup_counts["hits"])
+    WORD_LOOKUPS.labels(result="miss").inc(game.lookup_counts["misses"])
 
     # mostrar resumen de cómo va el partido
-    user_words = game.evaluate_words()
     round_scores = game.summarize_scores(user_words)
+    if HISTORY is not None:
+        HISTORY.record_round(
+            game.chat.id, game.board.distribution, user_words, round_scores,
+            word_score=game.language.word_score)
 
     round_text_result = ["Como le fue a cada une:"]
     for username, resultwords in sorted(user_words.items()):
-        text_result = get_user_round_result(resultwords)
+        text_result = get_user_round_result(resultwords, word_score=game.language.word_score)
         round_text_result.append(f"- {username}: {text_result}")
-    game.chat.send_message("\n".join(round_text_result))
+    send(game.chat, "\n".join(round_text_result))
+
+    # las que nadie encontró salen de la solución del tablero (ya calculada al generarlo, salvo
+    # en tableros restaurados), así que no demoran el resultado de la ronda
+    missed_words = await asyncio.to_thread(game.missed_words)
+    send(game.chat, get_missed_words_result(missed_words, word_score=game.language.word_score))
 
-    game.chat.send_message(f"Progreso del juego: {round_scores} {game.full_scores}")
+    send(game.chat, f"Progreso del juego: {round_scores} {game.full_scores}")
 
     # avanzamos el juego
     if max(game.full_scores.values(), default=0) < SCORES_GAME_LIMIT:
-        for player in game.players:
-            player.chat.send_message("Ya podemos arrancar la próxima ronda, escribí /listo")
         game.next_round()
+        persist(game)
+        broadcast(
+            [player.chat for player in game.players],
+            "Ya podemos arrancar la próxima ronda, escribí /listo")
         return
 
     max_score = max(game.full_scores.values())
     winners = [username for username, score in game.full_scores.items() if score == max_score]
-    game.chat.send_message(f"Juego terminado!! Ganó {winners}")
+    send(game.chat, f"Juego terminado!! Ganó {winners}")
+    finish_game(game)
 
-    # limpiamos las globales
-    del GAME_BY_CHAT[game.chat]
-    for player in game.players:
-        del PLAYER_BY_USERNAME[player.username]
 
+@METRICS.timed(HANDLER_SECONDS.labels(handler="end_command"))
+async def end_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Soporte para comando /terminar, que cancela el juego del chat."""
+    game = GAME_BY_CHAT.get(update.effective_chat)
+    if game is None:
+        reply(update, "No hay un juego en este chat")
+        return
+
+    username = update.effective_user.username
+    if username not in game.full_scores:
+        reply(update, "Sólo puede terminar el juego alguien que esté jugando")
+        return
+    if game.state == Game.State.STOPPED:
+        reply(update, "La ronda se está cerrando, probá de nuevo en un ratito")
+        return
+
+    print(f"El usuario {username} terminó el juego del chat {game.chat.title!r}")
+    finish_game(game)
+    reply(update, f"Juego terminado por {username}. Puntajes: {game.full_scores}")
+    if game.state == Game.State.ACTIVE:
+        broadcast([player.chat for player in game.players], "Se canceló el juego")
 
-def ready_command(update: Update, context: CallbackContext) -> None:
+
+@METRICS.timed(HANDLER_SECONDS.labels(handler="ranking_command"))
+async def ranking_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Soporte para comando /ranking, que muestra les que más puntos hicieron en el chat."""
+    if HISTORY is None:
+        reply(update, "No se está guardando la historia de las rondas")
+        return
+    ranking = await asyncio.to_thread(HISTORY.ranking, update.effective_chat.id)
+    reply(update, get_ranking_result(ranking))
+
+
+@METRICS.timed(HANDLER_SECONDS.labels(handler="ready_command"))
+async def ready_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Soporte para comando /listo."""
     username = update.effective_user.username
     print(f"El usuario {username} dijo listo")
@@ -149,63 +384,252 @@ def ready_command(update: Update, context: CallbackContext) -> None:
     try:
         player = PLAYER_BY_USERNAME[username]
     except KeyError:
-        update.message.reply_text("No hay un juego activo o no te invitaron :(")
+        reply(update, "No hay un juego activo o no te invitaron :(")
+        return
+    game = player.game
+    if game in STARTING_GAMES:
+        reply(update, "La ronda ya está arrancando")
+        return
+    if game.state != Game.State.WAITING:
+        remaining = SCHEDULER.remaining(game)
+        if remaining is None:
+            reply(update, "La ronda se está cerrando, ya casi se puede arrancar la próxima")
+        else:
+            reply(update, f"La ronda ya está en curso, quedan {remaining:.0f} segundos")
         return
     player.ready = True
     player.chat = update.effective_user
-    update.message.reply_text("Ok")
+    reply(update, "Ok")
 
     # revisamos si tenemos que esperar a más jugadores
-    game = player.game
     remaining = [p.username for p in game.players if not p.ready]
 
     if remaining:
-        game.chat.send_message(f"{username} dijo ready, estamos esperando a {remaining}")
+        persist(game)
+        send(game.chat, f"{username} dijo ready, estamos esperando a {remaining}")
         return
 
-    # arrancamos! avisamos, creamos un nuevo tablero para la ronda y se lo pasamos a game
-    game.chat.send_message(f"{username} dijo ready, todes listes, ¡arrancamos!")
-    board = Board()
+    # arrancamos! avisamos, creamos un nuevo tablero para la ronda y se lo pasamos a game; si el
+    # pool está vacío el tablero se genera en el momento, así que lo hacemos fuera del loop (y
+    # mientras tanto el juego queda marcado, para que otro /listo no lo arranque de nuevo)
+    send(game.chat, f"{username} dijo ready, todes listes, ¡arrancamos!")
+    board_pool = get_board_pool(game.language, game.board_size)
+    STARTING_GAMES.add(game)
+    try:
+        board = await asyncio.to_thread(board_pool.get)
+    finally:
+        STARTING_GAMES.discard(game)
+    print("======= board pool", game.board_size, board_pool.stats())
+    if GAME_BY_CHAT.get(game.chat) is not game:
+        # mientras se buscaba el tablero terminaron el juego con /terminar
+        return
     game.start_round(board)
+    persist(game, deadline=time.time() + ROUND_TIMEUP)
 
-    # creamos un tablero y lo mandamos al público y a todes les jugadores
+    # mandamos el tablero al público y a todes les jugadores, todo a la vez
     renderized = board.render()
-    game.chat.send_message(renderized)
-    for player in game.players:
-        player.chat.send_message(renderized)
-
-    context.job_queue.run_once(time_up, ROUND_TIMEUP, context={'game': game})
-
-
-def main(token: str) -> None:
-    """Start the bot."""
-    # Create the Updater and pass it your bot's token.
-    updater = Updater(token)
-
-    # Get the dispatcher to register handlers
-    dispatcher = updater.dispatcher
+    broadcast([game.chat] + [player.chat for player in game.players], renderized)
+
+    SCHEDULER.schedule(game, ROUND_TIMEUP)
+
+
+async def flush_state(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Escribe de una vez todas las palabras (y rondas terminadas) desde la última vez."""
+    STORE.flush()
+    await asyncio.to_thread(HISTORY.flush)
+
+
+async def restore_games(shard=None, shards=1) -> None:
+    """Recupera los juegos guardados, reprogramando el fin de las rondas que estaban en curso.
+
+    Si los juegos están repartidos entre procesos, sólo se recuperan los del `shard` indicado.
+    """
+    for snapshot in STORE.load_games():
+        if shard is not None and shard_for(snapshot.chat_id, shards) != shard:
+            continue
+        chat = Chat(snapshot.chat_id, snapshot.chat_type, title=snapshot.chat_title)
+        try:
+            game = snapshot.restore(chat)
+        except ValueError as err:
+            # ej: el juego era en un idioma que ya no está
+            print(f"No se pudo recuperar el juego del chat {chat.title!r}: {err}")
+            continue
+        if game.state == Game.State.ACTIVE:
+            # como con los tableros del pool, la solución se calcula antes y fuera del loop
+            await asyncio.to_thread(game.board.solve, game.language.words)
+        GAME_BY_CHAT[chat] = game
+        PLAYER_INDEX.claim([player.username for player in game.players], chat.id)
+        for player, player_snapshot in zip(game.players, snapshot.players):
+            PLAYER_BY_USERNAME[player.username] = player
+            if player_snapshot.user_id is not None:
+                player.chat = User(
+                    player_snapshot.user_id, player.username, is_bot=False,
+                    username=player.username)
+
+        if game.state == Game.State.ACTIVE:
+            SCHEDULER.schedule(game, (snapshot.deadline or 0) - time.time())
+        print(f"Juego recuperado para el chat {chat.title!r} ({game.state.name})")
+
+
+# los handlers que, si los juegos se reparten entre procesos, corren en el proceso del juego
+ROUTED_HANDLERS = {
+    "comienzo": start_command,
+    "terminar": end_command,
+    "ranking": ranking_command,
+    "listo": ready_command,
+    "palabras": game_words,
+}
+
+
+def route(name):
+    """Arma el handler del proceso de entrada, que pasa el mensaje al proceso del juego."""
+    async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if name in ("comienzo", "terminar", "ranking"):
+            chat_id = update.effective_chat.id
+        else:
+            # lo que llega por privado va al proceso del juego en el que está le jugadore
+            chat_id = (
+                PLAYER_INDEX.chat_for(update.effective_user.username)
+                or update.effective_chat.id)
+        ROUTER.route(chat_id, (name, update, context.args))
+    return handler
+
+
+async def setup_shard(shard: int, outbound) -> None:
+    """Prepara un proceso hijo para manejar los juegos que le tocan."""
+    global OUTBOX, STORE, HISTORY, JOB_QUEUE, SCHEDULER
+    OUTBOX = QueueOutbox(outbound)
+    JOB_QUEUE = LoopJobQueue()
+    SCHEDULER = RoundScheduler(time_up)
+    SCHEDULER.start()
+    for board_pool in BOARD_POOL_BY_SIZE.values():
+        board_pool.start()
+    STORE = GameStore(GAME_STATE_PATH)
+    HISTORY = HistoryStore(HISTORY_PATH)
+    if METRICS_PORT:
+        # cada proceso hijo expone sus métricas en el puerto siguiente al del anterior
+        METRICS.serve(METRICS_PORT + 1 + shard)
+    await restore_games(shard=shard, shards=ROUTER.shards)
+    JOB_QUEUE.run_repeating(flush_state, GAME_STATE_FLUSH_INTERVAL)
+
+
+async def teardown_shard(shard: int) -> None:
+    """Cierra un proceso hijo: frena las rondas y los pools, y escribe todo lo pendiente."""
+    await JOB_QUEUE.stop()
+    await SCHEDULER.stop()
+    for board_pool in BOARD_POOL_BY_SIZE.values():
+        await asyncio.to_thread(board_pool.stop)
+    STORE.close()
+    HISTORY.close()
+
+
+async def handle_routed(message) -> None:
+    """Corre, en el proceso hijo, el handler de un mensaje que le pasó el de entrada."""
+    name, update, args = message
+    context = types.SimpleNamespace(args=args)
+    await ROUTED_HANDLERS[name](update, context)
+
+
+async def forward_outbound() -> None:
+    """Manda (por el outbox) lo que quieren mandar los procesos hijos."""
+    while True:
+        item = await asyncio.to_thread(ROUTER.outbound.get)
+        if item is None:
+            return
+        chat_id, text, kwargs = item
+        future = OUTBOX.send(chat_id, text, **kwargs)
+        future.add_done_callback(functools.partial(_log_failure, chat_id))
+
+
+async def post_init(application: Application) -> None:
+    """Arranca la cola de salida, el fin de las rondas y recupera los juegos (ya con el loop)."""
+    global SCHEDULER
+    OUTBOX.start(application.bot)
+    if ROUTER is not None:
+        # los juegos (y sus rondas) están en los procesos hijos
+        application.bot_data["forwarder"] = asyncio.create_task(forward_outbound())
+        return
+    SCHEDULER = RoundScheduler(time_up)
+    SCHEDULER.start()
+    if STORE is not None:
+        await restore_games()
+        application.job_queue.run_repeating(flush_state, GAME_STATE_FLUSH_INTERVAL)
+
+
+async def post_shutdown(application: Application) -> None:
+    """Frena los procesos hijos (si hay), las rondas, la cola de salida y cierra la base."""
+    if ROUTER is not None:
+        await asyncio.to_thread(ROUTER.stop)
+        ROUTER.outbound.put(None)
+        await application.bot_data["forwarder"]
+    if SCHEDULER is not None:
+        await SCHEDULER.stop()
+    try:
+        await asyncio.wait_for(OUTBOX.flush(), OUTBOX_FLUSH_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"WARNING: se cierra con {OUTBOX.stats()['queued']} mensajes sin mandar")
+    await OUTBOX.stop()
+    if STORE is not None:
+        STORE.close()
+    if HISTORY is not None:
+        HISTORY.close()
+
+
+def main(token: str, shards: int = 0) -> None:
+    """Start the bot.
+
+    Con `shards` se reparten los juegos entre esa cantidad de procesos hijos.
+    """
+    global STORE, HISTORY, PLAYER_INDEX, ROUTER
+    if shards:
+        # el índice de jugadores lo comparten todos; el diccionario se carga antes de
+        # arrancar los procesos, para que lo compartan en lugar de cargarlo cada uno
+        PLAYER_INDEX = PlayerIndex.shared(multiprocessing.Manager())
+        rae_words.get()
+        ROUTER = ShardRouter(shards, setup_shard, handle_routed, teardown_shard)
+        ROUTER.start()
+    else:
+        STORE = GameStore(GAME_STATE_PATH)
+        HISTORY = HistoryStore(HISTORY_PATH)
+
+    # Create the Application and pass it your bot's token.
+    application = (
+        Application.builder().token(token).post_init(post_init).post_shutdown(post_shutdown)
+        .build())
 
     # on different commands - answer in Telegram
-    dispatcher.add_handler(CommandHandler("start", start))
-    dispatcher.add_handler(CommandHandler("help", help_command))
-    dispatcher.add_handler(CommandHandler("comienzo", start_command))
-    dispatcher.add_handler(CommandHandler("listo", ready_command))
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("help", help_command))
+    if ROUTER is None:
+        handlers = ROUTED_HANDLERS
+    else:
+        handlers = {name: route(name) for name in ROUTED_HANDLERS}
+    application.add_handler(CommandHandler("comienzo", handlers["comienzo"]))
+    application.add_handler(CommandHandler("terminar", handlers["terminar"]))
+    application.add_handler(CommandHandler("listo", handlers["listo"]))
+    application.add_handler(CommandHandler("ranking", handlers["ranking"]))
 
     # para todas las palabras que tira un jugador por privado
-    dispatcher.add_handler(MessageHandler(Filters.text & ~Filters.command, game_words))
+    application.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND, handlers["palabras"]))
+
+    # empezamos a generar tableros en segundo plano (si hay procesos hijos, cada uno los suyos)
+    if ROUTER is None:
+        for board_pool in BOARD_POOL_BY_SIZE.values():
+            board_pool.start()
 
-    # Start the Bot
-    updater.start_polling()
+    if METRICS_PORT:
+        METRICS.serve(METRICS_PORT)
+        print(f"Métricas en http://127.0.0.1:{METRICS_PORT}/metrics")
 
-    # Run the bot until you press Ctrl-C or the process receives SIGINT,
-    # SIGTERM or SIGABRT. This should be used most of the time, since
-    # start_polling() is non-blocking and will stop the bot gracefully.
+    # Run the bot until you press Ctrl-C or the process receives SIGINT, SIGTERM or SIGABRT
     print("Bot conectado, esperando para jugar.")
-    updater.idle()
+    application.run_polling()
 
 
 if __name__ == '__main__':
     credentials_filepath = sys.argv[1]
     auth = infoauth.load(credentials_filepath)
     token = auth["token"]
-    main(token)
+    shards = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    main(token, shards)
@@ -0,0 +1,5 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Benchmarks for the bot hot paths."""
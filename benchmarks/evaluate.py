@@ -0,0 +1,82 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Cómo escala Game.evaluate_words con la cantidad de jugadores.
+
+    python -m benchmarks.evaluate
+
+Para comparar, también mide la resolución de repetidas vieja (intersección de a pares).
+"""
+
+import itertools
+import random
+import time
+
+from botggle.board import Board
+from botggle.game import Game, rae_words
+
+PLAYERS = [2, 5, 10, 25, 50, 100, 200, 400]
+WORDS_PER_PLAYER = 40
+
+
+def build_game(players, seed=0):
+    """Arma un juego con la ronda cargada: palabras del tablero (muchas repetidas) y otras."""
+    rnd = random.Random(seed)
+    dictionary = rae_words.get()
+    board = Board()
+    board_words = sorted(board.solve(dictionary))
+    other_words = rnd.sample(list(dictionary), 2000)
+
+    game = Game("chat")
+    game.start_round(board)
+    for index in range(players):
+        words = rnd.sample(board_words, min(WORDS_PER_PLAYER // 2, len(board_words)))
+        words += rnd.sample(other_words, WORDS_PER_PLAYER // 2)
+        game.add_text(f"player{index}", " ".join(words))
+    return game
+
+
+def pairwise_repeated(full_result):
+    """La resolución de repetidas de antes, de a pares."""
+    for rword1, rword2 in itertools.combinations(full_result.values(), 2):
+        repes = rword1.valid & rword2.valid
+        rword1.repeated.update(repes)
+        rword2.repeated.update(repes)
+    for rword in full_result.values():
+        rword.valid -= rword.repeated
+
+
+def measure(function, repeat=5):
+    """El mejor tiempo (en segundos) de varias corridas."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(f"{'jugadores':>10} {'evaluate (ms)':>14} {'µs/jugador':>11} {'de a pares (ms)':>16}")
+    for players in PLAYERS:
+        game = build_game(players)
+        current = measure(game.evaluate_words)
+
+        # la versión de a pares, sobre resultados ya clasificados
+        def old():
+            full_result = game.evaluate_words()
+            for rword in full_result.values():
+                rword.valid |= rword.repeated
+                rword.repeated = set()
+            pairwise_repeated(full_result)
+        previous = measure(old)
+
+        print(
+            f"{players:>10} {current * 1000:>14.2f} {current / players * 1e6:>11.1f} "
+            f"{previous * 1000:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Load test of the bot handlers, with simulated games and players (all offline).
+
+    python -m benchmarks.loadtest --games 1000 --players 4 --round-seconds 10
+
+Se arman updates, contextos y bot falsos, y se corren los handlers de `app.py`
+(`start_command`, `ready_command`, `game_words` y `time_up`) como los correría telegram, con
+muchos juegos a la vez. Al final se informa throughput, latencias de cada handler (y del loop)
+y memoria.
+"""
+
+import argparse
+import asyncio
+import collections
+import contextlib
+import io
+import random
+import resource
+import statistics
+import sys
+import time
+import traceback
+import tracemalloc
+
+from telegram import MessageEntity  # fades python-telegram-bot[job-queue]>=20
+
+import app
+from botggle.dictionary import RAE_WORDS_PATH
+from botggle.game import Game, rae_words
+from botggle.outbound import Outbox
+from botggle.scheduler import RoundScheduler
+
+# cada cuánto se mide el retraso del loop (en segundos)
+LOOP_LAG_INTERVAL = 0.05
+
+# cuánto se espera (como máximo) a que se llenen los pools de tableros antes de arrancar
+POOL_WARMUP_TIMEOUT = 60
+
+
+class FakeChat:
+    """Un chat (o usuarie, que para mandar mensajes es lo mismo)."""
+
+    def __init__(self, id, type="private", title=None, username=None):
+        self.id = id
+        self.type = type
+        self.title = title
+        self.username = username
+        self.full_name = username
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, FakeChat) and self.id == other.id
+
+
+class FakeEntity:
+    def __init__(self, type):
+        self.type = type
+
+
+class FakeMessage:
+    def __init__(self, text, mentions=()):
+        self.text = text
+        self._mentions = mentions
+
+    def parse_entities(self):
+        return {FakeEntity(MessageEntity.MENTION): f"@{username}" for username in self._mentions}
+
+
+class FakeUpdate:
+    def __init__(self, user, chat, text, mentions=()):
+        self.effective_user = user
+        self.effective_chat = chat
+        self.message = FakeMessage(text, mentions)
+
+
+class FakeContext:
+    def __init__(self, args=()):
+        self.args = list(args)
+
+
+class FakeBot:
+    """Cuenta los mensajes, tardando lo que se le indique en "mandar" cada uno."""
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.messages = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.messages += 1
+
+
+class _GameRun:
+    """Lo que necesita la prueba de cada juego: sus jugadores y cuándo arranca/termina."""
+
+    def __init__(self, index):
+        self.chat = FakeChat(-1_000_000 - index, type="group", title=f"juego {index}")
+        self.players = []
+        self.started = asyncio.Event()
+        self.finished = asyncio.Event()
+
+
+def percentiles(values):
+    """Mediana, p95, p99 y máximo (en milisegundos)."""
+    if not values:
+        return {}
+    values = sorted(values)
+    at = lambda fraction: values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+    return {
+        "p50": statistics.median(values) * 1000, "p95": at(0.95), "p99": at(0.99),
+        "max": values[-1] * 1000,
+    }
+
+
+class LoadTest:
+    """Corre `games` juegos de `players` jugadores a la vez, durante `rounds` rondas."""
+
+    def __init__(
+            self, games=100, players=4, rounds=1, round_seconds=10, words_per_second=0.5,
+            words_per_message=1, bot_latency=0, telegram_limits=False, seed=0):
+        self.games = games
+        self.players = players
+        self.rounds = rounds
+        self.round_seconds = round_seconds
+        self.words_per_second = words_per_second
+        self.words_per_message = words_per_message
+        self.bot = FakeBot(bot_latency)
+        self.telegram_limits = telegram_limits
+        self.rnd = random.Random(seed)
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.loop_lags = []
+        self.words_sent = 0
+        self.round_memory = collections.Counter()
+        self.scheduler = None
+
+        with open(RAE_WORDS_PATH, encoding="utf8") as fh:
+            words = [line.strip() for line in fh if line.strip()]
+        self.other_words = self.rnd.sample(words, min(5000, len(words)))
+
+    async def _call(self, name, handler, *args):
+        """Corre el handler, midiendo cuánto tarda; los errores se cuentan (y el primero se
+        muestra), como haría telegram, que sigue adelante."""
+        started = time.perf_counter()
+        try:
+            await handler(*args)
+        except Exception:
+            if not self.errors[name]:
+                traceback.print_exc()
+            self.errors[name] += 1
+        self.latencies[name].append(time.perf_counter() - started)
+
+    async def _time_up(self, game):
+        # al terminar la ronda es cuando más palabras hay guardadas
+        report = game.memory_report()
+        # lo que se comparte en la ronda (las extras, quién mandó cada una) también cuenta
+        self.round_memory["words"] += report["game"]["round_words"]
+        for stats in report["players"].values():
+            self.round_memory["players"] += 1
+            self.round_memory["words"] += stats["words"]
+            self.round_memory["words_as_sets"] += stats["words_as_sets"]
+        await self._call("time_up", self._real_time_up, game)
+        self._run_by_game[game].finished.set()
+
+    async def _monitor_loop(self):
+        while True:
+            expected = time.perf_counter() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.loop_lags.append(max(0, time.perf_counter() - expected))
+
+    async def _start_game(self, run):
+        owner, *others = run.players
+        mentions = [user.username for user in others]
+        update = FakeUpdate(owner, run.chat, "/comienzo", mentions=mentions)
+        await self._call("start_command", app.start_command, update, FakeContext())
+        game = app.GAME_BY_CHAT[run.chat]
+        self._run_by_game[game] = run
+
+    async def _play(self, run, user):
+        context = FakeContext()
+        for _ in range(self.rounds):
+            await asyncio.sleep(self.rnd.uniform(0, 0.5))
+            update = FakeUpdate(user, user, "/listo")
+            await self._call("ready_command", app.ready_command, update, context)
+            game = app.PLAYER_BY_USERNAME[user.username].game
+            if game.state == Game.State.ACTIVE:
+                run.finished.clear()
+                run.started.set()
+            await run.started.wait()
+
+            # tiramos palabras (algunas del tablero, otras no) hasta que se termine la ronda
+            board_words = list(game.board.solve(rae_words))
+            while game.state == Game.State.ACTIVE:
+                await asyncio.sleep(self.rnd.expovariate(self.words_per_second))
+                if game.state != Game.State.ACTIVE:
+                    break
+                words = [
+                    self.rnd.choice(board_words or self.other_words)
+                    if self.rnd.random() < 0.5 else self.rnd.choice(self.other_words)
+                    for _ in range(self.words_per_message)]
+                self.words_sent += len(words)
+                update = FakeUpdate(user, user, " ".join(words))
+                await self._call("game_words", app.game_words, update, context)
+
+            await run.finished.wait()
+            run.started.clear()
+            if game.state != Game.State.WAITING:
+                # el cierre de la ronda falló (o terminó el juego), no se puede seguir
+                return
+
+    async def _run(self):
+        self.scheduler = app.SCHEDULER = RoundScheduler(self._time_up)
+        self.scheduler.start()
+        if self.telegram_limits:
+            app.OUTBOX = Outbox()
+        else:
+            app.OUTBOX = Outbox(global_rate=1e9, chat_rate=1e9, chat_burst=1e9)
+        app.OUTBOX.start(self.bot)
+        monitor = asyncio.create_task(self._monitor_loop())
+
+        runs = []
+        for index in range(self.games):
+            run = _GameRun(index)
+            for number in range(self.players):
+                user_id = index * 1000 + number + 1
+                run.players.append(FakeChat(user_id, username=f"g{index}p{number}"))
+            runs.append(run)
+
+        for run in runs:
+            await self._start_game(run)
+        await asyncio.gather(*(self._play(run, user) for run in runs for user in run.players))
+
+        await app.OUTBOX.flush()
+        await app.OUTBOX.stop()
+        monitor.cancel()
+
+    def run(self, trace_memory=False, warm_pools=True):
+        """Corre la prueba completa y devuelve el informe.
+
+        Con `warm_pools` se arranca con los pools de tableros llenos; si no, los tableros se
+        generan en el momento (en cada `ready_command` que arranca una ronda).
+        """
+        self._run_by_game = {}
+        saved = (
+            app.OUTBOX, app.STORE, app.SCHEDULER, app.ROUND_TIMEUP, app.SCORES_GAME_LIMIT,
+            app.time_up)
+        app.STORE = None
+        app.ROUND_TIMEUP = self.round_seconds
+        app.SCORES_GAME_LIMIT = sys.maxsize  # que los juegos no terminen antes de tiempo
+        self._real_time_up = app.time_up
+        app.time_up = self._time_up
+
+        # como en el bot real, los tableros se generan en segundo plano; arrancamos con los
+        # pools llenos (como después de un rato de estar andando)
+        if warm_pools:
+            for board_pool in app.BOARD_POOL_BY_SIZE.values():
+                board_pool.start()
+            deadline = time.monotonic() + POOL_WARMUP_TIMEOUT
+            for board_pool in app.BOARD_POOL_BY_SIZE.values():
+                while not board_pool._boards.full() and time.monotonic() < deadline:
+                    time.sleep(0.1)
+
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            # los handlers imprimen bastante; lo descartamos (pero se paga igual lo de armarlo)
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                asyncio.run(self._run())
+                output.truncate(0)
+        finally:
+            elapsed = time.perf_counter() - started
+            for board_pool in app.BOARD_POOL_BY_SIZE.values():
+                board_pool.stop()
+            (app.OUTBOX, app.STORE, app.SCHEDULER, app.ROUND_TIMEUP, app.SCORES_GAME_LIMIT,
+             app.time_up) = saved
+            for run in self._run_by_game.values():
+                # limpiamos las globales, por si se corre de nuevo
+                app.GAME_BY_CHAT.pop(run.chat, None)
+                app.PLAYER_INDEX.release([user.username for user in run.players])
+                for user in run.players:
+                    app.PLAYER_BY_USERNAME.pop(user.username, None)
+
+        report = {
+            "games": self.games,
+            "players": self.games * self.players,
+            "rounds": self.rounds,
+            "elapsed": elapsed,
+            "handler_calls": sum(len(values) for values in self.latencies.values()),
+            "words_sent": self.words_sent,
+            "words_per_second": self.words_sent / elapsed,
+            "messages_sent": self.bot.messages,
+            "board_pools": {
+                size: board_pool.stats() for size, board_pool in app.BOARD_POOL_BY_SIZE.items()},
+            "errors": dict(self.errors),
+            "latency_ms": {name: percentiles(values) for name, values in self.latencies.items()},
+            "loop_lag_ms": percentiles(self.loop_lags),
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "round_memory": dict(self.round_memory),
+            "scheduler": self.scheduler.stats(),
+        }
+        if trace_memory:
+            report["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        return report
+
+
+def print_report(report, file=sys.stdout):
+    """Muestra el informe en forma legible."""
+    print(
+        f"{report['games']} juegos, {report['players']} jugadores, {report['rounds']} rondas "
+        f"en {report['elapsed']:.1f}s", file=file)
+    print(
+        f"handlers: {report['handler_calls']} llamadas "
+        f"({report['handler_calls'] / report['elapsed']:.0f}/s); palabras: "
+        f"{report['words_sent']} ({report['words_per_second']:.0f}/s); mensajes mandados: "
+        f"{report['messages_sent']}", file=file)
+    rows = sorted(report["latency_ms"].items()) + [("(loop lag)", report["loop_lag_ms"])]
+    print(f"{'ms':>16} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}", file=file)
+    for name, values in rows:
+        if values:
+            numbers = " ".join(f"{values[key]:9.3f}" for key in ("p50", "p95", "p99", "max"))
+            print(f"{name:>16} {numbers}", file=file)
+    pools = ", ".join(
+        f"{size}x{size}: {stats['hits']} del pool, {stats['misses']} generados en el momento"
+        for size, stats in report["board_pools"].items() if stats["hits"] or stats["misses"])
+    print(f"tableros: {pools}", file=file)
+    scheduler = report["scheduler"]
+    print(
+        f"fin de rondas: {scheduler['fired']} vencimientos, demora máxima "
+        f"{scheduler['max_lag'] * 1000:.0f} ms", file=file)
+    if report["errors"]:
+        print(f"ERRORES: {report['errors']}", file=file)
+    memory = f"memoria: pico RSS {report['max_rss_mb']:.0f} MB"
+    if "traced_peak_mb" in report:
+        memory += f", pico de Python {report['traced_peak_mb']:.0f} MB"
+    round_memory = report["round_memory"]
+    if round_memory:
+        players = round_memory["players"]
+        memory += (
+            f"; palabras por jugadore al terminar la ronda: {round_memory['words'] / players:.0f} "
+            f"bytes (como sets de strings serían {round_memory['words_as_sets'] / players:.0f})")
+    print(memory, file=file)
+
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--round-seconds", type=float, default=10)
+    parser.add_argument("--words-per-second", type=float, default=0.5, help="por jugador")
+    parser.add_argument("--words-per-message", type=int, default=1)
+    parser.add_argument("--bot-latency", type=float, default=0, help="segundos por mensaje")
+    parser.add_argument(
+        "--telegram-limits", action="store_true", help="respetar los límites de telegram")
+    parser.add_argument("--trace-memory", action="store_true", help="usar tracemalloc")
+    parser.add_argument(
+        "--cold-pools", action="store_true", help="arrancar con los pools de tableros vacíos")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # el diccionario se carga antes de arrancar, como en el bot real
+    rae_words.get()
+    load_test = LoadTest(
+        args.games, args.players, args.rounds, args.round_seconds, args.words_per_second,
+        args.words_per_message, args.bot_latency, args.telegram_limits, args.seed)
+    print_report(load_test.run(args.trace_memory, warm_pools=not args.cold_pools))
+
+
+if __name__ == "__main__":
+    main()
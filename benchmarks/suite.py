@@ -0,0 +1,256 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Benchmarks of the hot paths, with JSON results that can be compared between runs.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline results.json --threshold 0.3
+
+Los fixtures son reproducibles (semilla fija): tableros al azar, palabras sacadas de
+`rae_words.txt` y rondas de 2 a 200 jugadores. Si se pasa un `--baseline`, termina con error
+cuando algún caso quedó más lento que el umbral (por default, 30% más lento).
+"""
+
+import argparse
+import json
+import pathlib
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from botggle import dictionary as dictionary_module
+from botggle.board import Board
+from botggle.dictionary import Dictionary, RAE_WORDS_PATH
+from botggle.game import Game, rae_words
+from botggle.messages import get_user_round_result
+
+# cuánto tiene que durar (como mínimo) cada muestra, y cuántas muestras se toman por caso
+MIN_SAMPLE_TIME = 0.05
+REPEAT = 5
+
+# cuánto más lento (en proporción) puede quedar un caso antes de considerarlo una regresión
+DEFAULT_THRESHOLD = 0.3
+
+PLAYERS = [2, 10, 50, 200]
+WORDS_PER_PLAYER = 40
+SEED = 0
+
+
+class Fixtures:
+    """Los datos que usan los benchmarks, armados una sola vez y siempre iguales."""
+
+    def __init__(self, seed=SEED):
+        self.rnd = random.Random(seed)
+        with open(RAE_WORDS_PATH, encoding="utf8") as fh:
+            self.rae_words = [line.strip() for line in fh if line.strip()]
+        self.dictionary = rae_words.get()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        # el módulo random global es el que usa Board para tirar los dados
+        random.seed(seed)
+        self.boards = [Board() for _ in range(20)]
+
+        # palabras para buscar en los tableros: la mitad están, la otra mitad (casi seguro) no
+        self.solutions = [sorted(board.solve(self.dictionary)) for board in self.boards]
+        self.lookups = []
+        for board, solution in zip(self.boards, self.solutions):
+            found = self.rnd.sample(solution, min(25, len(solution)))
+            missing = self.rnd.sample(self.rae_words, 25)
+            self.lookups.append((board, found + missing))
+
+    def round_game(self, players):
+        """Un juego con la ronda cargada: palabras del tablero (muchas repetidas) y otras."""
+        board = self.boards[0]
+        board_words = self.solutions[0]
+        game = Game("chat")
+        game.start_round(board)
+        for index in range(players):
+            words = self.rnd.sample(board_words, min(WORDS_PER_PLAYER // 2, len(board_words)))
+            words += self.rnd.sample(self.rae_words, WORDS_PER_PLAYER // 2)
+            game.add_text(f"player{index}", " ".join(words))
+        return game
+
+
+def _bench_exists(fixtures, engine):
+    lookups = [
+        (Board(engine=engine, distribution=board.distribution), words)
+        for board, words in fixtures.lookups]
+
+    def run():
+        for board, words in lookups:
+            for word in words:
+                board.exists(word)
+    return run
+
+
+def _bench_build_graph(fixtures):
+    boards = fixtures.boards
+
+    def run():
+        for board in boards:
+            board._build_graph()
+    return run
+
+
+def _bench_solve(fixtures):
+    distributions = [board.distribution for board in fixtures.boards[:5]]
+    dictionary = fixtures.dictionary
+
+    def run():
+        for distribution in distributions:
+            Board(distribution=distribution).solve(dictionary)
+    return run
+
+
+def _bench_evaluate(fixtures, players):
+    game = fixtures.round_game(players)
+    game.stop_round()
+    # la primera vez se clasifican las palabras; medimos las siguientes, que es lo que se
+    # hace al terminar la ronda (las palabras se van clasificando a medida que llegan)
+    game.evaluate_words()
+    return game.evaluate_words
+
+
+def _bench_dictionary_load(fixtures):
+    compiled = pathlib.Path(fixtures.tmpdir.name) / "rae_words.dawg"
+    compiled.write_bytes(dictionary_module.compile_words(fixtures.rae_words))
+    words = fixtures.rnd.sample(fixtures.rae_words, 100)
+
+    def run():
+        # lo que pasa la primera vez que se usa el diccionario: abrirlo y buscar palabras
+        dictionary = Dictionary.load(compiled)
+        for word in words:
+            word in dictionary
+    return run
+
+
+def _bench_round_result(fixtures):
+    game = fixtures.round_game(10)
+    game.stop_round()
+    results = list(game.evaluate_words().values())
+
+    def run():
+        for result in results:
+            get_user_round_result(result)
+    return run
+
+
+def get_benchmarks():
+    """Devuelve los casos a medir: {nombre: función que arma lo que se mide}."""
+    benchmarks = {
+        "board.exists.bitmask": lambda fixtures: _bench_exists(fixtures, "bitmask"),
+        "board.exists.recursive": lambda fixtures: _bench_exists(fixtures, "recursive"),
+        "board.build_graph": _bench_build_graph,
+        "board.solve": _bench_solve,
+        "dictionary.load": _bench_dictionary_load,
+        "messages.round_result": _bench_round_result,
+    }
+    for players in PLAYERS:
+        benchmarks[f"game.evaluate_words.{players}"] = (
+            lambda fixtures, players=players: _bench_evaluate(fixtures, players))
+    return benchmarks
+
+
+def measure(function, min_sample_time=MIN_SAMPLE_TIME, repeat=REPEAT):
+    """Mide cuánto tarda la función (en segundos por llamada), como `timeit`.
+
+    Calibra cuántas llamadas entran en cada muestra para que dure al menos `min_sample_time`,
+    y devuelve el mejor tiempo y la mediana de las muestras.
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_sample_time:
+            break
+        number *= 2 if elapsed * 10 > min_sample_time else 10
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - started) / number)
+    return {"best": min(samples), "median": statistics.median(samples), "number": number}
+
+
+def run(selected=None, min_sample_time=MIN_SAMPLE_TIME, repeat=REPEAT):
+    """Corre los benchmarks (todos, o los que empiezan con alguno de `selected`)."""
+    fixtures = Fixtures()
+    results = {}
+    with fixtures.tmpdir:
+        for name, build in get_benchmarks().items():
+            if selected and not any(name.startswith(prefix) for prefix in selected):
+                continue
+            results[name] = measure(build(fixtures), min_sample_time, repeat)
+            print(f"{name:>30}: {results[name]['best'] * 1000:10.3f} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Compara dos corridas; devuelve [(nombre, antes, ahora, proporción)] de las regresiones.
+
+    Se comparan los mejores tiempos (los menos afectados por el ruido de la máquina), y sólo
+    de los casos que están en las dos corridas.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        try:
+            before = baseline["results"][name]["best"]
+        except KeyError:
+            continue
+        ratio = result["best"] / before
+        if ratio > 1 + threshold:
+            regressions.append((name, before, result["best"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("--output", help="archivo donde guardar los resultados (JSON)")
+    parser.add_argument("--baseline", help="resultados de antes (JSON) para comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--min-sample-time", type=float, default=MIN_SAMPLE_TIME)
+    parser.add_argument("selected", nargs="*", help="correr sólo los que empiezan así")
+    args = parser.parse_args(argv)
+
+    current = run(args.selected, args.min_sample_time, args.repeat)
+    serialized = json.dumps(current, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as fh:
+            fh.write(serialized + "\n")
+    else:
+        print(serialized)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(baseline, current, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(
+                f"REGRESIÓN {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms "
+                f"({ratio:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,8 +5,11 @@
 """Board functionality."""
 
 import dataclasses
+import functools
 import random
 
+from botggle.dictionary import QU_SYMBOL, ROOT, LazyDictionary, tokenize
+
 DICES = [
     ("g", "o", "l", "d", "o", "b"),
     ("f", "u", "a", "a", "b", "r"),
@@ -26,6 +29,114 @@ DICES = [
     ("t", "a", "p", "s", "c", "a"),
 ]
 
+# para el "Big Boggle" (5x5) agregamos dados cargados de vocales y consonantes comunes
+BIG_DICES = DICES + [
+    ("a", "e", "i", "o", "u", "a"),
+    ("e", "a", "o", "s", "r", "n"),
+    ("l", "n", "r", "s", "t", "c"),
+    ("a", "e", "i", "o", "e", "a"),
+    ("d", "m", "p", "c", "s", "t"),
+    ("o", "a", "e", "i", "r", "l"),
+    ("n", "s", "r", "l", "d", "t"),
+    ("g", "b", "v", "f", "h", "z"),
+    ("e", "i", "a", "o", "n", "s"),
+]
+
+# y para el "Super Big Boggle" (6x6) todavía algunos más
+SUPER_BIG_DICES = BIG_DICES + [
+    ("a", "e", "o", "i", "u", "e"),
+    ("r", "s", "n", "l", "t", "d"),
+    ("c", "m", "p", "b", "g", "f"),
+    ("a", "o", "e", "s", "n", "r"),
+    ("qu", "ch", "v", "z", "j", "x"),
+    ("e", "a", "i", "o", "l", "r"),
+    ("t", "s", "n", "c", "d", "m"),
+    ("o", "i", "a", "e", "u", "o"),
+    ("l", "r", "n", "s", "t", "a"),
+    ("e", "o", "a", "i", "d", "m"),
+    ("b", "p", "g", "v", "f", "h"),
+]
+
+# los dados para cada tamaño de tablero (de lado), en castellano (los de otros idiomas están
+# en `botggle.languages`)
+DICES_BY_SIZE = {
+    4: DICES,
+    5: BIG_DICES,
+    6: SUPER_BIG_DICES,
+}
+
+
+@functools.lru_cache()
+def neighbours(size):
+    """Para cada posición de un tablero de size x size, las posiciones vecinas.
+
+    Se calcula una sola vez por tamaño; las posiciones se numeran por filas.
+    """
+    result = []
+    for x_k in range(size):
+        for y_k in range(size):
+            around = []
+            for x_a in (x_k - 1, x_k, x_k + 1):
+                for y_a in (y_k - 1, y_k, y_k + 1):
+                    if (x_a, y_a) != (x_k, y_k) and 0 <= x_a < size and 0 <= y_a < size:
+                        around.append(x_a * size + y_a)
+            result.append(tuple(around))
+    return tuple(result)
+
+
+@functools.lru_cache()
+def neighbour_masks(size):
+    """Para cada posición, la máscara de bits con las posiciones vecinas."""
+    return tuple(
+        sum(1 << position for position in around) for around in neighbours(size))
+
+
+def _walk(moves, word, length, index, position, first, visited):
+    """Sigue la palabra desde `index`, con lo anterior ya armado terminando en `position`.
+
+    Es el paso del motor de bits: `moves` son los vecinos por posición y primer símbolo (ver
+    `Board._build_moves`), `visited` los dados usados (bits) y `first` el primer dado si
+    puede repetirse como último. Es una función suelta (y no una clausura armada en cada
+    búsqueda) porque en palabras cortas armar la clausura costaba tanto como buscar.
+    """
+    # mientras haya un solo dado para seguir se avanza sin recursión (es lo común)
+    while True:
+        options = moves[position].get(word[index])
+        if options is None:
+            return False
+        if len(options) > 1:
+            break
+        ((position, face, bit),) = options
+        if visited & bit:
+            # el primer dado puede repetirse, pero sólo si es el último (y entonces es de una
+            # letra, ya coincide)
+            return position == first and length - index == 1
+        if face is None:
+            index += 1
+        elif word.startswith(face, index):
+            index += len(face)
+        else:
+            return False
+        if index == length:
+            return True
+        visited |= bit
+
+    for next_position, face, bit in options:
+        if visited & bit:
+            if next_position == first and length - index == 1:
+                return True
+            continue
+        if face is None:
+            next_index = index + 1
+        elif word.startswith(face, index):
+            next_index = index + len(face)
+        else:
+            continue
+        if next_index == length or _walk(
+                moves, word, length, next_index, next_position, first, visited | bit):
+            return True
+    return False
+
 
 @dataclasses.dataclass(frozen=True)
 class LocatedChar:
@@ -34,23 +145,60 @@ class LocatedChar:
 
 
 class Board:
-    """A boggle board."""
+    """A boggle board.
+
+    El motor usado para buscar palabras en `exists` se puede elegir al crearlo (ver
+    `ENGINES`); todos dan las mismas respuestas, "recursive" es la implementación de
+    referencia y "bitmask" la rápida.
+
+    Por default se tiran los dados en castellano; los de otro idioma se pasan en `dices` (no
+    hacen falta si se pasa la distribución, ej: al reconstruir un tablero).
+    """
 
-    def __init__(self):
-        self.distribution = self._get_distribution()
+    ENGINES = ("bitmask", "recursive")
 
-        # armamos el grafo
+    def __init__(self, size=4, engine="bitmask", distribution=None, dices=None):
+        if distribution is not None:
+            size = len(distribution)
+        if dices is None and distribution is None:
+            if size not in DICES_BY_SIZE:
+                raise ValueError(f"Tamaño de tablero no soportado: {size!r}")
+            dices = DICES_BY_SIZE[size]
+        elif dices is not None and len(dices) != size * size:
+            raise ValueError(f"Hacen falta {size * size} dados (se pasaron {len(dices)})")
+        if engine not in self.ENGINES:
+            raise ValueError(f"Motor de búsqueda desconocido: {engine!r}")
+        self.size = size
+        self.engine = engine
+        self._dices = dices
+
+        # si no nos pasan la distribución (ej: para reconstruir un tablero), tiramos los dados
+        if distribution is None:
+            distribution = self._get_distribution()
+        self.distribution = distribution
+
+        # armamos el grafo, y las caras de los dados por posición (y pasadas a los símbolos del
+        # diccionario, donde la "qu" es uno solo) para el motor de bits
         self._word_graph = self._build_graph()
+        self._faces = tuple(char for row in self.distribution for char in row)
+        self._tokens = tuple(tokenize(face) for face in self._faces)
+        self._starts, self._moves = self._build_moves()
+        self._board_symbols = frozenset("".join(self._tokens))
+
+        # la solución completa se calcula recién cuando se pide (y se guarda)
+        self._solution = None
+        self._solved_with = None
 
     def _get_distribution(self):
-        # mezclamos los dados
-        random.shuffle(DICES)
+        # mezclamos los dados (en una copia: las listas son de todo el módulo, y se tiran
+        # tableros desde varios hilos a la vez)
+        all_dices = random.sample(self._dices, len(self._dices))
 
         distribution = []
-        dices = iter(DICES)
-        for i in range(4):
+        dices = iter(all_dices)
+        for i in range(self.size):
             row = []
-            for j in range(4):
+            for j in range(self.size):
                 dice = next(dices)
                 row.append(random.choice(dice))
             distribution.append(row)
@@ -75,25 +223,11 @@ class Board:
             (b, 1) -> [(a, 0), (e, 4), ...,
             ...
         """
+        faces = [char for row in self.distribution for char in row]
         result = {}
-        for x_k in range(4):
-            for y_k in range(4):
-                key = LocatedChar(self.distribution[x_k][y_k], (x_k * 4) + y_k)
-                around = set()
-                positions = [
-                    (x_k - 1, y_k),
-                    (x_k + 1, y_k),
-                    (x_k, y_k - 1),
-                    (x_k, y_k + 1),
-                    (x_k - 1, y_k - 1),
-                    (x_k + 1, y_k + 1),
-                    (x_k - 1, y_k + 1),
-                    (x_k + 1, y_k - 1),
-                ]
-                for x_a, y_a in positions:
-                    if (0 <= x_a <= 3) and (0 <= y_a <= 3):
-                        around.add(LocatedChar(self.distribution[x_a][y_a], (x_a * 4) + y_a))
-                result[key] = around
+        for position, around in enumerate(neighbours(self.size)):
+            key = LocatedChar(faces[position], position)
+            result[key] = {LocatedChar(faces[other], other) for other in around}
         return result
 
     def render(self):
@@ -131,6 +265,134 @@ class Board:
                 return True
         return False
 
+    def _build_moves(self):
+        """Prepara, a partir de la tabla de máscaras, los movimientos posibles del tablero.
+
+        Devuelve los dados para arrancar y, para cada posición, los vecinos a los que se puede
+        ir; ambos agrupados por el primer símbolo de la cara, así en cada paso sólo se miran
+        los dados que pueden servir para seguir la palabra. Las caras van como símbolos (ver
+        `tokenize`), o None si son de un único símbolo (ya coinciden, no hay que comparar).
+        """
+        faces = [token if len(token) > 1 else None for token in self._tokens]
+
+        # el primer dado sólo puede volver a usarse (como último) si es de una letra: la "qu"
+        # es un solo símbolo, pero son dos letras, así que queda como ya usado (sin `first`)
+        starts = {}
+        for position, token in enumerate(self._tokens):
+            first = position if len(self._faces[position]) == 1 else None
+            starts.setdefault(token[0], []).append((position, faces[position], first))
+
+        moves = []
+        for mask in neighbour_masks(self.size):
+            by_char = {}
+            for position, token in enumerate(self._tokens):
+                bit = 1 << position
+                if mask & bit:
+                    by_char.setdefault(token[0], []).append((position, faces[position], bit))
+            moves.append({char: tuple(options) for char, options in by_char.items()})
+
+        starts = {char: tuple(options) for char, options in starts.items()}
+        return starts, tuple(moves)
+
+    def _bitmask_search(self, word):
+        """Busca la palabra usando máscaras de bits para los vecinos y los dados usados.
+
+        Es equivalente a `_recursive_search` pero sin armar listas en cada paso: la palabra
+        se recorre por índice (ya pasada a símbolos, así la "qu" es uno solo), y los dados ya
+        usados son bits prendidos en un entero (ver `_walk`).
+        """
+        if not word:
+            return True
+        if "q" in word:
+            # como `tokenize`, pero sin la llamada (acá cada llamada se nota)
+            word = word.replace("qu", QU_SYMBOL)
+        if not self._board_symbols.issuperset(word):
+            # hay alguna letra que no está en ningún dado
+            return False
+
+        moves = self._moves
+        length = len(word)
+        for position, face, first in self._starts.get(word[0], ()):
+            if face is None:
+                index = 1
+            elif word.startswith(face):
+                index = len(face)
+            else:
+                continue
+            if index == length or _walk(
+                    moves, word, length, index, position, first, 1 << position):
+                return True
+        return False
+
     def exists(self, word: str) -> bool:
         """Return if the word exists in the board."""
+        if self.engine == "bitmask":
+            return self._bitmask_search(word)
         return self._recursive_search(word, self._word_graph.keys(), [])
+
+    def release(self):
+        """Libera la solución guardada; se vuelve a calcular si hace falta."""
+        self._solution = None
+        self._solved_with = None
+
+    def solve(self, dictionary):
+        """Encuentra todas las palabras del diccionario que están en el tablero.
+
+        Recorre el grafo una sola vez, cortando cada camino apenas lo armado no es prefijo de
+        ninguna palabra del diccionario. Devuelve un dict de palabra -> camino (tupla con las
+        posiciones de los dados usados, en orden).
+
+        Respeta las mismas reglas que `exists`: ningún dado se usa dos veces, salvo que el
+        primero puede repetirse como último (y sólo si es de una letra).
+
+        La solución se guarda para el diccionario con que se calculó; uno cargado de a poco
+        (LazyDictionary) cuenta como el diccionario real, así da lo mismo pasar uno u otro.
+        """
+        if isinstance(dictionary, LazyDictionary):
+            dictionary = dictionary.get()
+        if self._solved_with is dictionary:
+            return self._solution
+
+        step = dictionary.step
+        is_final = dictionary.is_final
+        faces = self._faces
+        tokens = self._tokens
+        around = neighbours(self.size)
+
+        solution = {}
+
+        def search(position, node, word, path, visited):
+            for next_position in around[position]:
+                char = faces[next_position]
+                next_node = step(node, tokens[next_position])
+                if next_node is None:
+                    continue
+
+                next_word = word + char
+                if next_position == path[0]:
+                    # volver al primer dado sólo vale como último y si es de una letra
+                    if len(char) == 1 and is_final(next_node) and next_word not in solution:
+                        solution[next_word] = path + (next_position,)
+                    continue
+
+                bit = 1 << next_position
+                if visited & bit:
+                    continue
+
+                next_path = path + (next_position,)
+                if is_final(next_node) and next_word not in solution:
+                    solution[next_word] = next_path
+                search(next_position, next_node, next_word, next_path, visited | bit)
+
+        for position, char in enumerate(faces):
+            node = step(ROOT, tokens[position])
+            if node is None:
+                continue
+            path = (position,)
+            if is_final(node) and char not in solution:
+                solution[char] = path
+            search(position, node, char, path, 1 << position)
+
+        self._solution = solution
+        self._solved_with = dictionary
+        return solution
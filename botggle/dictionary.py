@@ -0,0 +1,499 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""A compact dictionary of words, stored as a minimized DAWG.
+
+El diccionario se puede precompilar a un archivo binario con
+
+    python -m botggle.dictionary compile [palabras.txt] [palabras.dawg]
+
+que después se abre con mmap (sin parsear nada), así el arranque es casi gratis y los
+procesos hijos comparten las mismas páginas de memoria.
+
+Las palabras se guardan separadas en los símbolos de las caras de los dados: la "qu" es un
+único símbolo (`QU_SYMBOL`). La "ch" queda como dos letras, porque además de su propia cara
+se puede armar con un dado de "c" y otro de "h".
+
+Cada palabra tiene además un número (su posición en orden alfabético, ver `Dictionary.index`),
+para poder guardarla en pocos bytes y recuperarla después.
+"""
+
+import argparse
+import bisect
+import functools
+import mmap
+import pathlib
+import struct
+import sys
+import threading
+from array import array
+from collections import namedtuple
+
+# el nodo raíz siempre es el primero
+ROOT = 0
+
+# las palabras de la RAE y su versión compilada
+RAE_WORDS_PATH = pathlib.Path(__file__).resolve().parent.parent / "rae_words.txt"
+RAE_COMPILED_PATH = RAE_WORDS_PATH.with_suffix(".dawg")
+
+# formato del archivo compilado: un header y después, todo alineado a 4 bytes:
+#   alfabeto (utf8), first_edge (uint32), targets (uint32), skips (uint32), labels (uint8),
+#   final (uint8)
+_MAGIC = b"BOTGDAWG"
+_VERSION = 3
+_HEADER = struct.Struct("<8sIIIII")  # magic, version, nodes, edges, quantity, alphabet size
+
+RawDictionary = namedtuple("RawDictionary", "alphabet first_edge labels targets final")
+
+# cuántas palabras ya pasadas de número a texto se guardan (las comunes se piden todo el tiempo)
+WORD_CACHE_SIZE = 2 ** 16
+
+# el símbolo con el que se guarda la "qu" (en mayúscula, así nunca choca con lo que se busca)
+QU_SYMBOL = "Q"
+
+# cómo se normaliza el texto, tanto las palabras del diccionario como lo que escriben les
+# jugadores: se sacan los signos de puntuación y los acentos
+CLEANING_TABLE = str.maketrans(
+    """.,;:'"-_=+[]{}áéíóú""",
+    """              aeiou""",
+)
+
+
+def _sort_key(word):
+    # la "qu" se ordena después de todas las otras palabras con "q" (así, si todas las "q" van
+    # con "u", el orden es el alfabético de siempre)
+    return word.replace(QU_SYMBOL, "q\U0010ffff")
+
+
+def tokenize(text):
+    """Pasa el texto a los símbolos del diccionario (la "qu" como un único símbolo)."""
+    if "q" in text:
+        return text.replace("qu", QU_SYMBOL)
+    return text
+
+
+def normalize(text, cleaning_table=CLEANING_TABLE):
+    """Normaliza el texto igual que lo que escriben les jugadores."""
+    return text.lower().translate(cleaning_table)
+
+
+def prepare_words(words, letters, min_length, cleaning_table=CLEANING_TABLE):
+    """Normaliza las palabras y descarta las que nunca se podrían jugar.
+
+    Se descartan las que tienen letras que no están en `letters` (las de los dados), una q
+    que no sigue con u, menos de `min_length` letras, o que al normalizarlas no quedan como
+    una sola palabra (ej: "anti-").
+    """
+    letters = frozenset(letters)
+    for word in words:
+        word = normalize(word.strip(), cleaning_table)
+        if len(word) < min_length or not letters.issuperset(word):
+            continue
+        if "q" in tokenize(word):
+            continue
+        yield word
+
+
+class _BuildNode:
+    """Nodo temporal, sólo se usa mientras se arma el grafo."""
+
+    __slots__ = ("final", "edges")
+
+    def __init__(self):
+        self.final = False
+        self.edges = {}
+
+    def signature(self):
+        """Identifica al nodo por su contenido; los hijos ya están minimizados."""
+        return (self.final, tuple((char, id(child)) for char, child in self.edges.items()))
+
+
+def _build_dawg(words):
+    """Arma el DAWG mínimo a partir de palabras ORDENADAS (algoritmo de Daciuk et al).
+
+    Las palabras vienen en símbolos (ver `tokenize`), ordenadas según `_sort_key`.
+
+    Devuelve el nodo raíz y la cantidad de palabras cargadas.
+    """
+    root = _BuildNode()
+    register = {}
+    unchecked = []  # (padre, caracter, hijo) del camino de la última palabra
+    previous = ""
+    quantity = 0
+
+    def minimize(down_to):
+        while len(unchecked) > down_to:
+            parent, char, child = unchecked.pop()
+            signature = child.signature()
+            try:
+                parent.edges[char] = register[signature]
+            except KeyError:
+                register[signature] = child
+
+    for word in words:
+        if word == previous and quantity:
+            continue
+        if quantity and _sort_key(word) < _sort_key(previous):
+            raise ValueError(f"Las palabras tienen que venir ordenadas ({previous!r} > {word!r})")
+
+        common = 0
+        for char_a, char_b in zip(word, previous):
+            if char_a != char_b:
+                break
+            common += 1
+        minimize(common)
+
+        node = unchecked[-1][2] if unchecked else root
+        for char in word[common:]:
+            child = _BuildNode()
+            node.edges[char] = child
+            unchecked.append((node, char, child))
+            node = child
+        node.final = True
+        previous = word
+        quantity += 1
+
+    minimize(0)
+    return root, quantity
+
+
+class Dictionary:
+    """Diccionario de palabras que responde si algo es palabra o prefijo de alguna palabra.
+
+    Internamente es un DAWG (grafo acíclico dirigido de palabras) minimizado, aplanado en
+    unos pocos arrays dentro de un único buffer (que puede ser un mmap de un archivo):
+
+        - `_first_edge[n]` .. `_first_edge[n + 1]`: rango de las aristas que salen del nodo n
+        - labels (en `_buffer` desde `_labels_offset`): código del caracter de cada arista
+        - `_targets[e]`: nodo al que lleva la arista e
+        - `_skips[e]`: cuántas palabras (en orden alfabético) quedan antes de las que siguen
+          por la arista e, contando desde el nodo del que sale (para numerar las palabras)
+        - `_final[n]`: 1 si llegar al nodo n completa una palabra
+
+    Los códigos de los caracteres se arman con el alfabeto de las palabras cargadas.
+    """
+
+    def __init__(self, buffer):
+        magic, version, nodes, edges, quantity, alphabet_size = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("El buffer no es un diccionario compilado válido")
+
+        view = memoryview(buffer)
+        offset = _HEADER.size
+        self._alphabet = bytes(view[offset:offset + alphabet_size]).decode("utf8")
+        offset += _align(alphabet_size)
+
+        def uint32s(quantity):
+            nonlocal offset
+            numbers = view[offset:offset + 4 * quantity].cast("I")
+            if sys.byteorder != "little":
+                numbers = array("I", numbers)
+                numbers.byteswap()
+            offset += 4 * quantity
+            return numbers
+
+        self._first_edge = uint32s(nodes + 1)
+        self._targets = uint32s(edges)
+        self._skips = uint32s(edges)
+        self._labels_offset = offset
+        offset += edges
+        self._final = view[offset:offset + nodes]
+
+        self._buffer = buffer
+        self._codes = {char: bytes([code]) for code, char in enumerate(self._alphabet, 1)}
+        self._letters = ["qu" if char == QU_SYMBOL else char for char in self._alphabet]
+        self._quantity = quantity
+        self.word = functools.lru_cache(maxsize=WORD_CACHE_SIZE)(self._word)
+
+    @classmethod
+    def from_words(cls, words):
+        """Arma el diccionario a partir de un iterable de palabras (en cualquier orden)."""
+        return cls(compile_words(words))
+
+    @classmethod
+    def from_file(cls, filepath, prepare=None):
+        """Arma el diccionario a partir de un archivo de texto con una palabra por línea.
+
+        Si se indica, `prepare` recibe las palabras y devuelve las que se cargan.
+        """
+        return cls.from_words(_read_words(filepath, prepare))
+
+    @classmethod
+    def load(cls, filepath):
+        """Abre un diccionario compilado, mapeándolo a memoria (sólo lectura)."""
+        with open(filepath, "rb") as fh:
+            return cls(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def step(self, node, text):
+        """Avanza desde el nodo siguiendo el texto; devuelve el nodo de llegada o None."""
+        if "q" in text:
+            text = text.replace("qu", QU_SYMBOL)
+        buffer = self._buffer
+        offset = self._labels_offset
+        first_edge = self._first_edge
+        for char in text:
+            code = self._codes.get(char)
+            if code is None:
+                return None
+            edge = buffer.find(code, offset + first_edge[node], offset + first_edge[node + 1])
+            if edge == -1:
+                return None
+            node = self._targets[edge - offset]
+        return node
+
+    def index(self, word):
+        """El número de la palabra (su posición en orden alfabético), o None si no está."""
+        if "q" in word:
+            word = word.replace("qu", QU_SYMBOL)
+        buffer = self._buffer
+        offset = self._labels_offset
+        first_edge = self._first_edge
+        node = ROOT
+        number = 0
+        for char in word:
+            code = self._codes.get(char)
+            if code is None:
+                return None
+            edge = buffer.find(code, offset + first_edge[node], offset + first_edge[node + 1])
+            if edge == -1:
+                return None
+            edge -= offset
+            number += self._skips[edge]
+            node = self._targets[edge]
+        return number if self._final[node] else None
+
+    def _word(self, number):
+        """La palabra con ese número (ver `index`); se usa como `word`, con cache."""
+        if not 0 <= number < self._quantity:
+            raise IndexError(f"No hay una palabra con el número {number}")
+        offset = self._labels_offset
+        chars = []
+        node = ROOT
+        while number or not self._final[node]:
+            # la última arista que no se pasa del número (las anteriores quedan antes)
+            edge = bisect.bisect_right(
+                self._skips, number, self._first_edge[node], self._first_edge[node + 1]) - 1
+            number -= self._skips[edge]
+            chars.append(self._letters[self._buffer[offset + edge] - 1])
+            node = self._targets[edge]
+        return "".join(chars)
+
+    def is_final(self, node):
+        """Indica si llegar a este nodo completa una palabra."""
+        return bool(self._final[node])
+
+    def has_prefix(self, prefix):
+        """Indica si hay alguna palabra que empiece con el prefijo."""
+        return self.step(ROOT, prefix) is not None
+
+    def __contains__(self, word):
+        node = self.step(ROOT, word)
+        return node is not None and self.is_final(node)
+
+    def __len__(self):
+        return self._quantity
+
+    def __iter__(self):
+        """Recorre todas las palabras, en orden alfabético."""
+        offset = self._labels_offset
+        stack = [(ROOT, "")]
+        while stack:
+            node, prefix = stack.pop()
+            if self._final[node]:
+                yield prefix
+            edges = range(self._first_edge[node], self._first_edge[node + 1])
+            for edge in reversed(edges):
+                char = self._letters[self._buffer[offset + edge] - 1]
+                stack.append((self._targets[edge], prefix + char))
+
+    def nbytes(self):
+        """Tamaño (en bytes) de las estructuras internas."""
+        return len(self._buffer)
+
+    def raw(self):
+        """Devuelve las estructuras internas del grafo, para recorrerlo en bloque (ej: numpy).
+
+        Son vistas de sólo lectura (sin copiar) de `first_edge`, `labels`, `targets` y `final`
+        (ver la descripción de la clase), más el alfabeto de los códigos de los labels (donde
+        la "qu" es `QU_SYMBOL`, ver `tokenize`).
+        """
+        labels_end = self._labels_offset + len(self._targets)
+        labels = memoryview(self._buffer)[self._labels_offset:labels_end]
+        return RawDictionary(
+            self._alphabet, self._first_edge, labels, self._targets, self._final)
+
+
+def _align(size):
+    """Redondea para arriba a múltiplo de 4."""
+    return (size + 3) & ~3
+
+
+def _read_words(filepath, prepare=None):
+    with open(filepath, encoding="utf8") as fh:
+        words = [line.strip() for line in fh if line.strip()]
+    return words if prepare is None else prepare(words)
+
+
+def compile_words(words):
+    """Arma el DAWG para las palabras y lo devuelve serializado en el formato binario."""
+    words = sorted({tokenize(word) for word in words}, key=_sort_key)
+    alphabet = "".join(sorted({char for word in words for char in word}, key=_sort_key))
+    if len(alphabet) > 255:
+        raise ValueError(f"Demasiados caracteres distintos: {len(alphabet)}")
+    codes = {char: code for code, char in enumerate(alphabet, 1)}
+
+    root, quantity = _build_dawg(words)
+
+    # cuántas palabras se arman desde cada nodo (los nodos compartidos se cuentan una vez)
+    counts = {}
+
+    def count(node):
+        key = id(node)
+        if key not in counts:
+            counts[key] = node.final + sum(map(count, node.edges.values()))
+        return counts[key]
+
+    count(root)
+
+    # numeramos los nodos recorriendo a lo ancho, para que la raíz quede primera
+    index_by_node = {id(root): ROOT}
+    nodes = [root]
+    for node in nodes:
+        for child in node.edges.values():
+            if id(child) not in index_by_node:
+                index_by_node[id(child)] = len(nodes)
+                nodes.append(child)
+
+    first_edge = array("I", [0])
+    labels = bytearray()
+    targets = array("I")
+    skips = array("I")
+    final = bytearray()
+    for node in nodes:
+        skipped = node.final
+        for char, child in node.edges.items():
+            labels.append(codes[char])
+            targets.append(index_by_node[id(child)])
+            skips.append(skipped)
+            skipped += counts[id(child)]
+        first_edge.append(len(targets))
+        final.append(node.final)
+
+    if sys.byteorder != "little":
+        first_edge.byteswap()
+        targets.byteswap()
+        skips.byteswap()
+
+    encoded_alphabet = alphabet.encode("utf8")
+    header = _HEADER.pack(
+        _MAGIC, _VERSION, len(nodes), len(targets), quantity, len(encoded_alphabet))
+    return b"".join([
+        header,
+        encoded_alphabet.ljust(_align(len(encoded_alphabet)), b"\0"),
+        first_edge.tobytes(),
+        targets.tobytes(),
+        skips.tobytes(),
+        bytes(labels),
+        bytes(final),
+    ])
+
+
+def compile_file(source_path, compiled_path, prepare=None):
+    """Compila el archivo de palabras (una por línea) al formato binario.
+
+    Si se indica, `prepare` recibe las palabras y devuelve las que se compilan.
+    """
+    data = compile_words(_read_words(source_path, prepare))
+    tmp_path = pathlib.Path(f"{compiled_path}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(compiled_path)
+    return len(data)
+
+
+def load(source_path, compiled_path, prepare=None):
+    """Carga el diccionario, usando la versión compilada si está al día con las palabras.
+
+    Si no, lo arma en memoria desde las palabras (pasándolas por `prepare`, si se indica).
+    Si no están las palabras (un idioma que sólo trae el compilado), usa el compilado directo.
+    """
+    source_path = pathlib.Path(source_path)
+    compiled_path = pathlib.Path(compiled_path)
+    if not source_path.exists():
+        return Dictionary.load(compiled_path)
+
+    try:
+        compiled_mtime = compiled_path.stat().st_mtime
+    except FileNotFoundError:
+        compiled_mtime = None
+
+    if compiled_mtime is not None and compiled_mtime >= source_path.stat().st_mtime:
+        try:
+            return Dictionary.load(compiled_path)
+        except ValueError:
+            # es de un formato viejo
+            pass
+
+    print(
+        f"WARNING: el diccionario compilado {str(compiled_path)!r} no existe o está viejo, "
+        "lo armamos en memoria (correr 'python -m botggle.dictionary compile')")
+    return Dictionary.from_file(source_path, prepare)
+
+
+class LazyDictionary:
+    """Un diccionario que recién se carga la primera vez que se lo usa."""
+
+    def __init__(self, source_path, compiled_path, prepare=None):
+        self.source_path = source_path
+        self.compiled_path = compiled_path
+        self.prepare = prepare
+        self._dictionary = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Devuelve el diccionario real, cargándolo si todavía no se hizo."""
+        if self._dictionary is None:
+            with self._lock:
+                if self._dictionary is None:
+                    self._dictionary = load(self.source_path, self.compiled_path, self.prepare)
+        return self._dictionary
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __contains__(self, word):
+        return word in self.get()
+
+    def __len__(self):
+        return len(self.get())
+
+    def __iter__(self):
+        return iter(self.get())
+
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(prog="python -m botggle.dictionary")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compile_parser = subparsers.add_parser("compile", help="compila las palabras a binario")
+    compile_parser.add_argument(
+        "source", nargs="?", help="por default, las palabras del idioma")
+    compile_parser.add_argument(
+        "destination", nargs="?", help="por default, al lado de las palabras del idioma")
+    compile_parser.add_argument(
+        "--language", help="el idioma de las palabras (por default, el del juego)")
+    compile_parser.add_argument(
+        "--raw", action="store_true", help="compilar las palabras tal cual, sin filtrarlas")
+    args = parser.parse_args(argv)
+
+    # las reglas de qué se puede jugar (dados, largo mínimo) son las del idioma
+    from botggle.languages import get_language
+    language = get_language(args.language)
+    source = args.source or language.words_path
+    destination = args.destination or language.compiled_path
+    size = compile_file(source, destination, None if args.raw else language.prepare_words)
+    print(f"Diccionario compilado en {str(destination)!r} ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
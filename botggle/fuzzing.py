@@ -0,0 +1,368 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Differential fuzzing of the board search against the reference implementation.
+
+Se tiran muchos tableros (cada uno con su propia semilla, así se puede reproducir) y para
+cada uno se arman palabras candidatas: palabras del diccionario (del tablero y al azar),
+caminos leídos en el tablero (algunos que repiten dados o vuelven al primero) y "casi
+aciertos" (palabras con una letra cambiada, agregada o sacada). Cada candidata se busca con
+la implementación de referencia (`_recursive_search`) y se compara contra:
+
+- "bitmask": `exists` con el motor rápido,
+- "solve": si está en la solución del tablero, y con un camino válido,
+- "batch": el `BatchSolver` de la simulación (si está numpy).
+
+Cada diferencia se guarda como un caso chico, en JSON, que se puede volver a correr:
+
+    python -m botggle.fuzzing --boards 1000000 --workers 8 --output casos
+    python -m botggle.fuzzing --replay casos/*.json
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import multiprocessing
+import pathlib
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from botggle.board import Board, DICES_BY_SIZE, neighbours
+from botggle.game import rae_words
+
+try:
+    from botggle import simulation
+except ImportError:
+    # sin numpy no se puede comparar contra el BatchSolver
+    simulation = None
+
+ENGINES = ("bitmask", "solve", "batch")
+
+# cuántos tableros procesa cada tarea del pool
+CHUNK_SIZE = 200
+
+# cuántas candidatas de cada tipo se arman por tablero
+PER_KIND = 20
+
+# qué proporción de los tableros son "difíciles": pocas caras distintas (así se repiten
+# mucho) y con las de dos letras, que es donde las reglas son más delicadas
+TRICKY_RATE = 0.3
+TRICKY_FACES = ("a", "a", "e", "s", "o", "u", "c", "h", "ch", "qu")
+
+# letras para los casi aciertos, además de las del tablero
+NEAR_MISS_LETTERS = "aeioushcq"
+
+
+def roll_board(rng, size, tricky=False):
+    """Tira un tablero con el generador `rng`; devuelve su distribución."""
+    if tricky:
+        faces = [rng.choice(TRICKY_FACES) for _ in range(size * size)]
+    else:
+        dices = list(DICES_BY_SIZE[size])
+        rng.shuffle(dices)
+        faces = [rng.choice(dice) for dice in dices]
+    return [faces[row * size:(row + 1) * size] for row in range(size)]
+
+
+def random_path(rng, size, length, legal=True):
+    """Un camino al azar por el tablero (posiciones vecinas).
+
+    Si es `legal`, no repite dados (salvo, a veces, el primero como último); si no, puede
+    pasar varias veces por el mismo.
+    """
+    around = neighbours(size)
+    path = [rng.randrange(size * size)]
+    while len(path) < length:
+        options = around[path[-1]]
+        if legal:
+            options = [position for position in options if position not in path]
+            if not options:
+                break
+        path.append(rng.choice(options))
+    if legal and len(path) > 2 and path[0] in around[path[-1]] and rng.random() < 0.2:
+        path.append(path[0])
+    return path
+
+
+def near_miss(rng, word, letters):
+    """Una variante de la palabra con un cambio chico."""
+    if not word:
+        return rng.choice(letters)
+    index = rng.randrange(len(word))
+    kind = rng.randrange(6)
+    if kind == 0:
+        return word[:index] + rng.choice(letters) + word[index + 1:]
+    if kind == 1:
+        return word[:index] + rng.choice(letters) + word[index:]
+    if kind == 2:
+        return word[:index] + word[index + 1:]
+    if kind == 3 and len(word) > 1:
+        index = min(index, len(word) - 2)
+        return word[:index] + word[index + 1] + word[index] + word[index + 2:]
+    if kind == 4:
+        # repetir la primera letra al final (la regla del primer dado)
+        return word + word[0]
+    return word + word
+
+
+def candidates(rng, distribution, dictionary, solution, per_kind=PER_KIND):
+    """Las palabras a buscar en el tablero, sin repetir y en orden al azar."""
+    size = len(distribution)
+    faces = [face for row in distribution for face in row]
+    words = rng.sample(sorted(solution), min(per_kind, len(solution)))
+    words.extend(dictionary.word(rng.randrange(len(dictionary))) for _ in range(per_kind))
+    for index in range(per_kind):
+        path = random_path(rng, size, rng.randint(1, 10), legal=index % 2 == 0)
+        words.append("".join(faces[position] for position in path))
+
+    letters = "".join(faces) + NEAR_MISS_LETTERS
+    words.extend(near_miss(rng, rng.choice(words), letters) for _ in range(per_kind))
+    words = list(dict.fromkeys(words))
+    rng.shuffle(words)
+    return words
+
+
+def is_valid_path(distribution, word, path):
+    """Si el camino arma la palabra respetando las reglas del tablero."""
+    size = len(distribution)
+    faces = [face for row in distribution for face in row]
+    if "".join(faces[position] for position in path) != word:
+        return False
+    around = neighbours(size)
+    if any(after not in around[before] for before, after in zip(path, path[1:])):
+        return False
+    # ningún dado se repite, salvo el primero como último (y si es de una letra)
+    if len(path) > 2 and path[-1] == path[0] and len(faces[path[0]]) == 1:
+        path = path[:-1]
+    return len(set(path)) == len(path)
+
+
+def reference_exists(distribution, word):
+    """Si la palabra está en el tablero, según la implementación de referencia."""
+    board = Board(distribution=distribution, engine="recursive")
+    return board._recursive_search(word, board._word_graph.keys(), [])
+
+
+def _case(seed, index, engine, distribution, word, expected, got):
+    return {
+        "seed": seed, "board": index, "engine": engine, "distribution": distribution,
+        "word": word, "expected": expected, "got": got,
+    }
+
+
+@dataclass
+class FuzzResult:
+    """Lo que se comparó y las diferencias encontradas."""
+
+    counts: collections.Counter = field(default_factory=collections.Counter)
+    cases: List[Dict] = field(default_factory=list)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.cases.extend(other.cases)
+
+
+def fuzz_board(seed, index, dictionary, engines=ENGINES, per_kind=PER_KIND, sizes=None):
+    """Tira el tablero `index` de la semilla y compara las búsquedas; devuelve un FuzzResult.
+
+    Además de los resultados, devuelve la distribución y la solución (para el "batch", que
+    se compara después para todo el lote junto).
+    """
+    rng = random.Random(f"{seed}:{index}")
+    size = rng.choice(sorted(DICES_BY_SIZE) if sizes is None else sizes)
+    distribution = roll_board(rng, size, tricky=rng.random() < TRICKY_RATE)
+    solution = Board(distribution=distribution).solve(dictionary)
+    words = candidates(rng, distribution, dictionary, solution, per_kind)
+
+    result = FuzzResult()
+    result.counts["boards"] += 1
+    reference = Board(distribution=distribution, engine="recursive")
+    fast = Board(distribution=distribution)
+    for word in words:
+        expected = reference.exists(word)
+        result.counts["words"] += 1
+        if "bitmask" in engines:
+            got = fast.exists(word)
+            if got != expected:
+                result.cases.append(
+                    _case(seed, index, "bitmask", distribution, word, expected, got))
+        if "solve" in engines and word in dictionary:
+            result.counts["solve_words"] += 1
+            got = word in solution and is_valid_path(distribution, word, solution[word])
+            if got != expected:
+                result.cases.append(_case(seed, index, "solve", distribution, word, expected, got))
+
+    # lo que encuentra `solve` (que no sea candidata) también tiene que estar
+    if "solve" in engines:
+        for word, path in solution.items():
+            result.counts["solve_words"] += 1
+            if not (reference.exists(word) and is_valid_path(distribution, word, path)):
+                result.cases.append(_case(seed, index, "solve", distribution, word, False, True))
+    return result, distribution, solution
+
+
+def _fuzz_batch(seed, indexes, distributions, solutions, dictionary):
+    """Compara el BatchSolver contra la referencia, para los tableros de un lote."""
+    result = FuzzResult()
+    by_size = collections.defaultdict(list)
+    for index, distribution, solution in zip(indexes, distributions, solutions):
+        by_size[len(distribution)].append((index, distribution, solution))
+
+    for size, boards in by_size.items():
+        solver = simulation._get_solver(size)
+        face_index = {face: number for number, face in enumerate(solver.dice_set.faces)}
+        rows = [
+            [face_index[face] for row in distribution for face in row]
+            for _, distribution, _ in boards]
+        found_boards, found_words, _ = solver.solve(simulation.np.array(rows, dtype=int))
+        found = collections.defaultdict(set)
+        for board, number in zip(found_boards.tolist(), found_words.tolist()):
+            found[board].add(dictionary.word(number))
+
+        for position, (index, distribution, solution) in enumerate(boards):
+            result.counts["batch_boards"] += 1
+            for word in found[position].symmetric_difference(solution):
+                expected = reference_exists(distribution, word)
+                got = word in found[position]
+                if got != expected:
+                    result.cases.append(
+                        _case(seed, index, "batch", distribution, word, expected, got))
+    return result
+
+
+def fuzz_chunk(seed, start, quantity, engines=ENGINES, per_kind=PER_KIND, sizes=None):
+    """Compara las búsquedas en los tableros `start` a `start + quantity` de la semilla."""
+    dictionary = rae_words.get()
+    result = FuzzResult()
+    indexes, distributions, solutions = [], [], []
+    for index in range(start, start + quantity):
+        board_result, distribution, solution = fuzz_board(
+            seed, index, dictionary, engines, per_kind, sizes)
+        result.merge(board_result)
+        indexes.append(index)
+        distributions.append(distribution)
+        solutions.append(solution)
+
+    if "batch" in engines:
+        result.merge(_fuzz_batch(seed, indexes, distributions, solutions, dictionary))
+    return result
+
+
+def fuzz(boards, seed=0, workers=1, engines=ENGINES, per_kind=PER_KIND, sizes=None):
+    """Compara las búsquedas en `boards` tableros, repartidos en `workers` procesos.
+
+    Devuelve un FuzzResult (con todos los casos en que hubo diferencias) y cuántos tableros
+    por segundo se procesaron.
+    """
+    engines = tuple(engines)
+    if "batch" in engines and simulation is None:
+        print("WARNING: sin numpy no se compara contra el BatchSolver", file=sys.stderr)
+        engines = tuple(engine for engine in engines if engine != "batch")
+
+    # el diccionario (y los solvers) se arman antes de crear los procesos, así los heredan
+    rae_words.get()
+    if "batch" in engines:
+        for size in sorted(DICES_BY_SIZE) if sizes is None else sizes:
+            simulation._get_solver(size)
+
+    tasks = [
+        (seed, start, min(CHUNK_SIZE, boards - start), engines, per_kind, sizes)
+        for start in range(0, boards, CHUNK_SIZE)]
+    started = time.perf_counter()
+    if workers > 1:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            results = pool.starmap(fuzz_chunk, tasks)
+    else:
+        results = [fuzz_chunk(*task) for task in tasks]
+    elapsed = time.perf_counter() - started
+
+    result = FuzzResult()
+    for chunk_result in results:
+        result.merge(chunk_result)
+    return result, boards / elapsed if elapsed else 0
+
+
+def save_case(case, directory):
+    """Guarda el caso en el directorio (con un nombre que depende de su contenido)."""
+    serialized = json.dumps(case, ensure_ascii=False, sort_keys=True)
+    digest = hashlib.sha1(serialized.encode("utf8")).hexdigest()[:12]
+    path = pathlib.Path(directory) / f"{case['engine']}-{digest}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(serialized + "\n", encoding="utf8")
+    return path
+
+
+def replay(case, dictionary=None):
+    """Vuelve a correr un caso; devuelve (lo que da la referencia, lo que da el motor) ahora."""
+    if dictionary is None:
+        dictionary = rae_words.get()
+    distribution = case["distribution"]
+    word = case["word"]
+    expected = reference_exists(distribution, word)
+
+    engine = case["engine"]
+    if engine == "bitmask":
+        got = Board(distribution=distribution).exists(word)
+    elif engine == "solve":
+        solution = Board(distribution=distribution).solve(dictionary)
+        got = word in solution and is_valid_path(distribution, word, solution[word])
+    elif engine == "batch":
+        if simulation is None:
+            raise RuntimeError("Para los casos del BatchSolver hace falta numpy")
+        solver = simulation.BatchSolver(simulation.DiceSet(len(distribution)), dictionary)
+        face_index = {face: number for number, face in enumerate(solver.dice_set.faces)}
+        row = [face_index[face] for line in distribution for face in line]
+        _, found_words, _ = solver.solve(simulation.np.array([row], dtype=int))
+        got = word in {dictionary.word(number) for number in found_words.tolist()}
+    else:
+        raise ValueError(f"Motor desconocido: {engine!r}")
+    return expected, got
+
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(prog="python -m botggle.fuzzing")
+    parser.add_argument("--boards", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--size", type=int, action="append", help="(por default, todos)")
+    parser.add_argument(
+        "--engine", action="append", choices=ENGINES, help="(por default, todos)")
+    parser.add_argument("--per-kind", type=int, default=PER_KIND)
+    parser.add_argument("--output", default="fuzz_cases", help="dónde guardar las diferencias")
+    parser.add_argument("--replay", nargs="+", help="volver a correr casos guardados")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        failing = 0
+        for path in args.replay:
+            case = json.loads(pathlib.Path(path).read_text(encoding="utf8"))
+            expected, got = replay(case)
+            status = "OK" if expected == got else "FALLA"
+            failing += expected != got
+            print(
+                f"{status} {path}: {case['word']!r} ({case['engine']}: {got}, "
+                f"debería {expected})")
+        return 1 if failing else 0
+
+    result, speed = fuzz(
+        args.boards, args.seed, args.workers, args.engine or ENGINES, args.per_kind, args.size)
+    counts = result.counts
+    print(
+        f"{counts['boards']} tableros ({speed:.0f} por segundo), {counts['words']} candidatas; "
+        f"{counts['solve_words']} comparadas con solve, {counts['batch_boards']} tableros con "
+        "el BatchSolver")
+    by_engine = collections.Counter(case["engine"] for case in result.cases)
+    print("diferencias: " + ", ".join(f"{engine}={by_engine[engine]}" for engine in ENGINES))
+    for case in result.cases:
+        print(f"  guardado en {save_case(case, args.output)}")
+    return 1 if result.cases else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,33 +5,27 @@
 """The Game class and a couple of helpers."""
 
 import enum
-import itertools
-from collections import defaultdict
-from dataclasses import dataclass, field
+import sys
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
 from typing import Set
 
-SCORES_TABLE = {
-    3: 1,
-    4: 2,
-    5: 4,
-    6: 7,
-    7: 11,
-    8: 16,
-    9: 22,
-    10: 29,
-    11: 37,
-    12: 46,
-    13: 56,
-    14: 67,
-}
-MIN_WORD_LENGTH = min(SCORES_TABLE)
-MAX_WORD_LENGTH = max(SCORES_TABLE)
-MAX_WORD_SCORE = 79
-
-
-# load the RAE words
-with open("rae_words.txt") as fh:
-    rae_words = {line.strip() for line in fh}
+from botggle.dictionary import LazyDictionary
+from botggle.languages import SPANISH, get_language
+
+# las reglas del idioma default (castellano), para lo que no depende de un juego en particular
+SCORES_TABLE = SPANISH.scores_table
+MIN_WORD_LENGTH = SPANISH.min_word_length
+MAX_WORD_LENGTH = SPANISH.max_word_length
+MAX_WORD_SCORE = SPANISH.max_word_score
+PLAYABLE_LETTERS = SPANISH.playable_letters
+prepare_rae_words = SPANISH.prepare_words
+word_score = SPANISH.word_score
+
+# the RAE words, really loaded the first time they're used
+rae_words = SPANISH.words
 
 
 class TransitionError(Exception):
@@ -43,6 +37,8 @@ class NotActiveError(Exception):
 
 
 class Player:
+    __slots__ = ("username", "ready", "game", "chat")
+
     def __init__(self, username, game):
         self.username = username
         self.ready = False
@@ -50,7 +46,7 @@ class Player:
         self.chat = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ResultWords:
     valid: Set[str] = field(default_factory=set)
     repeated: Set[str] = field(default_factory=set)
@@ -58,26 +54,148 @@ class ResultWords:
     not_in_board: Set[str] = field(default_factory=set)
 
 
+# cómo queda clasificada cada palabra: el código es la posición del campo en ResultWords
+STATUS_NAMES = tuple(result_field.name for result_field in fields(ResultWords))
+VALID, REPEATED, NOT_IN_LANGUAGE, NOT_IN_BOARD = range(len(STATUS_NAMES))
+
+
+class RoundWords(Mapping):
+    """Las palabras que mandó cada jugadore en la ronda, guardadas como números.
+
+    Cada palabra se guarda con su número en el diccionario (ver `Dictionary.index`), en un
+    `array` por jugadore; las que no están en el diccionario (que igual hay que mostrar) se
+    anotan una sola vez por ronda y van con números negativos. Para saber en tiempo constante
+    si le jugadore ya la tenía, la ronda guarda (una sola vez por palabra) qué jugadores la
+    mandaron, como una máscara de bits con un bit por jugadore. Se usa como un dict de
+    username -> set de palabras.
+    """
+
+    __slots__ = (
+        "_dictionary", "_index", "_word", "_extra_words", "_extra_numbers", "_by_player",
+        "_player_bits", "_sent_by")
+
+    def __init__(self, dictionary):
+        self._dictionary = dictionary
+        self._index = self._word = None  # se buscan recién al usarse (cargando el diccionario)
+        self._extra_words = []
+        self._extra_numbers = {}
+        self._by_player = {}
+        self._player_bits = {}
+        self._sent_by = {}
+
+    def _resolve(self):
+        dictionary = self._dictionary
+        if isinstance(dictionary, LazyDictionary):
+            dictionary = dictionary.get()
+        # los diccionarios que no numeran sus palabras (ej: un set) van todas como extras
+        self._index = getattr(dictionary, "index", None) or (lambda word: None)
+        self._word = getattr(dictionary, "word", None)
+
+    def find(self, word):
+        """El número de la palabra, o None si no está en el diccionario ni se anotó."""
+        if self._index is None:
+            self._resolve()
+        number = self._index(word)
+        if number is None:
+            number = self._extra_numbers.get(word)
+        return number
+
+    def number(self, word):
+        """El número de la palabra (anotándola, si no está en el diccionario)."""
+        number = self.find(word)
+        if number is None:
+            word = sys.intern(word)
+            number = self._extra_numbers[word] = -1 - len(self._extra_words)
+            self._extra_words.append(word)
+        return number
+
+    def word(self, number):
+        """La palabra que corresponde al número."""
+        if number < 0:
+            return self._extra_words[-1 - number]
+        if self._word is None:
+            self._resolve()
+        return self._word(number)
+
+    def add(self, username, word):
+        """Agrega la palabra a le jugadore; devuelve su número y si no la tenía de antes."""
+        number = self.number(word)
+        bit = self._player_bits.get(username)
+        if bit is None:
+            bit = self._player_bits[username] = 1 << len(self._player_bits)
+            self._by_player[username] = array("i")
+        sent_by = self._sent_by.get(number, 0)
+        if sent_by & bit:
+            return number, False
+        self._sent_by[number] = sent_by | bit
+        self._by_player[username].append(number)
+        return number, True
+
+    def numbers(self, username):
+        """Los números de las palabras de le jugadore, en el orden en que llegaron."""
+        return self._by_player[username]
+
+    def words(self):
+        """Todas las palabras distintas de la ronda."""
+        return {self.word(number) for number in self._sent_by}
+
+    def nbytes(self, username=None):
+        """Memoria que ocupan las palabras de le jugadore.
+
+        Si no se indica, lo que se comparte en la ronda: las palabras extras y quién mandó cada
+        palabra, contando también los números y strings que guardan.
+        """
+        if username is not None:
+            numbers = self._by_player.get(username)
+            return 0 if numbers is None else sys.getsizeof(numbers)
+        total = sys.getsizeof(self) + sys.getsizeof(self._by_player)
+        total += sys.getsizeof(self._extra_words) + sum(map(sys.getsizeof, self._extra_words))
+        for container in (self._extra_numbers, self._player_bits, self._sent_by):
+            total += sys.getsizeof(container) + sum(map(sys.getsizeof, container.values()))
+        # las claves de las extras son los mismos strings de la lista (ya contados) y las de
+        # les jugadores sus usernames
+        return total + sum(map(sys.getsizeof, self._sent_by))
+
+    def __getitem__(self, username):
+        return {self.word(number) for number in self._by_player[username]}
+
+    def __iter__(self):
+        return iter(self._by_player)
+
+    def __len__(self):
+        return len(self._by_player)
+
+
 class Game:
     """Representa un juego completo, que se compone por varias rondas."""
 
     State = enum.Enum("State", "WAITING ACTIVE STOPPED")
-    _cleaning_table = str.maketrans(
-        """.,;:'"-_=+[]{}áéíóú""",
-        """              aeiou""",
-    )
 
-    def __init__(self, chat):
+    def __init__(self, chat, board_size=4, language=None):
+        # el idioma decide las palabras válidas, cómo se normalizan y cuánto vale cada una
+        self.language = get_language() if language is None else language
         self.players = []
         self.full_scores = {}
         self._state = self.State.WAITING
-        self.round_words = defaultdict(set)
+        self.round_words = RoundWords(self.language.words)
         self.board = None
+        self.board_size = board_size
+
+        # cómo quedó clasificada cada palabra de la ronda, por número (se hace a medida que
+        # llegan, una sola vez por más que la manden varies jugadores), y cuántas veces se
+        # aprovechó eso
+        self._word_status = {}
+        self.lookup_counts = Counter()
 
         # no lo usamos internamente, pero lo guardamos acá porque es el
         # grupo público donde el juego fue arrancado
         self.chat = chat
 
+    @property
+    def state(self):
+        """En qué estado está el juego (ver `State`); sólo lo cambian las transiciones."""
+        return self._state
+
     def add_player(self, username):
         """Carga une jugadore en el juego."""
         player = Player(username, self)
@@ -90,7 +208,9 @@ class Game:
         if self._state != self.State.WAITING:
             raise TransitionError("Start sin estar en WAITING")
         self.board = board
-        self.round_words = defaultdict(set)
+        self.round_words = RoundWords(self.language.words)
+        self._word_status = {}
+        self.lookup_counts = Counter()
         self._state = self.State.ACTIVE
 
     def next_round(self):
@@ -101,6 +221,10 @@ class Game:
         for player in self.players:
             player.ready = False
 
+        # lo que se guardó para evaluar las palabras ya no hace falta
+        self._word_status = {}
+        self.board.release()
+
     def stop_round(self):
         """Termina la ronda (para dejar de recibir palabras)."""
         if self._state != self.State.ACTIVE:
@@ -108,50 +232,119 @@ class Game:
         self._state = self.State.STOPPED
 
     def add_text(self, username, text):
-        """Agrega una o más palabras a le usuarie si la ronda no está frenada."""
+        """Agrega una o más palabras a le usuarie si la ronda no está frenada.
+
+        Devuelve las palabras que efectivamente se agregaron (las que no tenía de antes).
+        """
         if self._state != self.State.ACTIVE:
             raise NotActiveError(f"Se intentó agregar texto cuando el estado es {self._state}")
 
-        text = text.lower()
-        text = text.translate(self._cleaning_table)
+        text = self.language.normalize(text)
+        added = []
         for word in text.split():
-            self.round_words[username].add(word)
+            number, is_new = self.round_words.add(username, word)
+            if is_new:
+                added.append(word)
+            self._classify(number)
+        return added
+
+    def _classify(self, number):
+        """Clasifica la palabra (una sola vez por ronda); devuelve el código de su estado."""
+        status = self._word_status.get(number)
+        if status is None:
+            self.lookup_counts["misses"] += 1
+            word = self.round_words.word(number)
+            if number < 0 and word not in self.language.words:
+                # la palabra no está en el diccionario (las que están ya tienen su número)
+                status = NOT_IN_LANGUAGE
+            elif word not in self.board.solve(self.language.words):
+                # la palabra no está en el tablero (la solución se calcula una sola vez)
+                status = NOT_IN_BOARD
+            else:
+                status = VALID
+            self._word_status[number] = status
+        else:
+            self.lookup_counts["hits"] += 1
+        return status
+
+    def word_status(self, word):
+        """Cómo quedó clasificada la palabra en la ronda (el campo de ResultWords), o None."""
+        # sin anotarla: preguntar por una palabra no la agrega a la ronda
+        status = self._word_status.get(self.round_words.find(word))
+        return None if status is None else STATUS_NAMES[status]
 
     def evaluate_words(self):
-        """Evalúa qué palabras son válidas y marca las repetidas."""
+        """Evalúa qué palabras son válidas y marca las repetidas.
+
+        Las palabras ya se fueron clasificando a medida que llegaron, así que acá casi que sólo
+        queda resolver las repetidas entre jugadores.
+        """
+        round_words = self.round_words
+        word_status = self._word_status
+
+        # las que todavía no se clasificaron (ej: en un juego restaurado), y en cuántos
+        # jugadores es válida cada palabra
+        valid_counts = Counter()
+        for username in round_words:
+            numbers = round_words.numbers(username)
+            for number in numbers:
+                self._classify(number)
+            valid_counts.update(number for number in numbers if word_status[number] == VALID)
+
+        # recién acá se pasan los números a palabras, una sola vez cada uno
+        words = {}
         full_result = {}
-        for username, words in self.round_words.items():
+        for username in round_words:
             full_result[username] = result_words = ResultWords()
+            by_status = [getattr(result_words, name) for name in STATUS_NAMES]
+            for number in round_words.numbers(username):
+                status = word_status[number]
+                if status == VALID and valid_counts[number] > 1:
+                    status = REPEATED
+                try:
+                    word = words[number]
+                except KeyError:
+                    word = words[number] = round_words.word(number)
+                by_status[status].add(word)
+        return full_result
 
-            for word in words:
-                if word not in rae_words:
-                    # la palabra no está en el diccionario
-                    result_words.not_in_language.add(word)
-                elif not self.board.exists(word):
-                    # la palabra no está en el tablero
-                    result_words.not_in_board.add(word)
-                else:
-                    result_words.valid.add(word)
+    def missed_words(self):
+        """Las palabras del tablero (de las que dan puntos) que nadie mandó en la ronda.
 
-        for rword1, rword2 in itertools.combinations(full_result.values(), 2):
-            repes = rword1.valid & rword2.valid
-            rword1.repeated.update(repes)
-            rword2.repeated.update(repes)
+        Sale de la solución del tablero, que normalmente ya se calculó al generarlo.
+        """
+        sent = self.round_words.words()
+        min_length = self.language.min_word_length
+        return {
+            word for word in self.board.solve(self.language.words)
+            if len(word) >= min_length and word not in sent}
 
-        for rword in full_result.values():
-            rword.valid -= rword.repeated
+    def memory_report(self):
+        """Cuánta memoria ocupa (aproximadamente, en bytes) el juego y cada jugadore.
 
-        return full_result
+        Para las palabras de la ronda, se compara con lo que ocuparían como un set de strings
+        por jugadore (`words_as_sets`).
+        """
+        players = {}
+        for player in self.players:
+            words = self.round_words.get(player.username, set())
+            players[player.username] = {
+                "player": sys.getsizeof(player),
+                "words": self.round_words.nbytes(player.username),
+                "words_as_sets": sys.getsizeof(words) + sum(map(sys.getsizeof, words)),
+            }
+        game = {
+            "game": (
+                sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+                + sys.getsizeof(self.players) + sys.getsizeof(self.full_scores)),
+            "word_status": sys.getsizeof(self._word_status),
+            "round_words": self.round_words.nbytes(),
+        }
+        return {"game": game, "players": players}
 
     def _calculate_scores(self, result_words):
         """Devuelve el puntaje total para una lista de palabras válidas."""
-        score = 0
-        for word in result_words.valid:
-            if len(word) > MAX_WORD_LENGTH:
-                score += MAX_WORD_SCORE
-            else:
-                score += SCORES_TABLE.get(len(word), 0)
-        return score
+        return sum(map(self.language.word_score, result_words.valid))
 
     def summarize_scores(self, user_words):
         """Cierra la ronda, evalúa las palabras y hace el resumen de los scores."""
@@ -0,0 +1,130 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Generación de tableros con una calidad mínima garantizada.
+
+Los tableros se tiran al azar, se resuelven contra el diccionario, y si no llegan a los
+umbrales pedidos se descartan y se vuelve a tirar. Para medir cuántos tableros por segundo
+se aceptan con ciertos umbrales:
+
+    python -m botggle.generation --min-words 50 --seconds 5
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+
+from botggle.board import Board
+from botggle.languages import get_language
+
+
+@dataclass(frozen=True)
+class BoardQuality:
+    """Umbrales mínimos que tiene que cumplir un tablero (0 es "sin mínimo")."""
+
+    min_words: int = 0
+    min_score: int = 0
+    min_longest: int = 0
+
+
+@dataclass(frozen=True)
+class BoardStats:
+    """Lo que se puede lograr en un tablero, contando sólo palabras que dan puntos."""
+
+    words: int
+    score: int
+    longest: int
+
+    @classmethod
+    def from_solution(cls, solution, language=None):
+        """Arma las estadísticas a partir de las palabras que tiene el tablero."""
+        language = get_language() if language is None else language
+        playable = [word for word in solution if len(word) >= language.min_word_length]
+        return cls(
+            words=len(playable),
+            score=sum(map(language.word_score, playable)),
+            longest=max(map(len, playable), default=0),
+        )
+
+    def satisfies(self, quality):
+        """Indica si el tablero llega a todos los umbrales pedidos."""
+        return (
+            self.words >= quality.min_words
+            and self.score >= quality.min_score
+            and self.longest >= quality.min_longest
+        )
+
+    def _rank(self):
+        return (self.words, self.score, self.longest)
+
+
+def generate_board(
+        quality=BoardQuality(), dictionary=None, max_attempts=200, size=4, language=None):
+    """Tira tableros hasta encontrar uno que cumpla con la calidad pedida.
+
+    Los dados, y las palabras si no se pasa otro diccionario, son los del idioma (por default,
+    castellano). El tablero devuelto ya queda resuelto contra el diccionario. Si en
+    `max_attempts` intentos ninguno cumple, se devuelve el mejor de todos los que se tiraron
+    (para no trabar la ronda).
+    """
+    language = get_language() if language is None else language
+    if dictionary is None:
+        dictionary = language.words.get()
+    dices = language.dices_by_size.get(size)
+    if dices is None:
+        raise ValueError(f"No hay dados en {language.title} para tableros de {size}x{size}")
+
+    best_board = best_stats = None
+    for _ in range(max_attempts):
+        board = Board(size, dices=dices)
+        stats = BoardStats.from_solution(board.solve(dictionary), language)
+        if stats.satisfies(quality):
+            return board
+        if best_stats is None or stats._rank() > best_stats._rank():
+            best_board, best_stats = board, stats
+    return best_board
+
+
+def measure_throughput(quality=BoardQuality(), dictionary=None, seconds=5, size=4):
+    """Mide cuántos tableros por segundo se generan y cuántos pasan los umbrales."""
+    if dictionary is None:
+        dictionary = get_language().words.get()
+
+    attempts = accepted = 0
+    started = time.monotonic()
+    elapsed = 0
+    while elapsed < seconds:
+        stats = BoardStats.from_solution(Board(size).solve(dictionary))
+        attempts += 1
+        if stats.satisfies(quality):
+            accepted += 1
+        elapsed = time.monotonic() - started
+
+    return {
+        "attempts_per_second": attempts / elapsed,
+        "accepted_per_second": accepted / elapsed,
+        "acceptance_rate": accepted / attempts,
+    }
+
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(prog="python -m botggle.generation")
+    parser.add_argument("--min-words", type=int, default=0)
+    parser.add_argument("--min-score", type=int, default=0)
+    parser.add_argument("--min-longest", type=int, default=0)
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args(argv)
+
+    quality = BoardQuality(args.min_words, args.min_score, args.min_longest)
+    result = measure_throughput(quality, seconds=args.seconds, size=args.size)
+    print(f"Calidad pedida: {quality} (tablero de {args.size}x{args.size})")
+    print(f"Tableros tirados por segundo:  {result['attempts_per_second']:8.1f}")
+    print(f"Tableros aceptados por segundo: {result['accepted_per_second']:8.1f}")
+    print(f"Tasa de aceptación:            {result['acceptance_rate']:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
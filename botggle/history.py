@@ -0,0 +1,252 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""History of the finished rounds, with pre-aggregated stats and leaderboards.
+
+Cada ronda terminada se agrega a un registro (que nunca se modifica): el tablero y, por cada
+jugadore, su puntaje y cuántas palabras le quedaron en cada categoría. En la misma
+transacción se actualizan los acumulados por jugadore (en total y por chat), así el ranking
+se lee de ahí sin recorrer la historia.
+
+Anotar una ronda sólo la guarda en memoria; se escriben todas juntas en cada `flush`, que se
+puede llamar desde otro hilo (así la escritura no frena al loop).
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from botggle.game import STATUS_NAMES, word_score
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rounds (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        finished REAL NOT NULL,
+        board TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS round_players (
+        round_id INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        valid INTEGER NOT NULL,
+        repeated INTEGER NOT NULL,
+        not_in_language INTEGER NOT NULL,
+        not_in_board INTEGER NOT NULL,
+        PRIMARY KEY (round_id, username)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS player_stats (
+        username TEXT PRIMARY KEY,
+        rounds INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        points INTEGER NOT NULL,
+        valid_words INTEGER NOT NULL,
+        best_word TEXT,
+        best_word_score INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS chat_stats (
+        chat_id INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        rounds INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        points INTEGER NOT NULL,
+        valid_words INTEGER NOT NULL,
+        best_word TEXT,
+        best_word_score INTEGER NOT NULL,
+        PRIMARY KEY (chat_id, username)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS chat_stats_points ON chat_stats (chat_id, points DESC);
+"""
+
+# cómo se suma una ronda a los acumulados (la mejor palabra sólo cambia si la nueva da más)
+_UPSERT_STATS = """
+    INSERT INTO {table} VALUES ({keys}, 1, ?, ?, ?, ?, ?)
+    ON CONFLICT DO UPDATE SET
+        rounds = rounds + 1,
+        wins = wins + excluded.wins,
+        points = points + excluded.points,
+        valid_words = valid_words + excluded.valid_words,
+        best_word = CASE
+            WHEN excluded.best_word_score > best_word_score THEN excluded.best_word
+            ELSE best_word END,
+        best_word_score = MAX(best_word_score, excluded.best_word_score)
+"""
+_UPSERT_PLAYER_STATS = _UPSERT_STATS.format(table="player_stats", keys="?")
+_UPSERT_CHAT_STATS = _UPSERT_STATS.format(table="chat_stats", keys="?, ?")
+
+_STATS_COLUMNS = "username, rounds, wins, points, valid_words, best_word, best_word_score"
+
+# cuántes jugadores se muestran en el ranking de un chat
+RANKING_SIZE = 10
+
+
+def _encode_board(distribution):
+    # las caras pueden tener más de una letra ("qu"), así que van separadas
+    return ",".join(face for row in distribution for face in row)
+
+
+def _decode_board(encoded):
+    faces = encoded.split(",")
+    size = math.isqrt(len(faces))
+    return [faces[row * size:(row + 1) * size] for row in range(size)]
+
+
+@dataclass
+class PlayerRound:
+    """Cómo le fue a une jugadore en una ronda: puntaje y cuántas palabras de cada tipo."""
+
+    username: str
+    score: int
+    valid: int
+    repeated: int
+    not_in_language: int
+    not_in_board: int
+
+
+@dataclass
+class RoundRecord:
+    """Una ronda terminada, tal como quedó en el registro."""
+
+    chat_id: int
+    finished: float
+    board: List[List[str]]
+    players: List[PlayerRound]
+
+
+@dataclass
+class PlayerStats:
+    """Los acumulados de une jugadore (en todos los chats, o en uno)."""
+
+    username: str
+    rounds: int
+    wins: int
+    points: int
+    valid_words: int
+    best_word: Optional[str]
+    best_word_score: int
+
+    @property
+    def win_rate(self):
+        """En qué proporción de las rondas que jugó sacó el mayor puntaje."""
+        return self.wins / self.rounds if self.rounds else 0
+
+
+class HistoryStore:
+    """Guarda la historia de las rondas en una base SQLite (en modo WAL)."""
+
+    def __init__(self, path):
+        # la base se usa desde el hilo que hace el flush y desde el del loop
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._pending_rounds = []
+
+    def close(self):
+        """Escribe lo pendiente y cierra la base."""
+        self.flush()
+        self._connection.close()
+
+    def record_round(
+            self, chat_id, board, user_words, round_scores, finished=None,
+            word_score=word_score):
+        """Anota una ronda terminada; se escribe en el próximo `flush`.
+
+        `user_words` son los ResultWords de cada jugadore y `round_scores` sus puntajes; la
+        mejor palabra de cada une se elige según `word_score` (la del idioma del juego).
+        """
+        players = [
+            PlayerRound(
+                username, round_scores[username],
+                *(len(getattr(result_words, name)) for name in STATUS_NAMES))
+            for username, result_words in user_words.items()]
+        best_words = {}
+        for username, result_words in user_words.items():
+            if result_words.valid:
+                score, word = max((word_score(word), word) for word in result_words.valid)
+                best_words[username] = (word, score)
+        record = RoundRecord(
+            chat_id, time.time() if finished is None else finished, board, players)
+        with self._lock:
+            self._pending_rounds.append((record, best_words))
+
+    def _write_pending_rounds(self):
+        pending, self._pending_rounds = self._pending_rounds, []
+        for record, best_words in pending:
+            cursor = self._connection.execute(
+                "INSERT INTO rounds (chat_id, finished, board) VALUES (?, ?, ?)",
+                (record.chat_id, record.finished, _encode_board(record.board)))
+            round_id = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT INTO round_players VALUES (?, ?, ?, ?, ?, ?, ?)", [
+                    (
+                        round_id, player.username, player.score, player.valid,
+                        player.repeated, player.not_in_language, player.not_in_board)
+                    for player in record.players])
+
+            # gana la ronda quien (o quienes, si empatan) hizo más puntos, si alguien hizo
+            max_score = max((player.score for player in record.players), default=0)
+            for player in record.players:
+                best_word, best_word_score = best_words.get(player.username, (None, 0))
+                values = (
+                    int(0 < player.score == max_score), player.score, player.valid, best_word,
+                    best_word_score)
+                self._connection.execute(_UPSERT_PLAYER_STATS, (player.username, *values))
+                self._connection.execute(
+                    _UPSERT_CHAT_STATS, (record.chat_id, player.username, *values))
+
+    def flush(self):
+        """Escribe todas las rondas pendientes (con sus acumulados) en una sola transacción."""
+        with self._lock:
+            if self._pending_rounds:
+                with self._connection:
+                    self._write_pending_rounds()
+
+    def ranking(self, chat_id, limit=RANKING_SIZE):
+        """Les jugadores del chat con más puntos (sumando todas las rondas jugadas ahí)."""
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {_STATS_COLUMNS} FROM chat_stats WHERE chat_id = ? "
+                "ORDER BY points DESC, username LIMIT ?", (chat_id, limit)).fetchall()
+        return [PlayerStats(*row) for row in rows]
+
+    def player_stats(self, username):
+        """Los acumulados de une jugadore en todos los chats, o None si nunca jugó."""
+        self.flush()
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {_STATS_COLUMNS} FROM player_stats WHERE username = ?",
+                (username,)).fetchone()
+        return None if row is None else PlayerStats(*row)
+
+    def load_rounds(self, chat_id=None):
+        """Las rondas registradas (todas, o las de un chat), en el orden en que terminaron."""
+        self.flush()
+        query = "SELECT id, chat_id, finished, board FROM rounds"
+        params = ()
+        if chat_id is not None:
+            query += " WHERE chat_id = ?"
+            params = (chat_id,)
+        with self._lock:
+            records = {
+                round_id: RoundRecord(chat_id, finished, _decode_board(board), [])
+                for round_id, chat_id, finished, board in self._connection.execute(
+                    query + " ORDER BY id", params)}
+            players = self._connection.execute(
+                "SELECT * FROM round_players ORDER BY round_id, username").fetchall()
+        for round_id, *values in players:
+            if round_id in records:
+                records[round_id].players.append(PlayerRound(*values))
+        return list(records.values())
+
+    def stats(self) -> Dict[str, int]:
+        """Cuántas rondas hay registradas y cuántas esperando el próximo `flush`."""
+        with self._lock:
+            (rounds,) = self._connection.execute("SELECT COUNT(*) FROM rounds").fetchone()
+            return {"rounds": rounds, "pending": len(self._pending_rounds)}
@@ -0,0 +1,152 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""The languages a game can be played in, and their registry.
+
+Cada idioma junta todo lo que depende de él: las palabras válidas, los dados, cómo se
+normaliza el texto y la tabla de puntajes. Las palabras se cargan recién la primera vez que
+se usan, y todos los juegos del mismo idioma comparten el mismo diccionario.
+"""
+
+import pathlib
+
+from botggle.board import DICES_BY_SIZE
+from botggle.dictionary import CLEANING_TABLE, LazyDictionary, RAE_WORDS_PATH, prepare_words
+
+# el idioma que se usa si no se elige otro
+DEFAULT_LANGUAGE = "es"
+
+
+class Language:
+    """Un idioma para jugar: palabras, dados, normalización del texto y puntajes.
+
+    La tabla de puntajes va de largo de palabra a puntos; las más cortas que el mínimo de la
+    tabla no se pueden jugar, y las más largas que el máximo dan `max_word_score`.
+    """
+
+    def __init__(
+            self, name, title, words_path, dices_by_size, scores_table, max_word_score,
+            cleaning_table=CLEANING_TABLE, compiled_path=None):
+        self.name = name
+        self.title = title
+        self.words_path = pathlib.Path(words_path)
+        if compiled_path is None:
+            compiled_path = self.words_path.with_suffix(".dawg")
+        self.compiled_path = pathlib.Path(compiled_path)
+        self.dices_by_size = dices_by_size
+        self.scores_table = scores_table
+        self.max_word_score = max_word_score
+        self.cleaning_table = cleaning_table
+
+        # las letras que aparecen en alguna cara de algún dado
+        self.playable_letters = frozenset(
+            char for dices in dices_by_size.values()
+            for dice in dices for face in dice for char in face)
+
+        # se carga la primera vez que se usa, y lo comparten todos los juegos del idioma
+        self.words = LazyDictionary(self.words_path, self.compiled_path, self.prepare_words)
+
+    def __repr__(self):
+        return f"<Language {self.name!r}>"
+
+    @property
+    def min_word_length(self):
+        """El largo mínimo de las palabras que dan puntos."""
+        return min(self.scores_table)
+
+    @property
+    def max_word_length(self):
+        """El largo a partir del cual todas las palabras dan el máximo."""
+        return max(self.scores_table)
+
+    def is_available(self):
+        """Si están las palabras del idioma (en texto o ya compiladas)."""
+        return self.words_path.exists() or self.compiled_path.exists()
+
+    def normalize(self, text):
+        """Normaliza lo que escriben les jugadores (minúsculas, sin signos ni acentos)."""
+        return text.lower().translate(self.cleaning_table)
+
+    def prepare_words(self, words):
+        """Normaliza las palabras de la lista y deja sólo las que se pueden jugar."""
+        return prepare_words(
+            words, self.playable_letters, self.min_word_length, self.cleaning_table)
+
+    def word_score(self, word):
+        """Devuelve el puntaje de una palabra válida, según su largo."""
+        if len(word) > self.max_word_length:
+            return self.max_word_score
+        return self.scores_table.get(len(word), 0)
+
+
+LANGUAGES = {}
+
+
+def register(language):
+    """Agrega el idioma a los que se pueden elegir para jugar."""
+    if language.name in LANGUAGES:
+        raise ValueError(f"Ya hay un idioma registrado como {language.name!r}")
+    LANGUAGES[language.name] = language
+    return language
+
+
+def get_language(name=None):
+    """El idioma registrado con ese nombre (o el default)."""
+    try:
+        return LANGUAGES[DEFAULT_LANGUAGE if name is None else name]
+    except KeyError:
+        raise ValueError(f"Idioma desconocido: {name!r}") from None
+
+
+def available_languages():
+    """Los idiomas registrados para los que están las palabras."""
+    return [language for language in LANGUAGES.values() if language.is_available()]
+
+
+SPANISH = register(Language(
+    "es", "castellano", RAE_WORDS_PATH, DICES_BY_SIZE,
+    scores_table={
+        3: 1,
+        4: 2,
+        5: 4,
+        6: 7,
+        7: 11,
+        8: 16,
+        9: 22,
+        10: 29,
+        11: 37,
+        12: 46,
+        13: 56,
+        14: 67,
+    },
+    max_word_score=79,
+))
+
+
+# los dados del Boggle en inglés (la versión de 1987), que sólo viene en 4x4
+ENGLISH_DICES = [
+    ("a", "a", "e", "e", "g", "n"),
+    ("a", "b", "b", "j", "o", "o"),
+    ("a", "c", "h", "o", "p", "s"),
+    ("a", "f", "f", "k", "p", "s"),
+    ("a", "o", "o", "t", "t", "w"),
+    ("c", "i", "m", "o", "t", "u"),
+    ("d", "e", "i", "l", "r", "x"),
+    ("d", "e", "l", "r", "v", "y"),
+    ("d", "i", "s", "t", "t", "y"),
+    ("e", "e", "g", "h", "n", "w"),
+    ("e", "e", "i", "n", "s", "u"),
+    ("e", "h", "r", "t", "v", "w"),
+    ("e", "i", "o", "s", "s", "t"),
+    ("e", "l", "r", "t", "t", "y"),
+    ("h", "i", "m", "n", "u", "qu"),
+    ("h", "l", "n", "n", "r", "z"),
+]
+
+# las palabras no vienen con el bot: hay que dejarlas en `en_words.txt` (una por línea)
+ENGLISH = register(Language(
+    "en", "inglés", RAE_WORDS_PATH.with_name("en_words.txt"), {4: ENGLISH_DICES},
+    scores_table={3: 1, 4: 1, 5: 2, 6: 3, 7: 5},
+    max_word_score=11,
+))
@@ -1,13 +1,17 @@
 
-from botggle.game import SCORES_TABLE
+from botggle.game import word_score
+from botggle.outbound import MAX_MESSAGE_LENGTH
 
 
-def get_user_round_result(result_words):
-    """Arma la cadena de resultad de ronda para un usuario."""
+def get_user_round_result(result_words, word_score=word_score):
+    """Arma la cadena de resultad de ronda para un usuario.
+
+    Los puntajes son los de `word_score` (por default, los del castellano).
+    """
     words_by_len = {}
 
     for word in result_words.valid:
-        score = SCORES_TABLE[len(word)]
+        score = word_score(word)
         wordslist = words_by_len.setdefault(score, [])
         wordslist.append(word)
 
@@ -33,3 +37,55 @@ def get_user_round_result(result_words):
     r_noboard = "NO-TABLERO: ---"
 
     return " | ".join((r_valid, r_repeated, r_nolang, r_noboard))
+
+
+def get_missed_words_result(missed_words, max_length=MAX_MESSAGE_LENGTH, word_score=word_score):
+    """Arma la lista de palabras que nadie encontró, de las que más puntos dan a las que menos.
+
+    Si no entran todas en `max_length` caracteres, se muestran las primeras y se aclara
+    cuántas quedaron afuera. Los puntajes son los de `word_score`.
+    """
+    title = "Palabras que nadie encontró: "
+    if not missed_words:
+        return title + "---"
+
+    ranked = sorted(missed_words, key=lambda word: (-word_score(word), word))
+    parts = []
+    current_score = None
+    for word in ranked:
+        score = word_score(word)
+        if score == current_score:
+            parts.append(f", {word}")
+        else:
+            parts.append(f"{'; ' if current_score is not None else ''}[{score}] {word}")
+            current_score = score
+
+    length = len(title) + sum(map(len, parts))
+    if length <= max_length:
+        return title + "".join(parts)
+
+    # no entran todas: dejamos lugar para aclarar cuántas faltan
+    shown = []
+    length = len(title) + len(f" (y {len(ranked)} más)")
+    for part in parts:
+        if length + len(part) > max_length:
+            break
+        shown.append(part)
+        length += len(part)
+    return title + "".join(shown) + f" (y {len(ranked) - len(shown)} más)"
+
+
+def get_ranking_result(ranking):
+    """Arma el ranking de un chat, a partir de los acumulados de cada jugadore."""
+    if not ranking:
+        return "Todavía no se terminó ninguna ronda en este chat"
+
+    lines = ["Ranking del chat:"]
+    for position, stats in enumerate(ranking, 1):
+        line = (
+            f"{position}. {stats.username}: {stats.points} puntos en {stats.rounds} rondas "
+            f"(ganó el {stats.win_rate:.0%})")
+        if stats.best_word is not None:
+            line += f", mejor palabra: {stats.best_word}"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,251 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Minimal metrics (counters, gauges, histograms) in the Prometheus text format.
+
+Las métricas se registran en un `Registry`, que las expone por HTTP (sólo en localhost) con
+`serve`. Mientras el registro no está habilitado (o sea, si no se llamó a `serve` o a
+`enable`), todas las operaciones vuelven enseguida sin hacer nada.
+"""
+
+import bisect
+import contextlib
+import functools
+import http.server
+import math
+import threading
+import time
+
+# límites de los buckets de los histogramas (en segundos)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"'))
+        for name, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class _CounterChild:
+    __slots__ = ("_registry", "_lock", "value")
+
+    def __init__(self, registry):
+        self._registry = registry
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Suma al contador."""
+        if self._registry.enabled:
+            with self._lock:
+                self.value += amount
+
+    def samples(self, name, labels):
+        yield name + "_total", labels, self.value
+
+
+class _GaugeChild:
+    __slots__ = ("_registry", "function", "value")
+
+    def __init__(self, registry, function=None):
+        self._registry = registry
+        self.function = function
+        self.value = 0
+
+    def set(self, value):
+        """Fija el valor actual."""
+        if self._registry.enabled:
+            self.value = value
+
+    def samples(self, name, labels):
+        yield name, labels, self.value if self.function is None else self.function()
+
+
+class _HistogramChild:
+    __slots__ = ("_registry", "_lock", "buckets", "counts", "sum", "count")
+
+    def __init__(self, registry, buckets):
+        self._registry = registry
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        """Registra una observación (ej: cuántos segundos tardó algo)."""
+        if self._registry.enabled:
+            index = bisect.bisect_left(self.buckets, value)
+            with self._lock:
+                self.counts[index] += 1
+                self.sum += value
+                self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            yield name + "_bucket", labels + (("le", _format_value(float(bound))),), cumulative
+        yield name + "_sum", labels, self.sum
+        yield name + "_count", labels, self.count
+
+
+class _Metric:
+    """Una métrica, con un "hijo" por cada combinación de valores de sus labels."""
+
+    def __init__(self, kind, name, documentation, labelnames, new_child):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._new_child = new_child
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = new_child()
+
+    def labels(self, **labels):
+        """El hijo para esos valores de los labels (se crea la primera vez)."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        try:
+            return self._children[key]
+        except KeyError:
+            with self._lock:
+                return self._children.setdefault(key, self._new_child())
+
+    def __getattr__(self, name):
+        # sin labels, la métrica se usa directamente como su único hijo
+        try:
+            child = self.__dict__["_children"][()]
+        except KeyError:
+            raise AttributeError(name) from None
+        return getattr(child, name)
+
+    def render(self):
+        """Las líneas de la métrica en formato de texto de Prometheus."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            labels = tuple(zip(self.labelnames, key))
+            for name, sample_labels, value in child.samples(self.name, labels):
+                lines.append(f"{name}{_format_labels(sample_labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """El conjunto de métricas del proceso."""
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics = {}
+
+    def enable(self):
+        """Empieza a registrar (hasta acá, todas las operaciones no hacen nada)."""
+        self.enabled = True
+
+    def _register(self, kind, name, documentation, labelnames, new_child):
+        if name in self._metrics:
+            raise ValueError(f"Ya hay una métrica llamada {name!r}")
+        metric = _Metric(kind, name, documentation, labelnames, new_child)
+        self._metrics[name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Un contador (que sólo sube); se expone con el sufijo `_total`."""
+        return self._register(
+            "counter", name, documentation, labelnames, lambda: _CounterChild(self))
+
+    def gauge(self, name, documentation, function=None):
+        """Un valor que sube y baja; si se pasa `function`, se la llama al exponerlo."""
+        return self._register(
+            "gauge", name, documentation, (), lambda: _GaugeChild(self, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Un histograma de observaciones (ej: latencias, en segundos)."""
+        buckets = tuple(sorted(buckets))
+        return self._register(
+            "histogram", name, documentation, labelnames,
+            lambda: _HistogramChild(self, buckets))
+
+    def time(self, histogram):
+        """Context manager que registra en el histograma cuánto tardó el bloque."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(histogram)
+
+    def timed(self, histogram):
+        """Decorador para corutinas, que registra en el histograma cuánto tarda cada una."""
+        def decorator(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await function(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def render(self):
+        """Todas las métricas, en el formato de texto de Prometheus."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Habilita las métricas y las expone en http://host:port/metrics (en otro hilo)."""
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        self.enable()
+        return server
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
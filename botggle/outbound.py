@@ -0,0 +1,286 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""A single outbound pipeline for every message the bot sends.
+
+Telegram limita cuántos mensajes se pueden mandar (en total y a cada chat), así que todo
+pasa por una cola que respeta esos límites con "token buckets", junta mensajes seguidos al
+mismo chat en uno solo, y reintenta (esperando lo que pida Telegram) cuando lo frenan.
+"""
+
+import asyncio
+import collections
+import datetime
+import time
+
+# límites de Telegram: ~30 mensajes por segundo en total, y ~1 por segundo a cada chat
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+CHAT_BURST = 3
+
+# largo máximo de un mensaje de Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+# con qué se separan los mensajes que se juntan en uno
+MERGE_SEPARATOR = "\n\n"
+
+# cada cuánto (en segundos) se olvidan los límites de los chats que no mandan hace rato
+BUCKET_EVICTION_INTERVAL = 60
+
+
+class TokenBucket:
+    """Permite `rate` operaciones por segundo, con ráfagas de hasta `capacity`."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self):
+        """Cuántos segundos faltan para que haya un token disponible (0 si ya hay)."""
+        self._refill()
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def consume(self):
+        """Usa un token (se asume que antes se verificó que había)."""
+        self._refill()
+        self._tokens -= 1
+
+    def is_full(self):
+        """Si está lleno (o sea, igual que uno nuevo)."""
+        self._refill()
+        return self._tokens >= self.capacity
+
+
+class _Message:
+    """Un mensaje encolado, con el futuro que se resuelve cuando realmente se mandó."""
+
+    __slots__ = ("text", "kwargs", "future", "enqueued", "attempts")
+
+    def __init__(self, text, kwargs, future, enqueued):
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued = enqueued
+        self.attempts = 0  # cuántas veces nos frenaron al mandarlo
+
+
+def _retry_after(exc):
+    """Los segundos que pide esperar Telegram si el error es por "flood", o None."""
+    retry_after = getattr(exc, "retry_after", None)
+    if isinstance(retry_after, datetime.timedelta):
+        retry_after = retry_after.total_seconds()
+    return retry_after
+
+
+class Outbox:
+    """Cola de salida de mensajes, con límites por chat y global.
+
+    `send` encola y devuelve enseguida un futuro (que se puede esperar o no); el envío real lo
+    hace una tarea en segundo plano que arranca con `start`. Los mensajes a un mismo chat
+    salen siempre en orden, y de a uno por vez.
+    """
+
+    def __init__(
+            self, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST,
+            max_retries=5, backoff=1, clock=time.monotonic):
+        self.bot = None
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._clock = clock
+        self._global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self._chat_buckets = {}
+        self._last_eviction = clock()
+        self._pending = collections.defaultdict(collections.deque)
+        self._ready = collections.deque()  # chats con algo para mandar y nada en vuelo
+        self._in_flight = set()
+        self._blocked_until = {}  # chats frenados por Telegram
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._deliveries = set()
+
+        self.counters = collections.Counter()
+        self._latencies = collections.deque(maxlen=1000)
+
+    def start(self, bot):
+        """Arranca la tarea que manda los mensajes (tiene que llamarse dentro del loop)."""
+        if self._task is not None:
+            raise RuntimeError("El outbox ya fue arrancado")
+        self.bot = bot
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Frena la tarea que manda los mensajes; lo pendiente queda en la cola."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def flush(self):
+        """Espera a que no quede nada por mandar."""
+        while self._pending or self._in_flight:
+            await asyncio.sleep(0.001)
+
+    def send(self, chat_id, text, **kwargs):
+        """Encola un mensaje para el chat; devuelve un futuro que se resuelve al mandarse."""
+        future = asyncio.get_running_loop().create_future()
+        queue = self._pending[chat_id]
+        queue.append(_Message(text, kwargs, future, self._clock()))
+        self.counters["enqueued"] += 1
+        if len(queue) == 1 and chat_id not in self._in_flight:
+            self._ready.append(chat_id)
+            self._wakeup.set()
+        return future
+
+    def _chat_bucket(self, chat_id):
+        try:
+            return self._chat_buckets[chat_id]
+        except KeyError:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(
+                self.chat_rate, self.chat_burst, self._clock)
+            return bucket
+
+    def _evict_buckets(self):
+        """Olvida los buckets llenos de los chats sin nada que mandar (son como nuevos)."""
+        now = self._clock()
+        if now - self._last_eviction < BUCKET_EVICTION_INTERVAL:
+            return
+        self._last_eviction = now
+        idle = [
+            chat_id for chat_id, bucket in self._chat_buckets.items()
+            if chat_id not in self._pending and chat_id not in self._in_flight
+            and bucket.is_full()]
+        for chat_id in idle:
+            del self._chat_buckets[chat_id]
+
+    def _next_chat(self):
+        """El primer chat que ya puede mandar, o cuánto hay que esperar para que alguno pueda."""
+        min_delay = None
+        now = self._clock()
+        for _ in range(len(self._ready)):
+            chat_id = self._ready.popleft()
+            delay = max(
+                self._chat_bucket(chat_id).delay(), self._blocked_until.get(chat_id, now) - now)
+            if delay <= 0:
+                return chat_id, 0
+            self._ready.append(chat_id)
+            min_delay = delay if min_delay is None else min(min_delay, delay)
+        return None, min_delay
+
+    def _take_batch(self, chat_id):
+        """Saca los próximos mensajes del chat que se pueden juntar en uno."""
+        queue = self._pending[chat_id]
+        batch = [queue.popleft()]
+        length = len(batch[0].text)
+        while queue:
+            candidate = queue[0]
+            length += len(MERGE_SEPARATOR) + len(candidate.text)
+            if candidate.kwargs != batch[0].kwargs or length > MAX_MESSAGE_LENGTH:
+                break
+            batch.append(queue.popleft())
+        if not queue:
+            del self._pending[chat_id]
+        return batch
+
+    async def _run(self):
+        while True:
+            self._evict_buckets()
+            chat_id, delay = self._next_chat()
+            if chat_id is None:
+                # nada listo: esperamos a que llegue algo nuevo o a que se libere algún chat
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            global_delay = self._global_bucket.delay()
+            if global_delay:
+                self._ready.appendleft(chat_id)
+                await asyncio.sleep(global_delay)
+                continue
+
+            self._global_bucket.consume()
+            self._chat_bucket(chat_id).consume()
+            self._in_flight.add(chat_id)
+            delivery = asyncio.create_task(self._deliver(chat_id, self._take_batch(chat_id)))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, chat_id, batch):
+        text = MERGE_SEPARATOR.join(message.text for message in batch)
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text, **batch[0].kwargs)
+        except Exception as exc:
+            retry_after = _retry_after(exc)
+            attempt = max(message.attempts for message in batch)
+            if retry_after is None or attempt >= self.max_retries:
+                self.counters["failed"] += len(batch)
+                for message in batch:
+                    if not message.future.done():
+                        message.future.set_exception(exc)
+            else:
+                # nos frenaron: el chat no manda nada hasta que pase lo que nos dicen (o más,
+                # si ya van varios intentos), y los mensajes vuelven al principio de su cola,
+                # así el reintento vuelve a pasar por los límites como cualquier otro envío
+                self.counters["retries"] += 1
+                for message in batch:
+                    message.attempts += 1
+                wait = max(retry_after, self.backoff * 2 ** attempt)
+                self._blocked_until[chat_id] = self._clock() + wait
+                self._pending[chat_id].extendleft(reversed(batch))
+                self._in_flight.discard(chat_id)
+                self._ready.append(chat_id)
+                self._wakeup.set()
+                return
+        else:
+            now = self._clock()
+            self.counters["api_calls"] += 1
+            self.counters["sent"] += len(batch)
+            self.counters["merged"] += len(batch) - 1
+            for message in batch:
+                self._latencies.append(now - message.enqueued)
+                if not message.future.done():
+                    message.future.set_result(None)
+
+        self._in_flight.discard(chat_id)
+        self._blocked_until.pop(chat_id, None)
+        if chat_id in self._pending:
+            self._ready.append(chat_id)
+        self._wakeup.set()
+
+    def stats(self):
+        """Métricas de la cola: profundidad, contadores y latencias (en segundos)."""
+        latencies = sorted(self._latencies)
+        result = {
+            "queued": sum(len(queue) for queue in self._pending.values()),
+            "in_flight": len(self._in_flight),
+            "enqueued": self.counters["enqueued"],
+            "sent": self.counters["sent"],
+            "api_calls": self.counters["api_calls"],
+            "merged": self.counters["merged"],
+            "retries": self.counters["retries"],
+            "failed": self.counters["failed"],
+        }
+        if latencies:
+            result["latency_avg"] = sum(latencies) / len(latencies)
+            result["latency_p95"] = latencies[int(len(latencies) * 0.95)]
+            result["latency_max"] = latencies[-1]
+        return result
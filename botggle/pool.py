@@ -0,0 +1,68 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""A pool of boards generated (and solved) in background, ready for the next round."""
+
+import queue
+import threading
+
+
+class BoardPool:
+    """Mantiene una cantidad acotada de tableros ya generados, para arrancar rondas al toque.
+
+    Un hilo en segundo plano va reponiendo los tableros a medida que se usan; si justo se
+    pide uno y no hay, se genera en el momento (y se cuenta como "miss").
+    """
+
+    def __init__(self, factory, size=10):
+        self.factory = factory
+        self.hits = 0
+        self.misses = 0
+        self._boards = queue.Queue(maxsize=size)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Arranca el hilo que va llenando el pool."""
+        if self._thread is not None:
+            raise RuntimeError("El pool ya fue arrancado")
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._fill, name="board-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Frena el hilo que llena el pool (los tableros que ya están se pueden seguir usando)."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _fill(self):
+        """Genera tableros hasta que se frene; se queda esperando mientras el pool esté lleno."""
+        board = None
+        while not self._stopped.is_set():
+            if board is None:
+                board = self.factory()
+            try:
+                self._boards.put(board, timeout=0.1)
+            except queue.Full:
+                continue
+            board = None
+
+    def get(self):
+        """Devuelve un tablero listo si hay, o lo genera en el momento si el pool está vacío."""
+        try:
+            board = self._boards.get_nowait()
+        except queue.Empty:
+            self.misses += 1
+            return self.factory()
+        self.hits += 1
+        return board
+
+    def __len__(self):
+        return self._boards.qsize()
+
+    def stats(self):
+        """Contadores de uso del pool."""
+        return {"size": len(self), "hits": self.hits, "misses": self.misses}
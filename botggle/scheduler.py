@@ -0,0 +1,165 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""A single scheduler for the end of every game's round.
+
+Los vencimientos se guardan en una "rueda" (hashed timing wheel): un array de casilleros, uno
+por cada `tick` de tiempo, que se recorre en círculo; cada vencimiento va al casillero de su
+momento, así que agregar, cancelar o reprogramar uno es O(1), y en cada tick sólo se mira el
+casillero que toca. Lo que vence se encola para un grupo fijo de tareas que corren el
+callback, así un cierre de ronda lento no demora los de los otros juegos.
+"""
+
+import asyncio
+import collections
+import time
+import traceback
+
+# cada cuánto avanza la rueda (en segundos) y cuántos casilleros tiene (los vencimientos más
+# lejanos que una vuelta completa quedan en su casillero hasta la vuelta que corresponde)
+DEFAULT_TICK = 0.25
+DEFAULT_SLOTS = 512
+
+# cuántos callbacks pueden estar corriendo a la vez
+DEFAULT_WORKERS = 8
+
+
+class _Timer:
+    __slots__ = ("key", "deadline", "slot")
+
+    def __init__(self, key, deadline, slot):
+        self.key = key
+        self.deadline = deadline
+        self.slot = slot
+
+
+class RoundScheduler:
+    """Corre `await callback(key)` cuando vence el tiempo programado para cada clave.
+
+    Hay a lo sumo un vencimiento por clave (ej: por juego); programar de nuevo una clave
+    reemplaza el anterior. `start` tiene que llamarse dentro del loop.
+    """
+
+    def __init__(
+            self, callback, tick=DEFAULT_TICK, slots=DEFAULT_SLOTS, workers=DEFAULT_WORKERS,
+            clock=time.monotonic):
+        self.callback = callback
+        self.tick = tick
+        self.workers = workers
+        self._clock = clock
+        self._slots = [{} for _ in range(slots)]
+        self._timers = {}
+        self._current_tick = self._tick_of(clock())  # el próximo tick a procesar
+        self._due = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+        self.counters = collections.Counter()
+        self.max_lag = 0  # lo más tarde (en segundos) que se corrió un callback
+
+    def _tick_of(self, moment):
+        return int(moment // self.tick)
+
+    def start(self):
+        """Arranca la rueda y las tareas que corren los callbacks."""
+        if self._tasks:
+            raise RuntimeError("El scheduler ya fue arrancado")
+        self._tasks.append(asyncio.create_task(self._run()))
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def stop(self):
+        """Frena todo; lo que estaba programado queda sin correr."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def schedule(self, key, delay):
+        """Programa (o reprograma) el vencimiento de la clave dentro de `delay` segundos."""
+        now = self._clock()
+        if not self._timers:
+            # la rueda estaba quieta: la ponemos al día antes de agregar
+            self._current_tick = self._tick_of(now)
+        self._remove(key)
+
+        deadline = now + max(0, delay)
+        tick = max(self._tick_of(deadline), self._current_tick)
+        timer = _Timer(key, deadline, tick % len(self._slots))
+        self._slots[timer.slot][key] = timer
+        self._timers[key] = timer
+        self.counters["scheduled"] += 1
+        self._wakeup.set()
+
+    def _remove(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        del self._slots[timer.slot][key]
+        return True
+
+    def cancel(self, key):
+        """Cancela el vencimiento de la clave; devuelve si había uno programado."""
+        cancelled = self._remove(key)
+        if cancelled:
+            self.counters["cancelled"] += 1
+        return cancelled
+
+    def remaining(self, key):
+        """Cuántos segundos faltan para el vencimiento de la clave (None si no tiene)."""
+        timer = self._timers.get(key)
+        if timer is None:
+            return None
+        return max(0, timer.deadline - self._clock())
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def __len__(self):
+        return len(self._timers)
+
+    def _advance(self, now):
+        """Procesa los ticks que ya pasaron completos, encolando lo que venció."""
+        last_tick = self._tick_of(now)
+        while self._current_tick < last_tick:
+            slot = self._slots[self._current_tick % len(self._slots)]
+            if slot:
+                for key, timer in list(slot.items()):
+                    # los que son de otra vuelta de la rueda quedan
+                    if timer.deadline <= now:
+                        del slot[key]
+                        del self._timers[key]
+                        self._due.put_nowait(timer)
+            self._current_tick += 1
+
+    async def _run(self):
+        while True:
+            if not self._timers:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            now = self._clock()
+            self._advance(now)
+            await asyncio.sleep(max(0, (self._current_tick + 1) * self.tick - now))
+
+    async def _work(self):
+        while True:
+            timer = await self._due.get()
+            self.max_lag = max(self.max_lag, self._clock() - timer.deadline)
+            self.counters["fired"] += 1
+            try:
+                await self.callback(timer.key)
+            except Exception:
+                traceback.print_exc()
+
+    def stats(self):
+        """Cuántos vencimientos hay programados, esperando que se corran, y contadores."""
+        return {
+            "pending": len(self._timers),
+            "queued": self._due.qsize(),
+            "scheduled": self.counters["scheduled"],
+            "cancelled": self.counters["cancelled"],
+            "fired": self.counters["fired"],
+            "max_lag": self.max_lag,
+        }
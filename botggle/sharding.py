@@ -0,0 +1,207 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Spread games over several worker processes, by chat.
+
+Un proceso "de entrada" recibe todos los mensajes y los reparte a N procesos hijos según un
+hash estable del chat del juego, así cada juego vive siempre en el mismo proceso (y la
+evaluación de palabras de distintos juegos no compite por el mismo GIL). Lo que los hijos
+quieren mandar vuelve al proceso de entrada por una cola, para salir por un único outbox.
+
+Los procesos se arman con fork, así que todo lo que se cargue antes de arrancarlos (ej: el
+diccionario) queda compartido entre todos (copy-on-write).
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import traceback
+import zlib
+
+
+def shard_for(chat_id, shards):
+    """El número de proceso al que le toca un chat (siempre el mismo, en cualquier proceso)."""
+    return zlib.crc32(str(chat_id).encode("ascii")) % shards
+
+
+class PlayerIndex:
+    """En qué juego (chat) está cada jugadore, para los chequeos que cruzan juegos.
+
+    Por default es local al proceso; para compartirlo entre procesos se le pasa un dict y un
+    lock de un `multiprocessing.Manager` (ver `shared`).
+    """
+
+    def __init__(self, mapping=None, lock=None):
+        self._chat_by_username = {} if mapping is None else mapping
+        self._lock = threading.Lock() if lock is None else lock
+
+    @classmethod
+    def shared(cls, manager):
+        """Un índice que ven (y modifican) todos los procesos."""
+        return cls(manager.dict(), manager.Lock())
+
+    def claim(self, usernames, chat_id):
+        """Anota a les jugadores en el juego del chat, salvo que alguien ya esté en otro.
+
+        Devuelve el conjunto de les que ya estaban en otro juego (y en ese caso no anota a
+        nadie); vacío si salió todo bien.
+        """
+        with self._lock:
+            in_other_games = set()
+            for username in usernames:
+                current = self._chat_by_username.get(username)
+                if current is not None and current != chat_id:
+                    in_other_games.add(username)
+            if not in_other_games:
+                self._chat_by_username.update(dict.fromkeys(usernames, chat_id))
+            return in_other_games
+
+    def release(self, usernames):
+        """Saca a les jugadores del índice (ej: porque terminó el juego)."""
+        with self._lock:
+            for username in usernames:
+                self._chat_by_username.pop(username, None)
+
+    def chat_for(self, username):
+        """El chat del juego en el que está le jugadore, o None."""
+        return self._chat_by_username.get(username)
+
+
+class QueueOutbox:
+    """Reemplaza al Outbox en los procesos hijos: manda los mensajes al proceso de entrada."""
+
+    def __init__(self, queue):
+        self._queue = queue
+        self._enqueued = 0
+
+    def send(self, chat_id, text, **kwargs):
+        """Encola el mensaje; el futuro devuelto ya está resuelto (lo manda el de entrada)."""
+        self._queue.put((chat_id, text, kwargs))
+        self._enqueued += 1
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+    def stats(self):
+        """Cuántos mensajes se pasaron al proceso de entrada."""
+        return {"enqueued": self._enqueued}
+
+
+class _Job:
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+class _JobContext:
+    __slots__ = ("job",)
+
+    def __init__(self, data):
+        self.job = _Job(data)
+
+
+class LoopJobQueue:
+    """Lo mínimo del JobQueue de telegram (`run_repeating`) sobre el loop."""
+
+    def __init__(self):
+        self._tasks = set()
+
+    def run_repeating(self, callback, interval, data=None):
+        """Corre el callback cada `interval` segundos."""
+        async def repeat():
+            while True:
+                await asyncio.sleep(interval)
+                await callback(_JobContext(data))
+
+        task = asyncio.create_task(repeat())
+        self._tasks.add(task)
+        return task
+
+    async def stop(self):
+        """Cancela los callbacks que quedan (y espera a que terminen)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def _worker_loop(shard, inbound, outbound, setup, handle, teardown):
+    await setup(shard, outbound)
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    def _report(task):
+        tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            traceback.print_exception(task.exception())
+
+    try:
+        while True:
+            message = await loop.run_in_executor(None, inbound.get)
+            if message is None:
+                break
+            task = asyncio.create_task(handle(message))
+            tasks.add(task)
+            task.add_done_callback(_report)
+
+        if tasks:
+            await asyncio.wait(tasks)
+    finally:
+        if teardown is not None:
+            await teardown(shard)
+
+
+def _worker_main(shard, inbound, outbound, setup, handle, teardown):
+    asyncio.run(_worker_loop(shard, inbound, outbound, setup, handle, teardown))
+
+
+class ShardRouter:
+    """Reparte mensajes entre `shards` procesos hijos, según el chat.
+
+    En cada hijo se corre primero `await setup(shard, outbound)` y después, por cada mensaje
+    que le toque, `await handle(message)` (concurrentemente, en un loop propio). Lo que los
+    hijos pongan en `outbound` lo lee el proceso de entrada. Al frenarlos, cada hijo termina
+    lo que tiene en curso y corre `await teardown(shard)`, si se indica.
+    """
+
+    def __init__(self, shards, setup, handle, teardown=None):
+        if shards < 1:
+            raise ValueError(f"Se necesita al menos un proceso (se pidieron {shards})")
+        self.shards = shards
+        self._setup = setup
+        self._handle = handle
+        self._teardown = teardown
+        self._context = multiprocessing.get_context("fork")
+        self.outbound = self._context.Queue()
+        self._inbounds = []
+        self._processes = []
+
+    def start(self):
+        """Arranca los procesos hijos (con fork, compartiendo lo ya cargado)."""
+        if self._processes:
+            raise RuntimeError("Los procesos ya fueron arrancados")
+        for shard in range(self.shards):
+            inbound = self._context.Queue()
+            process = self._context.Process(
+                target=_worker_main, name=f"botggle-shard-{shard}", daemon=True,
+                args=(
+                    shard, inbound, self.outbound, self._setup, self._handle, self._teardown))
+            process.start()
+            self._inbounds.append(inbound)
+            self._processes.append(process)
+
+    def route(self, chat_id, message):
+        """Manda el mensaje al proceso que maneja ese chat."""
+        self._inbounds[shard_for(chat_id, self.shards)].put(message)
+
+    def stop(self, timeout=5):
+        """Pide a los hijos que terminen (después de lo que tengan en curso) y los espera."""
+        for inbound in self._inbounds:
+            inbound.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._inbounds = []
+        self._processes = []
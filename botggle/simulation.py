@@ -0,0 +1,312 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Simulación de muchos tableros en bloque, para ajustar los dados y la tabla de puntajes.
+
+Los tableros se representan como arrays de numpy con el índice de la cara de cada dado, y
+todas las estadísticas (histograma de letras, pares de letras vecinas, palabras que se pueden
+armar en cada tablero y su puntaje) se calculan para todo el lote junto. Por ejemplo:
+
+    python -m botggle.simulation --boards 1000000 --size 4 --workers 4
+
+Necesita numpy (que el resto del bot no usa).
+"""
+
+import argparse
+import multiprocessing
+import time
+from dataclasses import dataclass
+
+import numpy as np  # fades
+
+from botggle.board import DICES_BY_SIZE, neighbours
+from botggle.dictionary import ROOT, tokenize
+from botggle.game import MAX_WORD_LENGTH, MAX_WORD_SCORE, MIN_WORD_LENGTH, rae_words, word_score
+
+# cuántos tableros se resuelven juntos (acota la memoria de los estados intermedios)
+CHUNK_SIZE = 500
+
+
+class DiceSet:
+    """Los dados de un tamaño de tablero, pasados a índices de caras."""
+
+    def __init__(self, size):
+        self.size = size
+        dices = DICES_BY_SIZE[size]
+        self.faces = tuple(sorted({face for dice in dices for face in dice}))
+        index = {face: i for i, face in enumerate(self.faces)}
+        self.dice_faces = np.array([[index[face] for face in dice] for dice in dices], np.int32)
+
+        # vecinos de cada posición, completados con -1 para que todas tengan 8
+        self.neighbours = np.full((size * size, 8), -1, np.int32)
+        for position, around in enumerate(neighbours(size)):
+            self.neighbours[position, :len(around)] = around
+
+    def roll(self, quantity, rng):
+        """Tira `quantity` tableros; devuelve un array (tableros, posiciones) de caras."""
+        cells = self.size * self.size
+        order = np.argsort(rng.random((quantity, cells)), axis=1)
+        sides = rng.integers(0, self.dice_faces.shape[1], (quantity, cells))
+        return self.dice_faces[order, sides]
+
+    def distribution(self, board):
+        """Pasa un tablero del lote a la distribución que usa `Board`."""
+        return [
+            [self.faces[face] for face in board[row * self.size:(row + 1) * self.size]]
+            for row in range(self.size)
+        ]
+
+
+class BatchSolver:
+    """Resuelve lotes de tableros contra el diccionario, todos a la vez.
+
+    El DAWG del diccionario se pasa a una tabla densa de transiciones (nodo, cara) -> nodo,
+    y cada palabra se identifica por su número de orden en el diccionario (que se va sumando
+    en cada transición), así no hace falta armar los textos para saber qué palabras son
+    distintas. La búsqueda es a lo ancho: en cada paso se extienden todos los caminos vivos
+    de todos los tableros con operaciones de numpy.
+    """
+
+    def __init__(self, dice_set, dictionary=None):
+        if dictionary is None:
+            dictionary = rae_words.get()
+        self.dice_set = dice_set
+        raw = dictionary.raw()
+
+        first_edge = np.frombuffer(raw.first_edge, np.uint32).astype(np.int64)
+        labels = np.frombuffer(raw.labels, np.uint8).astype(np.int64)
+        targets = np.frombuffer(raw.targets, np.uint32).astype(np.int64)
+        self.final = np.frombuffer(raw.final, np.uint8).astype(bool)
+        nodes = len(self.final)
+        owners = np.repeat(np.arange(nodes), np.diff(first_edge))
+
+        # cuántas palabras hay desde cada nodo (contándolo), iterando hasta que se estabilice
+        counts = self.final.astype(np.int64)
+        while True:
+            new_counts = self.final + np.bincount(owners, counts[targets], nodes).astype(np.int64)
+            if np.array_equal(new_counts, counts):
+                break
+            counts = new_counts
+
+        # lo que suma cada arista al número de palabra: la palabra que termina en el nodo de
+        # origen (si hay) más todas las que cuelgan de las aristas anteriores del mismo nodo
+        below = counts[targets]
+        accumulated = np.concatenate([[0], np.cumsum(below)])
+        edge_offsets = self.final[owners] + accumulated[:-1] - accumulated[first_edge[owners]]
+
+        by_char_target = np.full((nodes, len(raw.alphabet) + 1), -1, np.int64)
+        by_char_offset = np.zeros((nodes, len(raw.alphabet) + 1), np.int64)
+        by_char_target[owners, labels] = targets
+        by_char_offset[owners, labels] = edge_offsets
+
+        # y ahora por cara (que puede tener más de una letra, como "qu")
+        codes = {char: code for code, char in enumerate(raw.alphabet, 1)}
+        faces = dice_set.faces
+        self.target = np.full((nodes, len(faces)), -1, np.int64)
+        self.offset = np.zeros((nodes, len(faces)), np.int64)
+        for index, face in enumerate(faces):
+            current = np.arange(nodes)
+            offset = np.zeros(nodes, np.int64)
+            for char in tokenize(face):
+                alive = current >= 0
+                code = codes.get(char)
+                if code is None:
+                    current[:] = -1
+                    break
+                offset[alive] += by_char_offset[current[alive], code]
+                current[alive] = by_char_target[current[alive], code]
+            self.target[:, index] = current
+            self.offset[:, index] = offset
+
+        self.face_lengths = np.array([len(face) for face in faces], np.int64)
+
+    def solve(self, boards):
+        """Encuentra las palabras de cada tablero del lote.
+
+        Devuelve tres arrays alineados con una fila por (tablero, palabra) distinta: el índice
+        del tablero en el lote, el número de la palabra (su orden en el diccionario) y su largo.
+        """
+        quantity, cells = boards.shape
+        found_boards, found_words, found_lengths = [], [], []
+
+        def record(mask, board, word, length):
+            found_boards.append(board[mask])
+            found_words.append(word[mask])
+            found_lengths.append(length[mask])
+
+        # los estados iniciales: cada dado de cada tablero
+        board = np.repeat(np.arange(quantity), cells)
+        position = np.tile(np.arange(cells), quantity)
+        face = boards[board, position]
+        node = self.target[ROOT, face]
+        alive = node >= 0
+        board, position, face, node = board[alive], position[alive], face[alive], node[alive]
+        word = self.offset[ROOT, face]
+        length = self.face_lengths[face]
+        first = position
+        visited = np.left_shift(np.uint64(1), position.astype(np.uint64))
+        record(self.final[node], board, word, length)
+
+        neighbours = self.dice_set.neighbours
+        while len(board):
+            next_position = neighbours[position]  # (estados, 8)
+            valid = next_position >= 0
+            next_position = np.where(valid, next_position, 0)
+            next_face = boards[board[:, None], next_position]
+            next_node = self.target[node[:, None], next_face]
+            valid &= next_node >= 0
+            safe_node = np.where(valid, next_node, 0)
+            next_word = word[:, None] + self.offset[node[:, None], next_face]
+            next_length = length[:, None] + self.face_lengths[next_face]
+            is_final = valid & self.final[safe_node]
+
+            bit = np.left_shift(np.uint64(1), next_position.astype(np.uint64))
+            used = (visited[:, None] & bit) != 0
+
+            # volver al primer dado sólo vale como último y si es de una letra
+            single = self.face_lengths[next_face] == 1
+            closing = is_final & single & (next_position == first[:, None])
+            expand = valid & ~used
+
+            board_2d = np.broadcast_to(board[:, None], next_position.shape)
+            record(closing | (expand & is_final), board_2d, next_word, next_length)
+
+            rows, columns = np.nonzero(expand)
+            board = board[rows]
+            first = first[rows]
+            visited = visited[rows] | bit[rows, columns]
+            position = next_position[rows, columns]
+            node = next_node[rows, columns]
+            word = next_word[rows, columns]
+            length = next_length[rows, columns]
+
+        found_boards = np.concatenate(found_boards)
+        found_words = np.concatenate(found_words)
+        found_lengths = np.concatenate(found_lengths)
+        keys = found_boards.astype(np.int64) * (1 << 32) + found_words
+        _, unique = np.unique(keys, return_index=True)
+        return found_boards[unique], found_words[unique], found_lengths[unique]
+
+
+# el puntaje de una palabra según su largo, como tabla (todo lo más largo vale lo máximo)
+SCORES_BY_LENGTH = np.array(
+    [word_score("x" * length) for length in range(MAX_WORD_LENGTH + 1)] + [MAX_WORD_SCORE],
+    np.int64)
+
+
+@dataclass
+class BatchStats:
+    """Estadísticas acumuladas de un montón de tableros."""
+
+    faces: tuple
+    boards: int
+    words: np.ndarray  # palabras (que dan puntos) por tablero
+    scores: np.ndarray  # puntaje máximo posible por tablero
+    face_histogram: np.ndarray  # cuántas veces salió cada cara
+    pair_counts: np.ndarray  # cuántas veces quedaron vecinas dos caras (matriz de caras)
+
+    @classmethod
+    def merge(cls, stats):
+        """Junta las estadísticas de varios lotes."""
+        stats = list(stats)
+        return cls(
+            faces=stats[0].faces,
+            boards=sum(s.boards for s in stats),
+            words=np.concatenate([s.words for s in stats]),
+            scores=np.concatenate([s.scores for s in stats]),
+            face_histogram=sum(s.face_histogram for s in stats),
+            pair_counts=sum(s.pair_counts for s in stats),
+        )
+
+
+def analyze(boards, dice_set, solver):
+    """Calcula las estadísticas de un lote de tableros."""
+    quantity, cells = boards.shape
+    faces = len(dice_set.faces)
+
+    face_histogram = np.bincount(boards.ravel(), minlength=faces)
+
+    # pares de caras vecinas (en ambos sentidos, así la matriz queda simétrica)
+    sources = np.repeat(np.arange(cells), 8)
+    targets = dice_set.neighbours.ravel()
+    sources, targets = sources[targets >= 0], targets[targets >= 0]
+    pairs = boards[:, sources] * faces + boards[:, targets]
+    pair_counts = np.bincount(pairs.ravel(), minlength=faces * faces).reshape(faces, faces)
+
+    found_boards, _, found_lengths = solver.solve(boards)
+    playable = found_lengths >= MIN_WORD_LENGTH
+    found_boards, found_lengths = found_boards[playable], found_lengths[playable]
+    words = np.bincount(found_boards, minlength=quantity)
+    lengths = np.minimum(found_lengths, len(SCORES_BY_LENGTH) - 1)
+    scores = np.bincount(found_boards, SCORES_BY_LENGTH[lengths], quantity).astype(np.int64)
+
+    return BatchStats(dice_set.faces, quantity, words, scores, face_histogram, pair_counts)
+
+
+# el solver de cada proceso, se arma una sola vez por proceso y tamaño
+_SOLVERS = {}
+
+
+def _get_solver(size):
+    if size not in _SOLVERS:
+        _SOLVERS[size] = BatchSolver(DiceSet(size))
+    return _SOLVERS[size]
+
+
+def _simulate_chunk(size, quantity, seed):
+    """Tira y analiza un lote de tableros (corre en los procesos del pool)."""
+    solver = _get_solver(size)
+    rng = np.random.default_rng(seed)
+    return analyze(solver.dice_set.roll(quantity, rng), solver.dice_set, solver)
+
+
+def simulate(quantity, size=4, workers=1, seed=None):
+    """Simula `quantity` tableros repartidos en `workers` procesos.
+
+    Devuelve las estadísticas juntas y cuántos tableros por segundo se procesaron.
+    """
+    chunks = [CHUNK_SIZE] * (quantity // CHUNK_SIZE)
+    if quantity % CHUNK_SIZE:
+        chunks.append(quantity % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks = [(size, chunk, chunk_seed) for chunk, chunk_seed in zip(chunks, seeds)]
+
+    # armamos el solver antes de crear los procesos, así lo heredan ya hecho
+    _get_solver(size)
+    started = time.perf_counter()
+    if workers > 1:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            results = pool.starmap(_simulate_chunk, tasks)
+    else:
+        results = [_simulate_chunk(*task) for task in tasks]
+    elapsed = time.perf_counter() - started
+    return BatchStats.merge(results), quantity / elapsed
+
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(prog="python -m botggle.simulation")
+    parser.add_argument("--boards", type=int, default=100_000)
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    stats, speed = simulate(args.boards, args.size, args.workers, args.seed)
+    print(f"{stats.boards} tableros de {args.size}x{args.size}: {speed:.0f} tableros por segundo")
+
+    percentiles = (0, 10, 25, 50, 75, 90, 100)
+    for name, values in (("palabras", stats.words), ("puntaje", stats.scores)):
+        values_at = np.percentile(values, percentiles)
+        numbers = " ".join(f"p{p}={v:.0f}" for p, v in zip(percentiles, values_at))
+        print(f"{name:>8} por tablero: media={values.mean():.1f} {numbers}")
+    print(f"tableros sin palabras: {(stats.words == 0).mean():.2%}")
+
+    total = stats.face_histogram.sum()
+    letters = sorted(zip(stats.face_histogram, stats.faces), reverse=True)
+    print("caras: " + " ".join(f"{face}={count / total:.1%}" for count, face in letters))
+
+
+if __name__ == "__main__":
+    main()
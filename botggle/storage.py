@@ -0,0 +1,184 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Durable game state in SQLite, to survive restarts.
+
+Los cambios de estado de un juego (arranque, ronda que empieza o termina) se guardan enseguida
+con una foto completa del juego; las palabras, que llegan todo el tiempo, se acumulan en memoria
+y se escriben todas juntas en cada `flush` (que se llama periódicamente).
+"""
+
+import json
+import sqlite3
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from botggle.board import Board
+from botggle.game import Game
+from botggle.languages import get_language
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS games (
+        chat_id INTEGER PRIMARY KEY,
+        chat_type TEXT,
+        chat_title TEXT,
+        state TEXT NOT NULL,
+        board_size INTEGER NOT NULL,
+        board TEXT,
+        deadline REAL,
+        language TEXT
+    );
+    CREATE TABLE IF NOT EXISTS players (
+        chat_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        user_id INTEGER,
+        ready INTEGER NOT NULL,
+        score INTEGER NOT NULL,
+        PRIMARY KEY (chat_id, username)
+    );
+    CREATE TABLE IF NOT EXISTS round_words (
+        chat_id INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        word TEXT NOT NULL,
+        PRIMARY KEY (chat_id, username, word)
+    );
+"""
+
+
+@dataclass
+class PlayerSnapshot:
+    username: str
+    user_id: Optional[int]
+    ready: bool
+    score: int
+
+
+@dataclass
+class GameSnapshot:
+    """Lo guardado de un juego, tal como vuelve de la base."""
+
+    chat_id: int
+    chat_type: Optional[str]
+    chat_title: Optional[str]
+    state: str
+    board_size: int
+    board: Optional[List[List[str]]]
+    deadline: Optional[float]
+    language: Optional[str] = None
+    players: List[PlayerSnapshot] = field(default_factory=list)
+    round_words: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+
+    def restore(self, chat):
+        """Reconstruye el Game; `chat` es lo que se usa como chat del juego (ej: el de Telegram).
+
+        Un juego que había quedado frenado a mitad de evaluar la ronda se recupera como activo,
+        así se vuelve a hacer el cierre de la ronda (su deadline ya pasó).
+        """
+        game = Game(chat, board_size=self.board_size, language=get_language(self.language))
+        for snapshot in self.players:
+            player = game.add_player(snapshot.username)
+            player.ready = snapshot.ready
+            game.full_scores[snapshot.username] = snapshot.score
+
+        if self.state in (Game.State.ACTIVE.name, Game.State.STOPPED.name):
+            game.start_round(Board(size=self.board_size, distribution=self.board))
+            for username, words in self.round_words.items():
+                for word in words:
+                    game.round_words.add(username, word)
+        return game
+
+
+class GameStore:
+    """Guarda y recupera los juegos en una base SQLite (en modo WAL)."""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(games)")]
+        if "language" not in columns:
+            # una base de antes de que hubiera idiomas: esos juegos son todos en castellano
+            self._connection.execute("ALTER TABLE games ADD COLUMN language TEXT")
+        self._pending_words = []
+
+    def close(self):
+        """Escribe lo pendiente y cierra la base."""
+        self.flush()
+        self._connection.close()
+
+    def save_game(self, chat_id, game, deadline=None, chat_type=None, chat_title=None):
+        """Guarda la foto completa del juego (junto con todo lo pendiente), enseguida."""
+        # entre rondas (WAITING) no hay tablero ni palabras que guardar: las de la ronda
+        # anterior ya no sirven
+        board = None
+        words = []
+        if game.board is not None and game.state != Game.State.WAITING:
+            board = json.dumps(game.board.distribution)
+            words = [
+                (chat_id, username, word)
+                for username, user_words in game.round_words.items() for word in user_words
+            ]
+
+        players = [
+            (
+                chat_id, position, player.username, getattr(player.chat, "id", None),
+                int(player.ready), game.full_scores[player.username],
+            )
+            for position, player in enumerate(game.players)
+        ]
+
+        with self._connection:
+            self._write_pending_words()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+                    chat_id, chat_type, chat_title, game.state.name, game.board_size, board,
+                    deadline, game.language.name))
+            self._connection.execute("DELETE FROM players WHERE chat_id = ?", (chat_id,))
+            self._connection.executemany("INSERT INTO players VALUES (?, ?, ?, ?, ?, ?)", players)
+            self._connection.execute("DELETE FROM round_words WHERE chat_id = ?", (chat_id,))
+            self._connection.executemany("INSERT INTO round_words VALUES (?, ?, ?)", words)
+
+    def add_words(self, chat_id, username, words):
+        """Anota palabras nuevas de une jugadore; se escriben en el próximo `flush`."""
+        self._pending_words.extend((chat_id, username, word) for word in words)
+
+    def delete_game(self, chat_id):
+        """Borra el juego (que ya terminó)."""
+        self._pending_words = [item for item in self._pending_words if item[0] != chat_id]
+        with self._connection:
+            for table in ("games", "players", "round_words"):
+                self._connection.execute(f"DELETE FROM {table} WHERE chat_id = ?", (chat_id,))
+
+    def _write_pending_words(self):
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO round_words VALUES (?, ?, ?)", self._pending_words)
+        self._pending_words = []
+
+    def flush(self):
+        """Escribe todas las palabras pendientes en una sola transacción."""
+        if self._pending_words:
+            with self._connection:
+                self._write_pending_words()
+
+    def load_games(self):
+        """Devuelve todos los juegos guardados."""
+        snapshots = {}
+        for row in self._connection.execute("SELECT * FROM games"):
+            chat_id, chat_type, chat_title, state, board_size, board, deadline, language = row
+            snapshots[chat_id] = GameSnapshot(
+                chat_id, chat_type, chat_title, state, board_size,
+                json.loads(board) if board else None, deadline, language)
+
+        query = "SELECT chat_id, username, user_id, ready, score FROM players ORDER BY position"
+        for chat_id, username, user_id, ready, score in self._connection.execute(query):
+            snapshots[chat_id].players.append(
+                PlayerSnapshot(username, user_id, bool(ready), score))
+
+        for chat_id, username, word in self._connection.execute("SELECT * FROM round_words"):
+            snapshots[chat_id].round_words[username].add(word)
+
+        return list(snapshots.values())
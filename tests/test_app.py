@@ -0,0 +1,185 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the bot handlers."""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("telegram")
+pytest.importorskip("infoauth")
+
+import app  # NOQA: E402
+from benchmarks.loadtest import FakeBot, FakeChat, FakeContext, FakeUpdate  # NOQA: E402
+from botggle.board import Board  # NOQA: E402
+from botggle.game import Game  # NOQA: E402
+from botggle.outbound import Outbox  # NOQA: E402
+from botggle.history import HistoryStore  # NOQA: E402
+from botggle.scheduler import RoundScheduler  # NOQA: E402
+from botggle.sharding import LoopJobQueue, PlayerIndex  # NOQA: E402
+from botggle.storage import GameStore  # NOQA: E402
+
+CHAT = FakeChat(-77, type="group", title="juego")
+FULANE = FakeChat(1, username="fulane")
+MENGANE = FakeChat(2, username="mengane")
+
+
+class SlowPool:
+    """Un pool vacío: cada tablero se genera en el momento (y tarda)."""
+
+    stopped = False
+
+    def get(self):
+        time.sleep(0.05)
+        return Board()
+
+    def stats(self):
+        return {}
+
+    def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    # las globales del bot, limpias para cada prueba
+    monkeypatch.setattr(app, "GAME_BY_CHAT", {})
+    monkeypatch.setattr(app, "PLAYER_BY_USERNAME", {})
+    monkeypatch.setattr(app, "PLAYER_INDEX", PlayerIndex())
+    monkeypatch.setattr(app, "STARTING_GAMES", set())
+    monkeypatch.setattr(app, "STORE", None)
+    monkeypatch.setattr(app, "HISTORY", None)
+    monkeypatch.setattr(app, "get_board_pool", lambda language, size: SlowPool())
+    monkeypatch.setattr(app, "SCHEDULER", RoundScheduler(lambda game: None))
+    monkeypatch.setattr(app, "OUTBOX", Outbox(global_rate=1e9, chat_rate=1e9, chat_burst=1e9))
+
+
+def run_game(scenario):
+    """Arranca el juego de fulane y mengane (fulane ya dijo listo) y corre el escenario."""
+    async def main():
+        app.SCHEDULER.start()
+        app.OUTBOX.start(FakeBot())
+        try:
+            update = FakeUpdate(FULANE, CHAT, "/comienzo", mentions=["mengane"])
+            await app.start_command(update, FakeContext())
+            await app.ready_command(FakeUpdate(FULANE, FULANE, "/listo"), FakeContext())
+            await scenario(app.GAME_BY_CHAT[CHAT])
+        finally:
+            await app.OUTBOX.stop()
+            await app.SCHEDULER.stop()
+
+    asyncio.run(main())
+
+
+def ready(user):
+    return app.ready_command(FakeUpdate(user, user, "/listo"), FakeContext())
+
+
+# -- pruebas del arranque de la ronda
+
+
+def test_ready_starts_round(bot):
+    async def scenario(game):
+        await ready(MENGANE)
+        assert game.state == Game.State.ACTIVE
+        assert game in app.SCHEDULER
+
+    run_game(scenario)
+
+
+def test_ready_twice_while_fetching_board(bot):
+    # el segundo /listo llega mientras se busca el tablero: no tiene que arrancar otra vez
+    async def scenario(game):
+        await asyncio.gather(ready(MENGANE), ready(FULANE))
+        assert game.state == Game.State.ACTIVE
+        assert len(app.SCHEDULER) == 1
+
+    run_game(scenario)
+
+
+def test_end_while_fetching_board(bot, monkeypatch, tmp_path):
+    # /terminar mientras se busca el tablero: la ronda ya no arranca, ni queda su fin, ni el
+    # juego guardado (que volvería al reiniciar)
+    store = GameStore(tmp_path / "state.sqlite")
+    monkeypatch.setattr(app, "STORE", store)
+
+    async def scenario(game):
+        end = FakeUpdate(FULANE, CHAT, "/terminar")
+        await asyncio.gather(ready(MENGANE), app.end_command(end, FakeContext()))
+        assert CHAT not in app.GAME_BY_CHAT
+        assert game.state == Game.State.WAITING
+        assert len(app.SCHEDULER) == 0
+
+    run_game(scenario)
+    assert store.load_games() == []
+    store.close()
+
+
+# -- pruebas de los juegos recuperados
+
+
+def test_restore_solves_board(bot, monkeypatch, tmp_path):
+    # la solución se calcula al recuperar, no con la primera palabra que llega (en el loop)
+    store = GameStore(tmp_path / "state.sqlite")
+    monkeypatch.setattr(app, "STORE", store)
+    saved = Game(CHAT)
+    saved.add_player("fulane")
+    saved.start_round(Board())
+    store.save_game(CHAT.id, saved, time.time() + 60, chat_type="group", chat_title="juego")
+
+    async def main():
+        app.SCHEDULER.start()
+        try:
+            await app.restore_games()
+        finally:
+            await app.SCHEDULER.stop()
+
+    asyncio.run(main())
+    [game] = app.GAME_BY_CHAT.values()
+    assert game.state == Game.State.ACTIVE
+    assert game.board._solution is not None
+    store.close()
+
+
+# -- pruebas del cierre de los procesos hijos
+
+
+def test_teardown_shard(bot, monkeypatch, tmp_path):
+    # lo que quedó sin escribir (las palabras desde el último flush) se escribe al cerrar
+    store = GameStore(tmp_path / "state.sqlite")
+    monkeypatch.setattr(app, "STORE", store)
+    monkeypatch.setattr(app, "HISTORY", HistoryStore(tmp_path / "history.sqlite"))
+    monkeypatch.setattr(app, "JOB_QUEUE", LoopJobQueue())
+    pool = SlowPool()
+    monkeypatch.setattr(app, "BOARD_POOL_BY_SIZE", {4: pool})
+
+    async def scenario(game):
+        await ready(MENGANE)
+        flush_job = app.JOB_QUEUE.run_repeating(app.flush_state, 60)
+        await app.game_words(FakeUpdate(MENGANE, MENGANE, "hola casa"), FakeContext())
+        await app.teardown_shard(0)
+        assert flush_job.cancelled()
+        assert pool.stopped
+
+    run_game(scenario)
+    store = GameStore(tmp_path / "state.sqlite")
+    [snapshot] = store.load_games()
+    assert snapshot.round_words["mengane"] == {"hola", "casa"}
+    store.close()
+
+
+def test_shutdown_sends_pending(bot):
+    # lo último que se encoló (ej: "Juego terminado") sale antes de cerrar
+    sender = FakeBot(latency=0.01)
+
+    async def main():
+        app.SCHEDULER.start()
+        app.OUTBOX.start(sender)
+        app.broadcast([FULANE, MENGANE], "Juego terminado")
+        await app.post_shutdown(None)
+
+    asyncio.run(main())
+    assert sender.messages == 2
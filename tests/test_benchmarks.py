@@ -0,0 +1,70 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the benchmark suite (the tooling, not the timings)."""
+
+import json
+
+from benchmarks import suite
+
+import pytest
+
+
+def _results(**bests):
+    return {"results": {name: {"best": best, "median": best} for name, best in bests.items()}}
+
+
+def test_measure_calibrates():
+    calls = []
+    result = suite.measure(lambda: calls.append(1), min_sample_time=0.001, repeat=3)
+    assert result["number"] > 1
+    assert len(calls) >= result["number"] * 3
+    assert 0 < result["best"] <= result["median"]
+
+
+def test_compare_regression():
+    baseline = _results(fast=1.0, slow=1.0)
+    current = _results(fast=1.1, slow=1.5)
+    assert suite.compare(baseline, current, threshold=0.2) == [("slow", 1.0, 1.5, 1.5)]
+
+
+def test_compare_faster_and_new_cases():
+    baseline = _results(board=1.0, gone=1.0)
+    current = _results(board=0.5, new=10.0)
+    assert suite.compare(baseline, current) == []
+
+
+def test_main_fails_on_regression(tmp_path, monkeypatch):
+    monkeypatch.setattr(suite, "run", lambda *args: _results(board=2.0))
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(_results(board=1.0)))
+    output = tmp_path / "output.json"
+
+    assert suite.main(["--output", str(output), "--baseline", str(baseline)]) == 1
+    assert json.loads(output.read_text()) == _results(board=2.0)
+
+    baseline.write_text(json.dumps(_results(board=1.9)))
+    assert suite.main(["--output", str(output), "--baseline", str(baseline)]) == 0
+
+
+def test_loadtest_small_run():
+    pytest.importorskip("telegram")
+    pytest.importorskip("infoauth")
+    from benchmarks.loadtest import LoadTest
+    import app
+
+    load_test = LoadTest(games=3, players=2, rounds=2, round_seconds=0.3, words_per_second=20)
+    report = load_test.run(warm_pools=False)
+
+    assert report["errors"] == {}
+    assert report["players"] == 6
+    assert len(load_test.latencies["start_command"]) == 3
+    assert len(load_test.latencies["ready_command"]) == 12
+    assert len(load_test.latencies["time_up"]) == 6
+    assert report["words_sent"] == len(load_test.latencies["game_words"]) > 0
+    assert set(report["latency_ms"]["time_up"]) == {"p50", "p95", "p99", "max"}
+
+    # no quedan juegos colgados en las globales del bot
+    assert app.GAME_BY_CHAT == {}
+    assert app.PLAYER_BY_USERNAME == {}
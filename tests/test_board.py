@@ -2,7 +2,8 @@
 
 import textwrap
 
-from botggle.board import Board, LocatedChar as LC
+from botggle.board import Board, DICES_BY_SIZE, LocatedChar as LC, neighbour_masks, neighbours
+from botggle.dictionary import Dictionary
 
 import pytest
 
@@ -46,6 +47,91 @@ def test_graph_simple(monkeypatch):
     assert b._word_graph == expected
 
 
+@pytest.mark.parametrize("size", sorted(DICES_BY_SIZE))
+def test_dices_per_size(size):
+    assert len(DICES_BY_SIZE[size]) == size * size
+
+
+@pytest.mark.parametrize("size", sorted(DICES_BY_SIZE))
+def test_roll_keeps_dices(size):
+    # los dados se mezclan en una copia, las listas del módulo no cambian
+    dices = list(DICES_BY_SIZE[size])
+    for _ in range(5):
+        Board(size)
+    assert DICES_BY_SIZE[size] == dices
+
+
+@pytest.mark.parametrize("size", sorted(DICES_BY_SIZE))
+def test_real_board_size(size):
+    b = Board(size)
+    assert len(b.distribution) == size
+    assert all(len(line) == size for line in b.distribution)
+    assert len(b._word_graph) == size * size
+
+
+def test_board_size_unknown():
+    with pytest.raises(ValueError):
+        Board(7)
+
+
+def test_neighbours_big():
+    around = neighbours(5)
+    assert len(around) == 25
+    assert sorted(around[0]) == [1, 5, 6]
+    assert sorted(around[4]) == [3, 8, 9]
+    assert sorted(around[12]) == [6, 7, 8, 11, 13, 16, 17, 18]
+    assert sorted(around[24]) == [18, 19, 23]
+
+
+def test_neighbours_computed_once():
+    assert neighbours(6) is neighbours(6)
+    assert neighbour_masks(6)[0] == (1 << 1) | (1 << 6) | (1 << 7)
+
+
+@pytest.mark.parametrize("word,expected", [
+    ("hola", True),
+    ("cas", True),
+    ("casa", False),
+    ("hoyo", False),
+    ("perros", True),
+])
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_exists_big_board(monkeypatch, word, expected, engine):
+    distribution = [
+        list("holax"),
+        list("xxxxx"),
+        list("casxp"),
+        list("xxxer"),
+        list("xxsor"),
+    ]
+    monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
+
+    b = Board(5, engine=engine)
+    result = b.exists(word)
+    assert result is expected
+
+
+def test_solve_big_board(monkeypatch):
+    distribution = [
+        list("holaxx"),
+        list("xxxxxx"),
+        list("casxpx"),
+        list("xxxerx"),
+        list("xxsorx"),
+        list("xxxxxx"),
+    ]
+    monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
+    dictionary = Dictionary.from_words(["hola", "casa", "perros", "perro", "oso"])
+
+    b = Board(6)
+    assert b.solve(dictionary) == {
+        "hola": (0, 1, 2, 3),
+        "perro": (16, 21, 22, 28, 27),
+        "perros": (16, 21, 22, 28, 27, 26),
+        "oso": (27, 26, 27),
+    }
+
+
 def test_real_board_in_lowercase():
     b = Board()
     for line in b.distribution:
@@ -53,7 +139,8 @@ def test_real_board_in_lowercase():
             assert char.islower()
 
 
-def test_exists_simple_missing(monkeypatch):
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_exists_simple_missing(monkeypatch, engine):
     distribution = [
         list("abcd"),
         list("xyzq"),
@@ -62,7 +149,7 @@ def test_exists_simple_missing(monkeypatch):
     ]
     monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
 
-    b = Board()
+    b = Board(engine=engine)
     result = b.exists("hola")
     assert result is False
 
@@ -85,7 +172,8 @@ def test_exists_simple_missing(monkeypatch):
     ("abcdqzlxab", False),
     ("abcdqzblx", False),
 ])
-def test_exists_case_multiple(monkeypatch, word, expected):
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_exists_case_multiple(monkeypatch, word, expected, engine):
     distribution = [
         list("abcd"),
         list("xlzq"),
@@ -94,11 +182,89 @@ def test_exists_case_multiple(monkeypatch, word, expected):
     ]
     monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
 
-    b = Board()
+    b = Board(engine=engine)
     result = b.exists(word)
     assert result is expected
 
 
+@pytest.mark.parametrize("word,expected", [
+    ("", True),
+    ("ch", True),
+    ("c", False),
+    ("chc", False),
+    ("chch", False),
+    ("ach", True),
+    ("acha", True),
+    ("achab", False),
+    ("que", False),
+])
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_exists_first_dice_double(monkeypatch, word, expected, engine):
+    distribution = [
+        ["a", "ch", "x", "x"],
+        ["x", "x", "x", "x"],
+        ["x", "x", "x", "x"],
+        ["x", "x", "x", "b"],
+    ]
+    monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
+
+    b = Board(engine=engine)
+    result = b.exists(word)
+    assert result is expected
+
+
+@pytest.mark.parametrize("word,expected", [
+    ("qu", True),
+    ("aqu", True),
+    ("qua", True),
+    ("quaqu", False),  # la "qu" son dos letras, no puede repetirse como último
+])
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_exists_first_dice_double_qu(monkeypatch, word, expected, engine):
+    distribution = [
+        ["qu", "a", "x", "x"],
+        ["x", "x", "x", "x"],
+        ["x", "x", "x", "x"],
+        ["x", "x", "x", "b"],
+    ]
+    monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
+
+    b = Board(engine=engine)
+    assert b.exists(word) is expected
+
+
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_exists_first_dice_qu_not_closing(engine):
+    # volviendo a la "qu" del principio se armaría, pero no vale
+    b = Board(engine=engine, distribution=[
+        ["qu", "e", "x", "x"],
+        ["x", "x", "x", "x"],
+        ["x", "x", "x", "x"],
+        ["x", "x", "x", "x"],
+    ])
+    assert b.exists("que") is True
+    assert b.exists("quequ") is False
+
+
+def test_engine_default():
+    b = Board()
+    assert b.engine == "bitmask"
+
+
+def test_engine_unknown():
+    with pytest.raises(ValueError):
+        Board(engine="magic")
+
+
+def test_engines_agree_real_boards():
+    words = ["casa", "cosa", "sal", "ala", "ola", "pato", "tapa", "esa", "ese", "tos", "are"]
+    for _ in range(50):
+        b = Board()
+        reference = Board(engine="recursive", distribution=b.distribution)
+        expected = [reference.exists(word) for word in words]
+        assert [b.exists(word) for word in words] == expected
+
+
 def test_render():
     b = Board()
     b.distribution = [
@@ -126,7 +292,8 @@ def test_render():
     ("cholcho", True),
     ("choque", True),
 ])
-def test_exists_case_double_dices(monkeypatch, word, expected):
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_exists_case_double_dices(monkeypatch, word, expected, engine):
     distribution = [
         ["a", "b", "c", "h"],
         ["ch", "l", "o", "z"],
@@ -135,6 +302,87 @@ def test_exists_case_double_dices(monkeypatch, word, expected):
     ]
     monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
 
-    b = Board()
+    b = Board(engine=engine)
     result = b.exists(word)
     assert result is expected
+
+
+# -- pruebas de resolver el tablero completo
+
+
+def test_solve_simple(monkeypatch):
+    distribution = [
+        list("abcd"),
+        list("xlzq"),
+        list("hohh"),
+        list("jjjj"),
+    ]
+    monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
+    words = ["hola", "hold", "hol", "ablxa", "ablxab", "cdab", "abcdqzlxa", "abcdqzblx", "perro"]
+    dictionary = Dictionary.from_words(words)
+
+    b = Board()
+    result = b.solve(dictionary)
+    assert result == {
+        "hola": (8, 9, 5, 0),
+        "hol": (8, 9, 5),
+        "ablxa": (0, 1, 5, 4, 0),
+        "abcdqzlxa": (0, 1, 2, 3, 7, 6, 5, 4, 0),
+    }
+
+
+def test_solve_double_dices(monkeypatch):
+    distribution = [
+        ["a", "b", "c", "h"],
+        ["ch", "l", "o", "z"],
+        ["h", "o", "s", "a"],
+        ["j", "qu", "e", "j"],
+    ]
+    monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
+    words = ["chal", "choza", "bloque", "bchz", "bacho", "cholcho", "choque", "quel", "aqu"]
+    dictionary = Dictionary.from_words(words)
+
+    b = Board()
+    result = b.solve(dictionary)
+    assert set(result) == {w for w in words if b.exists(w)}
+    assert result["choque"] == (4, 9, 13, 14)
+    assert result["bacho"] == (1, 0, 4, 9)
+
+
+def test_solve_first_dice_double_not_at_end(monkeypatch):
+    distribution = [
+        ["ch", "a", "x", "x"],
+        ["x", "x", "x", "x"],
+        ["x", "x", "x", "x"],
+        ["x", "x", "x", "x"],
+    ]
+    monkeypatch.setattr(Board, "_get_distribution", lambda self: distribution)
+    dictionary = Dictionary.from_words(["cha", "chach"])
+
+    b = Board()
+    assert b.solve(dictionary) == {"cha": (0, 1)}
+    assert b.exists("chach") is False
+
+
+def test_solve_matches_exists_real_boards():
+    dictionary = Dictionary.from_words(["casa", "cosa", "sal", "ala", "ola", "pato", "tapa"])
+    for _ in range(50):
+        b = Board()
+        result = b.solve(dictionary)
+        assert set(result) == {word for word in dictionary if b.exists(word)}
+
+
+def test_solve_cached():
+    dictionary = Dictionary.from_words(["casa"])
+    b = Board()
+    assert b.solve(dictionary) is b.solve(dictionary)
+    assert b.solve(dictionary) is not b.solve(Dictionary.from_words(["casa"]))
+
+
+def test_release():
+    dictionary = Dictionary.from_words(["casa"])
+    b = Board()
+    solution = b.solve(dictionary)
+    b.release()
+    assert b.solve(dictionary) is not solution
+    assert b.solve(dictionary) == solution
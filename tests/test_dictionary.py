@@ -0,0 +1,267 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the dictionary module."""
+
+import os
+
+from botggle import dictionary as dictionary_module
+from botggle.dictionary import (
+    Dictionary, LazyDictionary, QU_SYMBOL, ROOT, normalize, prepare_words, tokenize)
+
+import pytest
+
+
+WORDS = ["casa", "casas", "caso", "cosa", "cosas", "paso", "pasos", "queso", "chal"]
+
+
+@pytest.fixture
+def dictionary():
+    return Dictionary.from_words(WORDS)
+
+
+@pytest.mark.parametrize("word", WORDS)
+def test_contains_all_words(dictionary, word):
+    assert word in dictionary
+
+
+@pytest.mark.parametrize("word", ["", "c", "cas", "casass", "cos", "perro", "quesos", "ñandú"])
+def test_contains_missing(dictionary, word):
+    assert word not in dictionary
+
+
+@pytest.mark.parametrize("prefix,expected", [
+    ("", True),
+    ("c", True),
+    ("cas", True),
+    ("casas", True),
+    ("que", True),
+    ("ch", True),
+    ("casass", False),
+    ("x", False),
+    ("pe", False),
+])
+def test_has_prefix(dictionary, prefix, expected):
+    assert dictionary.has_prefix(prefix) is expected
+
+
+def test_len(dictionary):
+    assert len(dictionary) == len(WORDS)
+
+
+def test_iter_sorted(dictionary):
+    assert list(dictionary) == sorted(WORDS)
+
+
+def test_index_and_word(dictionary):
+    for number, word in enumerate(dictionary):
+        assert dictionary.index(word) == number
+        assert dictionary.word(number) == word
+
+
+def test_index_missing(dictionary):
+    assert dictionary.index("cas") is None
+    assert dictionary.index("casos") is None
+    assert dictionary.index("kiwi") is None
+
+
+@pytest.mark.parametrize("number", [-1, len(WORDS)])
+def test_word_out_of_range(dictionary, number):
+    with pytest.raises(IndexError):
+        dictionary.word(number)
+
+
+def test_index_with_qu():
+    dictionary = Dictionary.from_words(["queso", "que", "quiso", "qatar", "casa"])
+    assert [dictionary.word(number) for number in range(5)] == list(dictionary)
+    assert dictionary.index("queso") == list(dictionary).index("queso")
+
+
+def test_unsorted_and_repeated_input():
+    dictionary = Dictionary.from_words(["pasos", "casa", "paso", "casa"])
+    assert list(dictionary) == ["casa", "paso", "pasos"]
+    assert len(dictionary) == 3
+
+
+def test_step_by_chunks(dictionary):
+    node = dictionary.step(ROOT, "qu")
+    assert node is not None
+    node = dictionary.step(node, "eso")
+    assert dictionary.is_final(node)
+    assert dictionary.step(node, "s") is None
+
+
+def test_qu_single_symbol(dictionary):
+    # la "qu" se guarda como un único símbolo, pero se busca y se recorre como siempre
+    assert QU_SYMBOL in dictionary.raw().alphabet
+    assert "u" not in dictionary.raw().alphabet
+    assert dictionary.step(ROOT, "qu") == dictionary.step(ROOT, QU_SYMBOL)
+    assert "q" not in dictionary.raw().alphabet
+    assert not dictionary.has_prefix("q")
+
+
+def test_q_without_u():
+    # sin preparar las palabras, las "q" sueltas se mantienen (y no se confunden con "qu")
+    dictionary = Dictionary.from_words(["qatar", "queso", "quzz", "qzz", "r"])
+    assert list(dictionary) == ["qatar", "qzz", "queso", "quzz", "r"]
+    assert "qatar" in dictionary
+    assert "quatar" not in dictionary
+    assert "qeso" not in dictionary
+
+
+def test_tokenize():
+    assert tokenize("queso") == QU_SYMBOL + "eso"
+    assert tokenize("quiquiriqui") == "".join([QU_SYMBOL, "i", QU_SYMBOL, "iri", QU_SYMBOL, "i"])
+    assert tokenize("chancho") == "chancho"
+    assert tokenize("qatar") == "qatar"
+
+
+def test_normalize():
+    assert normalize("Canción") == "cancion"
+    assert normalize("pa-ra") == "pa ra"
+
+
+@pytest.mark.parametrize("word,expected", [
+    ("casa", "casa"),
+    ("CASA", "casa"),
+    ("camión", "camion"),
+    ("queso", "queso"),
+    ("qatar", None),  # q sin u
+    ("kiwi", None),  # letras que no están en los dados
+    ("ñandu", None),
+    ("ya", None),  # muy corta
+    ("anti-", None),  # queda con un espacio
+    ("pa ra", None),
+])
+def test_prepare_words(word, expected):
+    letters = set("abcdefghijlmnopqrstuvxz")
+    assert list(prepare_words([word], letters, 3)) == ([] if expected is None else [expected])
+
+
+def test_minimized(dictionary):
+    # "mesa", "mesas" y "meso" terminan igual que "casa", "casas" y "caso", así que se
+    # comparte todo desde "me"/"ca" en adelante y sólo se agrega el nodo de la "m"
+    big = Dictionary.from_words(WORDS + ["mesa", "mesas", "meso"])
+    assert len(big._first_edge) == len(dictionary._first_edge) + 1
+
+
+def test_from_file(tmp_path):
+    filepath = tmp_path / "words.txt"
+    filepath.write_text("casa\n\ncosa  \nperro\n", encoding="utf8")
+    dictionary = Dictionary.from_file(filepath)
+    assert list(dictionary) == ["casa", "cosa", "perro"]
+
+
+def test_compile_and_load(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("\n".join(WORDS), encoding="utf8")
+    compiled = tmp_path / "words.dawg"
+    dictionary_module.compile_file(source, compiled)
+
+    dictionary = Dictionary.load(compiled)
+    assert list(dictionary) == sorted(WORDS)
+    assert "queso" in dictionary
+    assert "ques" not in dictionary
+    assert dictionary.has_prefix("ques")
+    assert dictionary.nbytes() == compiled.stat().st_size
+
+
+def test_load_invalid_buffer():
+    with pytest.raises(ValueError):
+        Dictionary(b"not a dictionary" * 4)
+
+
+def test_load_uses_compiled(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("casa\n", encoding="utf8")
+    compiled = tmp_path / "words.dawg"
+    compiled.write_bytes(dictionary_module.compile_words(["cosa"]))
+
+    dictionary = dictionary_module.load(source, compiled)
+    assert list(dictionary) == ["cosa"]
+
+
+def test_load_compiled_outdated(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("casa\n", encoding="utf8")
+    compiled = tmp_path / "words.dawg"
+    compiled.write_bytes(dictionary_module.compile_words(["cosa"]))
+    os.utime(compiled, (0, 0))
+
+    dictionary = dictionary_module.load(source, compiled)
+    assert list(dictionary) == ["casa"]
+
+
+def test_load_compiled_old_format(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("casa\n", encoding="utf8")
+    compiled = tmp_path / "words.dawg"
+    data = bytearray(dictionary_module.compile_words(["cosa"]))
+    data[8] = 1  # la versión
+    compiled.write_bytes(bytes(data))
+
+    dictionary = dictionary_module.load(source, compiled)
+    assert list(dictionary) == ["casa"]
+
+
+def test_load_prepares_words(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("Casa\nya\nkiwi\n", encoding="utf8")
+
+    def prepare(words):
+        return prepare_words(words, "acsy", 2)
+
+    dictionary = dictionary_module.load(source, tmp_path / "missing.dawg", prepare)
+    assert list(dictionary) == ["casa", "ya"]
+
+
+def test_load_compiled_missing(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("casa\n", encoding="utf8")
+
+    dictionary = dictionary_module.load(source, tmp_path / "missing.dawg")
+    assert list(dictionary) == ["casa"]
+
+
+def test_lazy_loads_once(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_load(source_path, compiled_path, prepare=None):
+        calls.append((source_path, compiled_path))
+        return Dictionary.from_words(WORDS)
+
+    monkeypatch.setattr(dictionary_module, "load", fake_load)
+    lazy = LazyDictionary("source", "compiled")
+    assert calls == []
+
+    assert "casa" in lazy
+    assert "perro" not in lazy
+    assert len(lazy) == len(WORDS)
+    assert lazy.has_prefix("qu")
+    assert calls == [("source", "compiled")]
+
+
+def test_cli_compile(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("casa\ncosa\nkiwi\nya\n", encoding="utf8")
+    compiled = tmp_path / "words.dawg"
+    dictionary_module.main(["compile", str(source), str(compiled)])
+    assert list(Dictionary.load(compiled)) == ["casa", "cosa"]
+
+
+def test_cli_compile_raw(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("casa\nkiwi\nya\n", encoding="utf8")
+    compiled = tmp_path / "words.dawg"
+    dictionary_module.main(["compile", "--raw", str(source), str(compiled)])
+    assert list(Dictionary.load(compiled)) == ["casa", "kiwi", "ya"]
+
+
+def test_cli_compile_language(tmp_path):
+    # en inglés se juega con la k y la w, y las palabras de tres letras dan puntos
+    source = tmp_path / "words.txt"
+    source.write_text("kiwi\nwok\nya\nñandú\n", encoding="utf8")
+    compiled = tmp_path / "words.dawg"
+    dictionary_module.main(["compile", "--language", "en", str(source), str(compiled)])
+    assert list(Dictionary.load(compiled)) == ["kiwi", "wok"]
@@ -0,0 +1,148 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the fuzzing module."""
+
+import json
+import random
+
+from botggle import fuzzing
+from botggle.board import Board, DICES_BY_SIZE
+
+import pytest
+
+BOARD = [["qu", "e", "s", "o"], ["a", "r", "t", "i"], ["l", "o", "s", "a"], ["c", "h", "e", "n"]]
+
+
+@pytest.fixture
+def broken_bitmask(monkeypatch):
+    # un motor rápido con un error: no encuentra ninguna palabra que empiece con "s"
+    original = Board._bitmask_search
+
+    def search(self, word):
+        return not word.startswith("s") and original(self, word)
+
+    monkeypatch.setattr(Board, "_bitmask_search", search)
+
+
+# -- pruebas de los tableros y las candidatas
+
+
+@pytest.mark.parametrize("size", sorted(DICES_BY_SIZE))
+def test_roll_board_reproducible(size):
+    first = fuzzing.roll_board(random.Random("7:3"), size)
+    assert first == fuzzing.roll_board(random.Random("7:3"), size)
+    assert len(first) == size and all(len(row) == size for row in first)
+
+
+def test_roll_tricky_board():
+    distribution = fuzzing.roll_board(random.Random(1), 5, tricky=True)
+    assert {face for row in distribution for face in row} <= set(fuzzing.TRICKY_FACES)
+
+
+def test_random_path_legal():
+    rng = random.Random(3)
+    for _ in range(200):
+        path = fuzzing.random_path(rng, 4, rng.randint(1, 12))
+        word = "".join(BOARD[position // 4][position % 4] for position in path)
+        # sólo se puede volver al primer dado si es de una letra
+        closes_on_qu = len(path) > 2 and path[-1] == path[0] == 0
+        assert fuzzing.is_valid_path(BOARD, word, path) != closes_on_qu
+
+
+def test_is_valid_path():
+    assert fuzzing.is_valid_path(BOARD, "queso", [0, 1, 2, 3])
+    assert not fuzzing.is_valid_path(BOARD, "queso", [0, 1, 2, 2])  # no arma la palabra
+    assert not fuzzing.is_valid_path(BOARD, "queo", [0, 1, 3])  # no son vecinos
+    assert not fuzzing.is_valid_path(BOARD, "erer", [1, 5, 1, 5])  # repite dados
+    assert fuzzing.is_valid_path(BOARD, "eare", [1, 4, 5, 1])  # vuelve al primero
+    assert not fuzzing.is_valid_path(BOARD, "queaqu", [0, 1, 4, 0])  # pero no si es "qu"
+
+
+def test_candidates_unique():
+    dictionary = fuzzing.rae_words.get()
+    solution = Board(distribution=BOARD).solve(dictionary)
+    words = fuzzing.candidates(random.Random(5), BOARD, dictionary, solution, per_kind=10)
+    assert len(words) == len(set(words))
+    assert set(words) & set(solution)
+    assert set(words) - set(solution)
+
+
+# -- pruebas de la comparación
+
+
+def test_fuzz_without_differences():
+    result, speed = fuzzing.fuzz(5, seed=11, engines=("bitmask", "solve"), per_kind=5)
+    assert result.counts["boards"] == 5
+    assert result.counts["words"] > 0
+    assert result.cases == []
+    assert speed > 0
+
+
+def test_fuzz_reproducible(broken_bitmask):
+    first, _ = fuzzing.fuzz(5, seed=11, engines=("bitmask",), per_kind=5)
+    second, _ = fuzzing.fuzz(5, seed=11, engines=("bitmask",), per_kind=5)
+    assert first.cases and first.cases == second.cases
+
+
+def test_fuzz_finds_broken_engine(broken_bitmask):
+    result, _ = fuzzing.fuzz(5, seed=11, engines=("bitmask",), per_kind=5)
+    assert result.cases
+    for case in result.cases:
+        assert case["engine"] == "bitmask"
+        assert case["word"].startswith("s")
+        assert (case["expected"], case["got"]) == (True, False)
+
+
+def test_fuzz_in_processes(monkeypatch):
+    monkeypatch.setattr(fuzzing, "CHUNK_SIZE", 3)
+    single, _ = fuzzing.fuzz(7, seed=3, engines=("bitmask",), per_kind=3)
+    parallel, _ = fuzzing.fuzz(7, seed=3, workers=2, engines=("bitmask",), per_kind=3)
+    assert parallel.counts == single.counts
+    assert parallel.counts["boards"] == 7
+
+
+def test_batch_engine():
+    pytest.importorskip("numpy")
+    result, _ = fuzzing.fuzz(3, seed=2, engines=("batch",), per_kind=2, sizes=[4])
+    assert result.counts["batch_boards"] == 3
+    assert result.cases == []
+
+
+# -- pruebas de los casos guardados
+
+
+def test_save_and_replay(tmp_path, broken_bitmask):
+    case = fuzzing._case(1, 2, "bitmask", BOARD, "sol", True, False)
+    path = fuzzing.save_case(case, tmp_path / "casos")
+    assert path.name.startswith("bitmask-")
+    assert json.loads(path.read_text(encoding="utf8")) == case
+    assert fuzzing.save_case(case, tmp_path / "casos") == path
+
+    assert fuzzing.replay(case) == (True, False)
+
+
+def test_replay_fixed():
+    case = fuzzing._case(1, 2, "solve", BOARD, "queso", True, False)
+    assert fuzzing.replay(case) == (True, True)
+
+
+def test_replay_unknown_engine():
+    case = fuzzing._case(1, 2, "otro", BOARD, "queso", True, False)
+    with pytest.raises(ValueError):
+        fuzzing.replay(case)
+
+
+def test_main(tmp_path, capsys, broken_bitmask):
+    output = tmp_path / "casos"
+    status = fuzzing.main([
+        "--boards", "3", "--workers", "1", "--seed", "11", "--engine", "bitmask",
+        "--per-kind", "5", "--output", str(output)])
+    assert status == 1
+    saved = sorted(output.iterdir())
+    assert saved
+    assert "diferencias: bitmask=" in capsys.readouterr().out
+
+    assert fuzzing.main(["--replay", *map(str, saved)]) == 1
+    assert "FALLA" in capsys.readouterr().out
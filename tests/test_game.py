@@ -4,9 +4,18 @@
 
 """Tests for the game module."""
 
+import sys
+import tracemalloc
+
 import botggle.game
 from botggle.board import Board
-from botggle.game import Game, TransitionError, NotActiveError, ResultWords
+from botggle.dictionary import Dictionary
+from botggle.generation import BoardQuality, generate_board
+from botggle.languages import SPANISH
+from botggle.game import (
+    Game, TransitionError, NotActiveError, ResultWords, RoundWords, PLAYABLE_LETTERS,
+    prepare_rae_words)
+from botggle.pool import BoardPool
 
 import pytest
 
@@ -16,14 +25,20 @@ import pytest
 
 def test_lifecycle_init():
     game = Game("chat")
-    assert game._state == Game.State.WAITING
+    assert game.state == Game.State.WAITING
+
+
+def test_state_read_only():
+    game = Game("chat")
+    with pytest.raises(AttributeError):
+        game.state = Game.State.ACTIVE
 
 
 def test_lifecycle_start_after_init():
     game = Game("chat")
-    game.round_words['foo'].add('bar')
+    game.round_words.add('foo', 'bar')
     game.start_round(Board())
-    assert game._state == Game.State.ACTIVE
+    assert game.state == Game.State.ACTIVE
     assert len(game.round_words) == 0
 
 
@@ -52,7 +67,7 @@ def test_lifecycle_next_round_when_stopped():
     game.start_round(Board())
     game.stop_round()
     game.next_round()
-    assert game._state == Game.State.WAITING
+    assert game.state == Game.State.WAITING
     assert all(not p.ready for p in game.players)
 
 
@@ -73,7 +88,7 @@ def test_lifecycle_stop_round_when_active():
     game = Game("chat")
     game.start_round(Board())
     game.stop_round()
-    assert game._state == Game.State.STOPPED
+    assert game.state == Game.State.STOPPED
 
 
 def test_lifecycle_stop_round_when_waiting():
@@ -94,7 +109,7 @@ def test_lifecycle_stop_round_when_stopped():
 
 def test_addtext_when_not_active():
     game = Game("chat")
-    assert game._state != Game.State.ACTIVE
+    assert game.state != Game.State.ACTIVE
     with pytest.raises(NotActiveError):
         game.add_text("jdoe", "fruta")
     assert len(game.round_words) == 0
@@ -123,6 +138,13 @@ def test_addtext_twice_differentword():
     assert game.round_words == {'jdoe': {'fruta1', 'fruta2'}}
 
 
+def test_addtext_returns_new_words():
+    game = Game("chat")
+    game.start_round(Board())
+    assert game.add_text("jdoe", "fruta casa") == ["fruta", "casa"]
+    assert game.add_text("jdoe", "casa perro perro") == ["perro"]
+
+
 def test_addtext_twice_differentuser():
     game = Game("chat")
     game.start_round(Board())
@@ -201,14 +223,15 @@ def test_addtext_with_uppercase():
 
 
 def test_evaluate_ok(monkeypatch):
-    monkeypatch.setattr(botggle.game, 'rae_words', {'foo', 'bar', 'baz'})
+    monkeypatch.setattr(SPANISH, 'words', {'foo', 'bar', 'baz'})
 
     board = Board()
-    board.exists = lambda word: True
+    board.solve = lambda dictionary: dictionary
 
     game = Game("chat")
     game.start_round(board)
-    game.round_words = {'jdoe': {'foo', 'bar'}, 'pepe': {'baz'}}
+    game.add_text('jdoe', 'foo bar')
+    game.add_text('pepe', 'baz')
 
     result = game.evaluate_words()
     expected_jdoe = ResultWords(
@@ -219,14 +242,14 @@ def test_evaluate_ok(monkeypatch):
 
 
 def test_evaluate_not_in_rae(monkeypatch):
-    monkeypatch.setattr(botggle.game, 'rae_words', {'bar'})
+    monkeypatch.setattr(SPANISH, 'words', {'bar'})
 
     board = Board()
-    board.exists = lambda word: True
+    board.solve = lambda dictionary: dictionary
 
     game = Game("chat")
     game.start_round(board)
-    game.round_words = {'jdoe': {'foo', 'bar'}}
+    game.add_text('jdoe', 'foo bar')
 
     result = game.evaluate_words()
     expected = ResultWords(
@@ -235,14 +258,14 @@ def test_evaluate_not_in_rae(monkeypatch):
 
 
 def test_evaluate_not_in_board(monkeypatch):
-    monkeypatch.setattr(botggle.game, 'rae_words', {'foo', 'bar'})
+    monkeypatch.setattr(SPANISH, 'words', {'foo', 'bar'})
 
     board = Board()
-    board.exists = lambda word: word in {'bar'}
+    board.solve = lambda dictionary: {'bar'}
 
     game = Game("chat")
     game.start_round(board)
-    game.round_words = {'jdoe': {'foo', 'bar'}}
+    game.add_text('jdoe', 'foo bar')
 
     result = game.evaluate_words()
     expected = ResultWords(
@@ -251,19 +274,17 @@ def test_evaluate_not_in_board(monkeypatch):
 
 
 def test_evaluate_repeated_valid(monkeypatch):
-    monkeypatch.setattr(botggle.game, 'rae_words', {'foo', 'bar', 'baz', 'wee', 'xxx'})
+    monkeypatch.setattr(SPANISH, 'words', {'foo', 'bar', 'baz', 'wee', 'xxx'})
 
     board = Board()
-    board.exists = lambda word: True
+    board.solve = lambda dictionary: dictionary
 
     game = Game("chat")
     game.start_round(board)
-    game.round_words = {
-        'jdoe': {'foo', 'bar'},
-        'pepe': {'foo', 'baz', 'wee'},
-        'mara': {'xxx', 'baz'},
-        'juan': {'foo'},
-    }
+    game.add_text('jdoe', 'foo bar')
+    game.add_text('pepe', 'foo baz wee')
+    game.add_text('mara', 'xxx baz')
+    game.add_text('juan', 'foo')
 
     result = game.evaluate_words()
     expected_jdoe = ResultWords(
@@ -278,6 +299,85 @@ def test_evaluate_repeated_valid(monkeypatch):
         'jdoe': expected_jdoe, 'pepe': expected_pepe, 'mara': expected_mara, 'juan': expected_juan}
 
 
+def test_evaluate_classified_while_adding(monkeypatch):
+    monkeypatch.setattr(SPANISH, 'words', {'foo', 'bar', 'baz'})
+
+    board = Board()
+    board.solve = lambda dictionary: {'foo', 'baz'}
+
+    game = Game("chat")
+    game.start_round(board)
+    game.add_text("jdoe", "foo bar xxx")
+    assert {word: game.word_status(word) for word in ('foo', 'bar', 'xxx')} == {
+        'foo': 'valid', 'bar': 'not_in_board', 'xxx': 'not_in_language'}
+
+    # una palabra que ya se clasificó no se vuelve a evaluar
+    monkeypatch.setattr(SPANISH, 'words', set())
+    board.solve = lambda dictionary: pytest.fail("No se tenía que volver a resolver")
+    game.add_text("pepe", "foo")
+    assert game.word_status('foo') == 'valid'
+
+    result = game.evaluate_words()
+    expected_jdoe = ResultWords(
+        valid=set(), repeated={'foo'}, not_in_language={'xxx'}, not_in_board={'bar'})
+    expected_pepe = ResultWords(
+        valid=set(), repeated={'foo'}, not_in_language=set(), not_in_board=set())
+    assert result == {'jdoe': expected_jdoe, 'pepe': expected_pepe}
+
+    # las 3 de jdoe se clasificaron una vez, el resto se aprovechó
+    assert game.lookup_counts == {'misses': 3, 'hits': 5}
+
+
+def test_word_status_not_added(monkeypatch):
+    # preguntar por una palabra que nadie mandó no la agrega a la ronda
+    monkeypatch.setattr(SPANISH, 'words', {'foo'})
+    game = Game("chat")
+    game.start_round(Board())
+    assert game.word_status('xxx') is None
+    assert game.word_status('foo') is None
+    assert game.round_words.find('xxx') is None
+    # la primera extra que llega es la primera que se anota
+    game.add_text("jdoe", "yyy")
+    assert game.round_words.find('yyy') == -1
+
+
+def test_next_round_releases_board(monkeypatch):
+    monkeypatch.setattr(SPANISH, 'words', {'foo'})
+    released = []
+
+    board = Board()
+    board.solve = lambda dictionary: {'foo'}
+    board.release = lambda: released.append(True)
+    game = Game("chat")
+    game.start_round(board)
+    game.add_text("jdoe", "foo")
+    game.stop_round()
+    assert released == []
+
+    game.next_round()
+    assert released == [True]
+    assert game._word_status == {}
+
+
+def test_evaluate_classification_reset_per_round(monkeypatch):
+    monkeypatch.setattr(SPANISH, 'words', {'foo'})
+
+    board = Board()
+    board.solve = lambda dictionary: {'foo'}
+    game = Game("chat")
+    game.start_round(board)
+    game.add_text("jdoe", "foo")
+    game.stop_round()
+    game.next_round()
+
+    board = Board()
+    board.solve = lambda dictionary: set()
+    game.start_round(board)
+    assert game.word_status('foo') is None
+    game.add_text("jdoe", "foo")
+    assert game.word_status('foo') == 'not_in_board'
+
+
 # -- pruebas de resumir puntajes
 
 def test_summarize_simple(monkeypatch):
@@ -344,7 +444,7 @@ def test_scores_too_long():
 
 
 def test_scores_intermediate(monkeypatch):
-    monkeypatch.setattr(botggle.game, "SCORES_TABLE", {6: 123})
+    monkeypatch.setattr(SPANISH, "scores_table", {6: 123})
     rw = ResultWords(
         valid={"foobar"}, repeated=set(), not_in_language=set(), not_in_board=set())
     game = Game("chat")
@@ -353,7 +453,7 @@ def test_scores_intermediate(monkeypatch):
 
 
 def test_scores_accumulates(monkeypatch):
-    monkeypatch.setattr(botggle.game, "SCORES_TABLE", {6: 123, 3: 15})
+    monkeypatch.setattr(SPANISH, "scores_table", {6: 123, 3: 15})
     rw = ResultWords(
         valid={"foobar", "yes"}, repeated=set(), not_in_language=set(), not_in_board=set())
     game = Game("chat")
@@ -379,3 +479,145 @@ def test_players_add():
     assert game.full_scores == {"test-username": 0}
 
     assert added_player.game is game
+
+
+def test_board_size_default():
+    game = Game("chat")
+    assert game.board_size == 4
+
+
+def test_board_size_custom():
+    game = Game("chat", board_size=6)
+    assert game.board_size == 6
+
+
+def test_pool_board_not_solved_again():
+    # el pool ya deja el tablero resuelto (con el diccionario real), el juego lo reusa
+    pool = BoardPool(lambda: generate_board(BoardQuality(min_words=5)), size=1)
+    board = pool.get()
+    solution = board._solution
+    assert solution
+
+    game = Game("chat")
+    game.start_round(board)
+    game.add_text("jdoe", " ".join(sorted(solution)[:3]) + " xxx")
+    assert game.word_status(sorted(solution)[0]) == "valid"
+    assert board._solution is solution
+
+
+def test_missed_words(monkeypatch):
+    board = Board()
+    board.solve = lambda dictionary: {'foo': (0,), 'bar': (1,), 'baz': (2,), 'ya': (3,)}
+    game = Game("chat")
+    game.start_round(board)
+    game.add_text("jdoe", "foo xxx")
+    game.add_text("pepe", "bar")
+    assert game.missed_words() == {'baz'}
+
+
+def test_missed_words_generated_board():
+    # sale de la solución que ya calculó el generador, sin volver a resolver el tablero
+    board = generate_board(BoardQuality(min_words=10))
+    solution = board._solution
+    playable = {word for word in solution if len(word) >= SPANISH.min_word_length}
+    sent = sorted(playable)[:4]
+
+    game = Game("chat")
+    game.start_round(board)
+    game.add_text("jdoe", " ".join(sent[:2]))
+    game.add_text("pepe", " ".join(sent[2:]) + " xxx")
+    assert game.missed_words() == playable - set(sent)
+    assert board._solution is solution
+
+
+# -- pruebas de cómo se guardan las palabras de la ronda
+
+def test_round_words_numbers():
+    dictionary = Dictionary.from_words(["casa", "cosa", "queso"])
+    round_words = RoundWords(dictionary)
+    assert round_words.add("jdoe", "cosa") == (1, True)
+    assert round_words.add("jdoe", "xxx") == (-1, True)
+    assert round_words.add("jdoe", "cosa") == (1, False)
+    assert round_words.add("pepe", "xxx") == (-1, True)
+    assert round_words.add("pepe", "yyy") == (-2, True)
+    assert round_words.add("pepe", "queso") == (2, True)
+
+    assert list(round_words.numbers("jdoe")) == [1, -1]
+    assert round_words == {"jdoe": {"cosa", "xxx"}, "pepe": {"xxx", "yyy", "queso"}}
+    assert round_words.words() == {"cosa", "xxx", "yyy", "queso"}
+
+
+def test_round_words_without_numbers():
+    # con un diccionario que no numera sus palabras, van todas aparte
+    round_words = RoundWords({"casa"})
+    assert round_words.add("jdoe", "casa") == (-1, True)
+    assert round_words == {"jdoe": {"casa"}}
+
+
+def test_round_words_interned():
+    round_words = RoundWords(set())
+    word = "".join(["pala", "bra"])
+    round_words.add("jdoe", word)
+    assert round_words.word(-1) is sys.intern("palabra")
+
+
+def test_round_words_nbytes_complete():
+    # lo que informa tiene que alcanzar para todo lo que guarda (números incluidos)
+    dictionary = Dictionary.from_words([f"palabra{index}" for index in range(1000)])
+    sent = [
+        (f"jugadore{player}", "".join(["pala", f"bra{(player * 37 + index * 11) % 1200}"]))
+        for player in range(10) for index in range(40)]
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        round_words = RoundWords(dictionary)
+        for username, word in sent:
+            round_words.add(username, word)
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    reported = round_words.nbytes() + sum(map(round_words.nbytes, round_words))
+    assert reported >= used
+
+
+def test_player_slots():
+    player = Game("chat").add_player("jdoe")
+    assert not hasattr(player, "__dict__")
+
+
+def test_memory_report(monkeypatch):
+    monkeypatch.setattr(SPANISH, 'words', Dictionary.from_words(["foo", "bar"]))
+    board = Board()
+    board.solve = lambda dictionary: {'foo'}
+    game = Game("chat")
+    game.add_player("jdoe")
+    game.add_player("pepe")
+    game.start_round(board)
+    game.add_text("jdoe", "foo bar xxx " + " ".join(f"extra{index}" for index in range(20)))
+
+    report = game.memory_report()
+    assert set(report["players"]) == {"jdoe", "pepe"}
+    jdoe = report["players"]["jdoe"]
+    assert 0 < jdoe["words"] < jdoe["words_as_sets"]
+    assert report["players"]["pepe"]["words"] == 0
+    assert report["game"]["round_words"] > 0
+
+
+# -- pruebas de las palabras de la RAE
+
+def test_playable_letters():
+    # las que no aparecen en ningún dado
+    assert PLAYABLE_LETTERS.isdisjoint("kwyñ")
+    assert set("aeiouqxz") <= PLAYABLE_LETTERS
+
+
+def test_prepare_rae_words():
+    words = ["Canción", "kiwi", "qatar", "queso", "chancho", "no"]
+    assert list(prepare_rae_words(words)) == ["cancion", "queso", "chancho"]
+
+
+def test_rae_words_only_playable():
+    for word in botggle.game.rae_words.get():
+        assert len(word) >= botggle.game.MIN_WORD_LENGTH
+        assert PLAYABLE_LETTERS.issuperset(word)
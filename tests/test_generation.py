@@ -0,0 +1,92 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the generation module."""
+
+from botggle.board import Board
+from botggle.dictionary import Dictionary
+from botggle.generation import BoardQuality, BoardStats, generate_board, measure_throughput
+
+import pytest
+
+POOR = [
+    list("xxxx"),
+    list("xxxx"),
+    list("xxxx"),
+    list("xxxx"),
+]
+GOOD = [
+    list("casa"),
+    list("oxlx"),
+    list("xxxx"),
+    list("xxxx"),
+]
+DICTIONARY = Dictionary.from_words(["casa", "cosa", "sal", "las", "ola", "a", "casal"])
+
+
+@pytest.fixture
+def distributions(monkeypatch):
+    """Hace que los tableros salgan con las distribuciones que se carguen, en orden."""
+    queue = []
+    monkeypatch.setattr(Board, "_get_distribution", lambda self: queue.pop(0))
+    return queue
+
+
+def test_stats_from_solution():
+    stats = BoardStats.from_solution({"a": (0,), "sal": (1, 2, 3), "casal": (0, 1, 2, 3, 4)})
+    assert stats == BoardStats(words=2, score=5, longest=5)
+
+
+def test_stats_empty():
+    stats = BoardStats.from_solution({})
+    assert stats == BoardStats(words=0, score=0, longest=0)
+
+
+@pytest.mark.parametrize("quality,expected", [
+    (BoardQuality(), True),
+    (BoardQuality(min_words=3), True),
+    (BoardQuality(min_words=4), False),
+    (BoardQuality(min_score=5), True),
+    (BoardQuality(min_score=6), False),
+    (BoardQuality(min_longest=5), True),
+    (BoardQuality(min_longest=6), False),
+    (BoardQuality(min_words=3, min_longest=6), False),
+])
+def test_stats_satisfies(quality, expected):
+    stats = BoardStats(words=3, score=5, longest=5)
+    assert stats.satisfies(quality) is expected
+
+
+def test_generate_retries_until_quality(distributions):
+    distributions.extend([POOR, POOR, GOOD, POOR])
+    board = generate_board(BoardQuality(min_words=2), DICTIONARY)
+    assert board.distribution == GOOD
+    assert distributions == [POOR]
+
+
+def test_generate_already_solved(distributions):
+    distributions.append(GOOD)
+    board = generate_board(BoardQuality(), DICTIONARY)
+    assert board._solved_with is DICTIONARY
+    assert "casa" in board.solve(DICTIONARY)
+
+
+def test_generate_gives_up_with_best(distributions):
+    distributions.extend([POOR, GOOD, POOR])
+    board = generate_board(BoardQuality(min_words=100), DICTIONARY, max_attempts=3)
+    assert board.distribution == GOOD
+    assert distributions == []
+
+
+def test_throughput():
+    result = measure_throughput(BoardQuality(min_words=1), DICTIONARY, seconds=0.05)
+    assert result["attempts_per_second"] > 0
+    assert result["accepted_per_second"] <= result["attempts_per_second"]
+    assert 0 <= result["acceptance_rate"] <= 1
+
+
+def test_generate_size():
+    board = generate_board(BoardQuality(), DICTIONARY, size=5)
+    assert board.size == 5
+    assert len(board.distribution) == 5
@@ -0,0 +1,153 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the history module."""
+
+import threading
+
+from botggle.game import ResultWords
+from botggle.history import HistoryStore, PlayerRound, PlayerStats
+
+import pytest
+
+BOARD = [["qu", "e", "s"], ["o", "a", "r"], ["t", "i", "l"]]
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = HistoryStore(tmp_path / "history.sqlite")
+    yield history
+    history.close()
+
+
+def _round(history, chat_id, words_by_username, scores, finished=1000):
+    user_words = {
+        username: ResultWords(valid=set(valid), repeated=set(repeated))
+        for username, (valid, repeated) in words_by_username.items()}
+    history.record_round(chat_id, BOARD, user_words, scores, finished=finished)
+
+
+# -- pruebas del registro de rondas
+
+
+def test_empty(history):
+    assert history.load_rounds() == []
+    assert history.ranking(77) == []
+    assert history.player_stats("fulane") is None
+
+
+def test_record_and_load(history):
+    _round(
+        history, 77, {"fulane": (["queso", "sol"], ["rio"]), "mengane": ([], ["rio"])},
+        {"fulane": 5, "mengane": 0}, finished=1234.5)
+
+    (record,) = history.load_rounds()
+    assert record.chat_id == 77
+    assert record.finished == 1234.5
+    assert record.board == BOARD
+    assert record.players == [
+        PlayerRound("fulane", 5, valid=2, repeated=1, not_in_language=0, not_in_board=0),
+        PlayerRound("mengane", 0, valid=0, repeated=1, not_in_language=0, not_in_board=0)]
+
+
+def test_buffered_until_flush(history):
+    _round(history, 77, {"fulane": (["sol"], [])}, {"fulane": 1})
+    assert history.stats() == {"rounds": 0, "pending": 1}
+
+    history.flush()
+    assert history.stats() == {"rounds": 1, "pending": 0}
+
+
+def test_flush_from_other_thread(history):
+    _round(history, 77, {"fulane": (["sol"], [])}, {"fulane": 1})
+    thread = threading.Thread(target=history.flush)
+    thread.start()
+    thread.join()
+    assert history.stats() == {"rounds": 1, "pending": 0}
+
+
+def test_load_by_chat(history):
+    _round(history, 77, {"fulane": (["sol"], [])}, {"fulane": 1}, finished=1)
+    _round(history, 88, {"mengane": (["sol"], [])}, {"mengane": 1}, finished=2)
+    _round(history, 77, {"fulane": (["rio"], [])}, {"fulane": 1}, finished=3)
+
+    assert [record.finished for record in history.load_rounds(77)] == [1, 3]
+    assert [record.finished for record in history.load_rounds()] == [1, 2, 3]
+
+
+def test_close_flushes(tmp_path):
+    path = tmp_path / "history.sqlite"
+    history = HistoryStore(path)
+    _round(history, 77, {"fulane": (["sol"], [])}, {"fulane": 1})
+    history.close()
+
+    history = HistoryStore(path)
+    assert len(history.load_rounds()) == 1
+    history.close()
+
+
+# -- pruebas de los acumulados
+
+
+def test_player_stats(history):
+    _round(
+        history, 77, {"fulane": (["queso", "sol"], []), "mengane": (["rio"], [])},
+        {"fulane": 5, "mengane": 1})
+    _round(
+        history, 88, {"fulane": (["sol"], []), "mengane": (["tiesa", "ola"], [])},
+        {"fulane": 1, "mengane": 5})
+    _round(history, 88, {"fulane": (["toser"], []), "mengane": ([], [])},
+           {"fulane": 4, "mengane": 0})
+
+    stats = history.player_stats("fulane")
+    assert stats == PlayerStats(
+        "fulane", rounds=3, wins=2, points=10, valid_words=4, best_word="queso",
+        best_word_score=4)
+    assert stats.win_rate == pytest.approx(2 / 3)
+
+    # la mejor palabra no cambia por una que da lo mismo o menos
+    stats = history.player_stats("mengane")
+    assert (stats.best_word, stats.best_word_score) == ("tiesa", 4)
+
+
+def test_ties_and_zero_scores(history):
+    _round(history, 77, {"fulane": (["sol"], []), "mengane": (["rio"], [])},
+           {"fulane": 1, "mengane": 1})
+    _round(history, 77, {"fulane": ([], ["mar"]), "mengane": ([], ["mar"])},
+           {"fulane": 0, "mengane": 0})
+
+    for username in ("fulane", "mengane"):
+        stats = history.player_stats(username)
+        assert (stats.rounds, stats.wins) == (2, 1)
+
+
+def test_ranking_by_chat(history):
+    _round(history, 77, {"fulane": (["sol"], []), "mengane": (["queso"], [])},
+           {"fulane": 1, "mengane": 4})
+    _round(history, 88, {"fulane": (["tiesa"], []), "sutane": (["ola"], [])},
+           {"fulane": 4, "sutane": 1})
+    _round(history, 77, {"fulane": (["toser"], []), "mengane": ([], [])},
+           {"fulane": 4, "mengane": 0})
+
+    ranking = history.ranking(77)
+    assert [(stats.username, stats.points, stats.rounds, stats.wins) for stats in ranking] == [
+        ("fulane", 5, 2, 1), ("mengane", 4, 2, 1)]
+    assert ranking[0].best_word == "toser"  # en este chat no jugó "tiesa"
+    assert [stats.username for stats in history.ranking(88)] == ["fulane", "sutane"]
+    assert len(history.ranking(77, limit=1)) == 1
+
+
+def test_aggregates_match_log(history):
+    # los acumulados tienen que dar lo mismo que recorrer todo el registro
+    for index in range(20):
+        scores = {"fulane": index % 3, "mengane": index % 5, "sutane": 2}
+        words = {username: (["sol"] * bool(score), []) for username, score in scores.items()}
+        _round(history, 77 + index % 2, words, scores)
+
+    totals = {}
+    for record in history.load_rounds():
+        for player in record.players:
+            totals[player.username] = totals.get(player.username, 0) + player.score
+    assert {
+        username: history.player_stats(username).points for username in totals} == totals
@@ -0,0 +1,154 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the languages module."""
+
+import random
+
+from botggle.board import Board
+from botggle.dictionary import compile_file
+from botggle.game import Game
+from botggle.generation import BoardQuality, generate_board
+from botggle.languages import (
+    ENGLISH, ENGLISH_DICES, LANGUAGES, Language, SPANISH, available_languages, get_language,
+    register)
+
+import pytest
+
+# un idioma de juguete: todos los dados tienen las mismas caras
+TOY_DICES = [("a", "b", "c", "d", "e", "qu")] * 4
+
+
+@pytest.fixture
+def toy(tmp_path):
+    words_path = tmp_path / "toy_words.txt"
+    words_path.write_text("abad\nCABE\nbeba\nquebec\nxyz\nab\n", encoding="utf8")
+    cleaning_table = str.maketrans("ABCDE", "abcde", "!")
+    return Language(
+        "toy", "juguete", words_path, {2: TOY_DICES}, scores_table={3: 10, 4: 20},
+        max_word_score=50, cleaning_table=cleaning_table)
+
+
+# -- pruebas del registro
+
+
+def test_default_language():
+    assert get_language() is SPANISH
+    assert get_language("es") is SPANISH
+    assert get_language("en") is ENGLISH
+
+
+def test_unknown_language():
+    with pytest.raises(ValueError):
+        get_language("xx")
+
+
+def test_register_twice(toy):
+    with pytest.raises(ValueError):
+        register(Language("es", "otro", toy.words_path, {}, {3: 1}, 1))
+    assert LANGUAGES["es"] is SPANISH
+
+
+def test_available(monkeypatch, toy):
+    assert SPANISH in available_languages()
+    monkeypatch.setitem(LANGUAGES, "toy", toy)
+    assert toy in available_languages()
+    toy.words_path.unlink()
+    assert toy not in available_languages()
+
+
+# -- pruebas de las reglas de cada idioma
+
+
+def test_spanish_rules():
+    assert (SPANISH.min_word_length, SPANISH.max_word_length) == (3, 14)
+    assert [SPANISH.word_score("x" * length) for length in (2, 3, 5, 14, 15)] == [
+        0, 1, 4, 67, 79]
+    assert SPANISH.normalize("Camión, MOÑO") == "camion  moño"
+    assert SPANISH.compiled_path.name == "rae_words.dawg"
+
+
+def test_english_rules():
+    assert len(ENGLISH_DICES) == 16
+    assert set(ENGLISH.dices_by_size) == {4}
+    assert [ENGLISH.word_score("x" * length) for length in (3, 4, 5, 7, 8, 12)] == [
+        1, 1, 2, 5, 11, 11]
+    assert set("kwy") <= ENGLISH.playable_letters
+    assert "ñ" not in ENGLISH.playable_letters
+
+
+def test_prepare_words(toy):
+    words = ["ABAD", "quebec", "xyz", "ab", "be!ba"]
+    assert list(toy.prepare_words(words)) == ["abad", "quebec", "beba"]
+
+
+# -- pruebas de la carga (una sola vez, cuando se usa)
+
+
+def test_loaded_lazily_and_shared(toy):
+    assert toy.words._dictionary is None
+
+    first = Game("chat", board_size=2, language=toy)
+    second = Game("otro chat", board_size=2, language=toy)
+    assert toy.words._dictionary is None
+
+    first.start_round(Board(2, distribution=[["c", "a"], ["b", "e"]]))
+    first.add_text("fulane", "CABE")
+    dictionary = toy.words._dictionary
+    assert dictionary is not None
+    assert sorted(dictionary) == ["abad", "beba", "cabe", "quebec"]
+
+    second.start_round(Board(2, distribution=[["b", "e"], ["a", "b"]]))
+    second.add_text("mengane", "beba")
+    assert toy.words._dictionary is dictionary
+
+
+def test_only_compiled(toy):
+    # un idioma que trae sólo el diccionario compilado, sin las palabras
+    compile_file(toy.words_path, toy.compiled_path, toy.prepare_words)
+    toy.words_path.unlink()
+    assert toy.is_available()
+    assert "cabe" in toy.words
+    assert "ab" not in toy.words
+
+
+def test_game_uses_language(toy):
+    game = Game("chat", board_size=2, language=toy)
+    game.add_player("fulane")
+    game.start_round(Board(2, distribution=[["c", "a"], ["b", "e"]]))
+    game.add_text("fulane", "CABE! abad ab")
+    game.stop_round()
+
+    result = game.evaluate_words()["fulane"]
+    assert result.valid == {"cabe"}
+    assert result.not_in_board == {"abad"}
+    assert result.not_in_language == {"ab"}
+    assert game.summarize_scores({"fulane": result}) == {"fulane": 20}
+
+
+# -- pruebas de los tableros
+
+
+def test_board_with_dices():
+    random.seed(0)
+    board = Board(4, dices=ENGLISH_DICES)
+    faces = [face for row in board.distribution for face in row]
+    assert len(faces) == 16
+    assert all(any(face in dice for dice in ENGLISH_DICES) for face in faces)
+
+
+def test_board_wrong_dices():
+    with pytest.raises(ValueError):
+        Board(4, dices=ENGLISH_DICES[:10])
+
+
+def test_generate_board(toy):
+    board = generate_board(BoardQuality(min_words=1), size=2, language=toy)
+    assert board.size == 2
+    assert board.solve(toy.words.get())
+
+
+def test_generate_board_size_without_dices(toy):
+    with pytest.raises(ValueError):
+        generate_board(size=4, language=toy)
@@ -1,7 +1,8 @@
 """Tests for the messages module."""
 
 from botggle.game import ResultWords
-from botggle.messages import get_user_round_result
+from botggle.history import PlayerStats
+from botggle.messages import get_missed_words_result, get_ranking_result, get_user_round_result
 
 
 def test_case_1():
@@ -42,3 +43,59 @@ def test_case_3():
     )
     assert result == (
         "[1] ene, for; [2] cela, juna | REPES: --- | NO-DICC: --- | NO-TABLERO: ---")
+
+
+def test_short_and_long_words():
+    # palabras válidas que no están en la tabla de puntajes (muy cortas o muy largas)
+    result = get_user_round_result(
+        ResultWords(
+            valid={"ya", "ene", "anticonstitucional"},
+            repeated=set(),
+            not_in_language=set(),
+            not_in_board=set(),
+        )
+    )
+    assert result == (
+        "[0] ya; [1] ene; [79] anticonstitucional | REPES: --- | NO-DICC: --- | NO-TABLERO: ---")
+
+
+# -- pruebas de las palabras que nadie encontró
+
+def test_missed_words_empty():
+    assert get_missed_words_result(set()) == "Palabras que nadie encontró: ---"
+
+
+def test_missed_words_ranked():
+    result = get_missed_words_result({"ene", "cela", "junta", "for", "juna"})
+    assert result == "Palabras que nadie encontró: [4] junta; [2] cela, juna; [1] ene, for"
+
+
+def test_missed_words_truncated():
+    words = {f"pal{chr(ord('a') + index)}" for index in range(20)}
+    result = get_missed_words_result(words, max_length=60)
+    assert len(result) <= 60
+    assert result.startswith("Palabras que nadie encontró: [2] pala, palb")
+    shown = result.split("] ")[1].split(" (")[0].split(", ")
+    assert result.endswith(f" (y {20 - len(shown)} más)")
+
+
+def test_missed_words_just_fits():
+    result = get_missed_words_result({"pala", "palb"})
+    assert get_missed_words_result({"pala", "palb"}, max_length=len(result)) == result
+
+
+def test_ranking_empty():
+    assert get_ranking_result([]) == "Todavía no se terminó ninguna ronda en este chat"
+
+
+def test_ranking():
+    ranking = [
+        PlayerStats("fulane", rounds=4, wins=3, points=20, valid_words=9, best_word="queso",
+                    best_word_score=4),
+        PlayerStats("mengane", rounds=4, wins=0, points=0, valid_words=0, best_word=None,
+                    best_word_score=0),
+    ]
+    assert get_ranking_result(ranking) == (
+        "Ranking del chat:\n"
+        "1. fulane: 20 puntos en 4 rondas (ganó el 75%), mejor palabra: queso\n"
+        "2. mengane: 0 puntos en 4 rondas (ganó el 0%)")
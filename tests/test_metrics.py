@@ -0,0 +1,162 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the metrics module."""
+
+import asyncio
+import urllib.error
+import urllib.request
+
+from botggle.metrics import Registry
+
+import pytest
+
+
+@pytest.fixture
+def registry():
+    registry = Registry()
+    registry.enable()
+    return registry
+
+
+# -- pruebas de los tipos de métricas
+
+
+def test_counter(registry):
+    counter = registry.counter("words", "Palabras")
+    counter.inc()
+    counter.inc(4)
+    assert registry.render() == "# HELP words Palabras\n# TYPE words counter\nwords_total 5\n"
+
+
+def test_counter_labels(registry):
+    counter = registry.counter("messages", "Mensajes", labelnames=("kind",))
+    counter.labels(kind="b").inc()
+    counter.labels(kind="a").inc(2)
+    counter.labels(kind="b").inc()
+    assert registry.render().splitlines()[2:] == [
+        'messages_total{kind="a"} 2',
+        'messages_total{kind="b"} 2',
+    ]
+
+
+def test_gauge(registry):
+    gauge = registry.gauge("players", "Jugadores")
+    gauge.set(3)
+    assert registry.render().splitlines()[-1] == "players 3"
+
+
+def test_gauge_function(registry):
+    games = {1: "juego"}
+    registry.gauge("games", "Juegos", function=lambda: len(games))
+    games[2] = "otro"
+    assert registry.render().splitlines()[-1] == "games 2"
+
+
+def test_histogram(registry):
+    histogram = registry.histogram("latency", "Latencia", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    assert registry.render().splitlines()[2:] == [
+        'latency_bucket{le="0.1"} 2',
+        'latency_bucket{le="1"} 3',
+        'latency_bucket{le="+Inf"} 4',
+        "latency_sum 3.65",
+        "latency_count 4",
+    ]
+
+
+def test_histogram_labels(registry):
+    histogram = registry.histogram("handler", "Handlers", labelnames=("name",), buckets=(1,))
+    histogram.labels(name='di "hola"').observe(0.5)
+    assert 'handler_bucket{name="di \\"hola\\"",le="1"} 1' in registry.render()
+
+
+def test_repeated_name(registry):
+    registry.counter("words", "Palabras")
+    with pytest.raises(ValueError):
+        registry.gauge("words", "Otra cosa")
+
+
+# -- pruebas de medir tiempos
+
+
+def test_time(registry):
+    histogram = registry.histogram("block", "Bloque")
+    with registry.time(histogram):
+        pass
+    assert histogram.count == 1
+    assert histogram.sum >= 0
+
+
+def test_timed(registry):
+    histogram = registry.histogram("handler", "Handler")
+
+    @registry.timed(histogram)
+    async def handler(value):
+        """Docstring."""
+        return value * 2
+
+    assert asyncio.run(handler(21)) == 42
+    assert histogram.count == 1
+    assert handler.__doc__ == "Docstring."
+
+
+def test_timed_exception(registry):
+    histogram = registry.histogram("handler", "Handler")
+
+    @registry.timed(histogram)
+    async def handler():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        asyncio.run(handler())
+    assert histogram.count == 1
+
+
+# -- pruebas de las métricas deshabilitadas
+
+
+def test_disabled_does_nothing():
+    registry = Registry()
+    counter = registry.counter("words", "Palabras")
+    histogram = registry.histogram("latency", "Latencia")
+
+    @registry.timed(histogram)
+    async def handler():
+        return "ok"
+
+    counter.inc()
+    histogram.observe(1)
+    with registry.time(histogram):
+        pass
+    assert asyncio.run(handler()) == "ok"
+    assert counter.value == 0
+    assert histogram.count == 0
+
+    registry.enable()
+    counter.inc()
+    assert counter.value == 1
+
+
+# -- pruebas del endpoint HTTP
+
+
+def test_serve():
+    registry = Registry()
+    registry.counter("words", "Palabras").inc()  # todavía deshabilitado
+    server = registry.serve(0)
+    try:
+        assert registry.enabled
+        registry._metrics["words"].inc(2)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "words_total 2" in response.read().decode("utf8")
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/otra")
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,257 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the outbound module."""
+
+import asyncio
+import time
+
+from botggle.outbound import BUCKET_EVICTION_INTERVAL, MAX_MESSAGE_LENGTH, Outbox, TokenBucket
+
+import pytest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class RetryAfter(Exception):
+    """Como el de Telegram: trae cuánto hay que esperar."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Flood control, retry in {retry_after}")
+        self.retry_after = retry_after
+
+
+class FakeBot:
+    """Un bot de mentira que registra lo que se le manda (y puede fallar a pedido)."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.sent = []
+        self.failures = []  # excepciones a levantar en los próximos envíos
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((time.monotonic(), chat_id, text, kwargs))
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def deliver(outbox, bot, messages):
+    """Arranca el outbox, encola los mensajes y espera a que salgan todos."""
+    outbox.start(bot)
+    try:
+        futures = [outbox.send(chat_id, text, **kwargs) for chat_id, text, kwargs in messages]
+        await asyncio.wait_for(asyncio.gather(*futures, return_exceptions=True), 5)
+        return futures
+    finally:
+        await outbox.stop()
+
+
+# -- pruebas del token bucket
+
+
+def test_bucket_burst_then_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+    for _ in range(3):
+        assert bucket.delay() == 0
+        bucket.consume()
+    assert bucket.delay() == pytest.approx(0.5)
+
+    clock.now = 0.5
+    assert bucket.delay() == 0
+    bucket.consume()
+    assert bucket.delay() == pytest.approx(0.5)
+
+
+def test_bucket_does_not_overfill():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock)
+    clock.now = 100
+    bucket.consume()
+    bucket.consume()
+    assert bucket.delay() > 0
+
+
+# -- pruebas del outbox
+
+
+def test_send_simple():
+    bot = FakeBot()
+    outbox = Outbox()
+    run(deliver(outbox, bot, [(1, "hola", {})]))
+    assert [(chat_id, text) for _, chat_id, text, _ in bot.sent] == [(1, "hola")]
+    stats = outbox.stats()
+    assert stats["sent"] == 1
+    assert stats["queued"] == 0
+    assert stats["latency_max"] >= 0
+
+
+def test_merge_consecutive_same_chat():
+    bot = FakeBot(delay=0.01)
+    outbox = Outbox(chat_rate=1000, chat_burst=1)
+
+    async def scenario():
+        outbox.start(bot)
+        futures = [outbox.send(1, "uno")]
+        await asyncio.sleep(0)  # el primero ya sale solo
+        futures += [outbox.send(1, "dos"), outbox.send(1, "tres"), outbox.send(2, "otro")]
+        await asyncio.gather(*futures)
+        await outbox.stop()
+
+    run(scenario())
+    texts = sorted((chat_id, text) for _, chat_id, text, _ in bot.sent)
+    assert texts == [(1, "dos\n\ntres"), (1, "uno"), (2, "otro")]
+    assert outbox.stats()["merged"] == 1
+    assert outbox.stats()["api_calls"] == 3
+
+
+def test_merge_respects_kwargs_and_length():
+    bot = FakeBot()
+    outbox = Outbox(chat_rate=1000, chat_burst=1)
+    long_text = "x" * (MAX_MESSAGE_LENGTH - 2)
+
+    async def scenario():
+        outbox.start(bot)
+        outbox.send(1, "primero")
+        await asyncio.sleep(0)
+        futures = [
+            outbox.send(1, "a"),
+            outbox.send(1, "b", parse_mode="Markdown"),
+            outbox.send(1, long_text),
+            outbox.send(1, "c"),
+        ]
+        await asyncio.gather(*futures)
+        await outbox.stop()
+
+    run(scenario())
+    texts = [text for _, _, text, _ in bot.sent]
+    assert texts[1:] == ["a", "b", long_text, "c"]
+
+
+def test_order_per_chat():
+    bot = FakeBot()
+    outbox = Outbox(chat_rate=1000, chat_burst=1)
+    messages = [(chat_id, f"{chat_id}-{i}", {"n": i}) for i in range(20) for chat_id in (1, 2)]
+    run(deliver(outbox, bot, messages))
+    for chat_id in (1, 2):
+        texts = [text for _, sent_chat, text, _ in bot.sent if sent_chat == chat_id]
+        assert texts == [f"{chat_id}-{i}" for i in range(20)]
+
+
+def test_chat_rate_limit():
+    bot = FakeBot()
+    outbox = Outbox(global_rate=1000, chat_rate=20, chat_burst=1)
+    # con kwargs distintos no se pueden juntar, así que son 5 envíos al mismo chat
+    messages = [(1, str(i), {"n": i}) for i in range(5)]
+    run(deliver(outbox, bot, messages))
+    times = [moment for moment, _, _, _ in bot.sent]
+    assert times[-1] - times[0] >= 4 / 20 * 0.9
+
+
+def test_global_rate_limit():
+    bot = FakeBot()
+    outbox = Outbox(global_rate=20, chat_rate=1000, chat_burst=1000)
+    messages = [(chat_id, "hola", {}) for chat_id in range(40)]
+    run(deliver(outbox, bot, messages))
+    times = sorted(moment for moment, _, _, _ in bot.sent)
+    # el bucket arranca lleno (20), los otros 20 salen a razón de 20 por segundo
+    assert times[-1] - times[0] >= 19 / 20 * 0.9
+
+
+def test_retry_on_flood():
+    bot = FakeBot()
+    bot.failures = [RetryAfter(0.05)]
+    outbox = Outbox(backoff=0.01)
+    futures = run(deliver(outbox, bot, [(1, "hola", {})]))
+    assert futures[0].result() is None
+    assert [text for _, _, text, _ in bot.sent] == ["hola"]
+    assert outbox.stats()["retries"] == 1
+
+
+def test_retry_goes_through_rate_limit():
+    # el reintento también necesita un token del chat (acá, uno cada 0.2 segundos)
+    bot = FakeBot()
+    bot.failures = [RetryAfter(0.001)]
+    outbox = Outbox(global_rate=1000, chat_rate=5, chat_burst=1, backoff=0.001)
+    started = time.monotonic()
+    futures = run(deliver(outbox, bot, [(1, "hola", {})]))
+    assert futures[0].result() is None
+    ((moment, _, text, _),) = bot.sent
+    assert text == "hola"
+    assert moment - started >= 0.2 * 0.9
+
+
+def test_retry_keeps_order():
+    bot = FakeBot(delay=0.01)
+    bot.failures = [RetryAfter(0.01)]
+    outbox = Outbox(global_rate=1000, chat_rate=1000, chat_burst=1000, backoff=0.01)
+    # mientras se manda el primero llegan los otros; tras el freno salen todos en orden
+    messages = [(1, str(i), {"n": i}) for i in range(3)]
+    run(deliver(outbox, bot, messages))
+    assert [text for _, _, text, _ in bot.sent] == ["0", "1", "2"]
+
+
+def test_retry_gives_up():
+    bot = FakeBot()
+    bot.failures = [RetryAfter(0.001) for _ in range(3)]
+    outbox = Outbox(max_retries=2, backoff=0.001)
+    futures = run(deliver(outbox, bot, [(1, "hola", {})]))
+    assert isinstance(futures[0].exception(), RetryAfter)
+    assert bot.sent == []
+    assert outbox.stats()["failed"] == 1
+
+
+def test_other_errors_not_retried():
+    bot = FakeBot()
+    bot.failures = [ValueError("chat not found")]
+    outbox = Outbox()
+    futures = run(deliver(outbox, bot, [(1, "hola", {}), (2, "chau", {})]))
+    assert isinstance(futures[0].exception(), ValueError)
+    assert futures[1].result() is None
+    assert outbox.stats()["retries"] == 0
+
+
+def test_idle_buckets_evicted():
+    async def scenario():
+        clock = FakeClock()
+        outbox = Outbox(clock=clock)
+        outbox.start(FakeBot())
+        try:
+            await asyncio.gather(outbox.send(1, "hola"), outbox.send(2, "hola"))
+            clock.now = 1
+            await outbox.send(3, "hola")
+            assert set(outbox._chat_buckets) == {1, 2, 3}
+
+            # pasado el intervalo, los que ya se llenaron se olvidan
+            clock.now = BUCKET_EVICTION_INTERVAL + 1
+            await outbox.send(4, "hola")
+            assert set(outbox._chat_buckets) == {4}
+        finally:
+            await outbox.stop()
+
+    run(scenario())
+
+
+def test_start_twice():
+    async def scenario():
+        outbox = Outbox()
+        outbox.start(FakeBot())
+        try:
+            with pytest.raises(RuntimeError):
+                outbox.start(FakeBot())
+        finally:
+            await outbox.stop()
+
+    run(scenario())
@@ -0,0 +1,69 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the pool module."""
+
+import itertools
+import time
+
+from botggle.pool import BoardPool
+
+import pytest
+
+
+def wait_for(condition, timeout=5):
+    """Espera a que se cumpla la condición (o falla)."""
+    limit = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > limit:
+            pytest.fail("Timeout esperando la condición")
+        time.sleep(0.001)
+
+
+def test_get_when_empty_is_miss():
+    counter = itertools.count()
+    pool = BoardPool(lambda: next(counter), size=3)
+    assert pool.get() == 0
+    assert pool.get() == 1
+    assert pool.stats() == {"size": 0, "hits": 0, "misses": 2}
+
+
+def test_fill_in_background():
+    counter = itertools.count()
+    pool = BoardPool(lambda: next(counter), size=3)
+    pool.start()
+    try:
+        wait_for(lambda: len(pool) == 3)
+        assert pool.get() == 0
+        assert pool.get() == 1
+        wait_for(lambda: len(pool) == 3)
+    finally:
+        pool.stop()
+
+    assert pool.stats() == {"size": 3, "hits": 2, "misses": 0}
+    assert [pool.get() for _ in range(3)] == [2, 3, 4]
+
+
+def test_bounded():
+    counter = itertools.count()
+    pool = BoardPool(lambda: next(counter), size=2)
+    pool.start()
+    try:
+        wait_for(lambda: len(pool) == 2)
+        time.sleep(0.05)
+    finally:
+        pool.stop()
+    # dos en el pool y a lo sumo uno más generado esperando lugar
+    assert len(pool) == 2
+    assert next(counter) <= 3
+
+
+def test_start_twice():
+    pool = BoardPool(lambda: None)
+    pool.start()
+    try:
+        with pytest.raises(RuntimeError):
+            pool.start()
+    finally:
+        pool.stop()
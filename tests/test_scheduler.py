@@ -0,0 +1,185 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the scheduler module."""
+
+import asyncio
+
+from botggle.scheduler import RoundScheduler
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+async def _noop(key):
+    pass
+
+
+def _fired(scheduler):
+    fired = []
+    while not scheduler._due.empty():
+        fired.append(scheduler._due.get_nowait().key)
+    return fired
+
+
+# -- pruebas de la rueda (con un reloj falso, sin correr el loop)
+
+
+def test_schedule_and_advance():
+    async def main():
+        clock = FakeClock()
+        scheduler = RoundScheduler(_noop, tick=1, slots=8, clock=clock)
+        scheduler.schedule("tarde", 3.5)
+        scheduler.schedule("temprano", 1.5)
+        assert len(scheduler) == 2
+        assert "tarde" in scheduler
+
+        clock.now += 1.8
+        scheduler._advance(clock.now)
+        assert _fired(scheduler) == []  # el tick de 1.5 todavía no terminó
+
+        clock.now += 0.2
+        scheduler._advance(clock.now)
+        assert _fired(scheduler) == ["temprano"]
+        assert "temprano" not in scheduler
+
+        clock.now += 2
+        scheduler._advance(clock.now)
+        assert _fired(scheduler) == ["tarde"]
+        assert len(scheduler) == 0
+
+    asyncio.run(main())
+
+
+def test_beyond_one_revolution():
+    async def main():
+        clock = FakeClock()
+        scheduler = RoundScheduler(_noop, tick=1, slots=4, clock=clock)
+        scheduler.schedule("lejos", 10)
+        scheduler.schedule("cerca", 2)  # cae en el mismo casillero que "lejos"
+
+        clock.now += 3
+        scheduler._advance(clock.now)
+        assert _fired(scheduler) == ["cerca"]
+        assert "lejos" in scheduler
+
+        clock.now += 8
+        scheduler._advance(clock.now)
+        assert _fired(scheduler) == ["lejos"]
+
+    asyncio.run(main())
+
+
+def test_reschedule_and_cancel():
+    async def main():
+        clock = FakeClock()
+        scheduler = RoundScheduler(_noop, tick=1, slots=8, clock=clock)
+        scheduler.schedule("juego", 2)
+        scheduler.schedule("juego", 5)
+        assert len(scheduler) == 1
+        assert scheduler.remaining("juego") == 5
+
+        clock.now += 3
+        scheduler._advance(clock.now)
+        assert _fired(scheduler) == []
+        assert scheduler.remaining("juego") == 2
+
+        assert scheduler.cancel("juego")
+        assert not scheduler.cancel("juego")
+        assert scheduler.remaining("juego") is None
+
+        clock.now += 5
+        scheduler._advance(clock.now)
+        assert _fired(scheduler) == []
+        assert scheduler.stats() == {
+            "pending": 0, "queued": 0, "scheduled": 2, "cancelled": 1, "fired": 0,
+            "max_lag": 0}
+
+    asyncio.run(main())
+
+
+def test_schedule_in_the_past():
+    async def main():
+        clock = FakeClock()
+        scheduler = RoundScheduler(_noop, tick=1, slots=8, clock=clock)
+        scheduler.schedule("vencido", -30)
+        assert scheduler.remaining("vencido") == 0
+
+        clock.now += 1
+        scheduler._advance(clock.now)
+        assert _fired(scheduler) == ["vencido"]
+
+    asyncio.run(main())
+
+
+# -- pruebas corriendo en el loop
+
+
+def test_run_callbacks():
+    async def main():
+        calls = []
+
+        async def callback(key):
+            calls.append(key)
+
+        scheduler = RoundScheduler(callback, tick=0.01)
+        scheduler.start()
+        scheduler.schedule("tarde", 0.05)
+        scheduler.schedule("temprano", 0)
+        scheduler.schedule("cancelado", 0.02)
+        scheduler.cancel("cancelado")
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return calls, scheduler.stats()
+
+    calls, stats = asyncio.run(main())
+    assert calls == ["temprano", "tarde"]
+    assert stats["fired"] == 2
+    assert stats["pending"] == 0
+
+
+def test_slow_callback_does_not_block_others():
+    async def main():
+        calls = []
+
+        async def callback(key):
+            if key == "lento":
+                await asyncio.sleep(1)
+            calls.append(key)
+
+        scheduler = RoundScheduler(callback, tick=0.01, workers=2)
+        scheduler.start()
+        scheduler.schedule("lento", 0)
+        scheduler.schedule("rápido", 0.02)
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return calls
+
+    assert asyncio.run(main()) == ["rápido"]
+
+
+def test_callback_error_keeps_running(capsys):
+    async def main():
+        calls = []
+
+        async def callback(key):
+            calls.append(key)
+            if key == "roto":
+                raise ValueError("ups")
+
+        scheduler = RoundScheduler(callback, tick=0.01, workers=1)
+        scheduler.start()
+        scheduler.schedule("roto", 0)
+        scheduler.schedule("sano", 0.03)
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return calls
+
+    assert asyncio.run(main()) == ["roto", "sano"]
+    assert "ValueError: ups" in capsys.readouterr().err
@@ -0,0 +1,180 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the sharding module."""
+
+import asyncio
+import multiprocessing
+import queue
+
+from botggle.sharding import LoopJobQueue, PlayerIndex, QueueOutbox, ShardRouter, shard_for
+
+import pytest
+
+
+# -- pruebas del reparto
+
+
+def test_shard_for_stable():
+    # no depende del hash de Python (que cambia entre procesos), siempre da lo mismo
+    assert [shard_for(chat_id, 4) for chat_id in (-1001234567890, 1, 42)] == [1, 3, 0]
+
+
+def test_shard_for_spread():
+    shards = [shard_for(-1000000000000 - chat_id, 4) for chat_id in range(4000)]
+    assert set(shards) == {0, 1, 2, 3}
+    assert min(shards.count(shard) for shard in range(4)) > 800
+
+
+# -- pruebas del índice de jugadores
+
+
+@pytest.fixture(params=["local", "shared"])
+def index(request):
+    if request.param == "local":
+        yield PlayerIndex()
+    else:
+        with multiprocessing.Manager() as manager:
+            yield PlayerIndex.shared(manager)
+
+
+def test_index_claim(index):
+    assert index.claim(["fulane", "mengane"], 10) == set()
+    assert index.chat_for("fulane") == 10
+    assert index.chat_for("mengane") == 10
+    assert index.chat_for("zutane") is None
+
+
+def test_index_claim_conflict(index):
+    index.claim(["fulane"], 10)
+    assert index.claim(["mengane", "fulane"], 20) == {"fulane"}
+    # no se anotó a nadie
+    assert index.chat_for("mengane") is None
+    assert index.chat_for("fulane") == 10
+
+
+def test_index_claim_same_chat_again(index):
+    index.claim(["fulane"], 10)
+    assert index.claim(["fulane", "mengane"], 10) == set()
+
+
+def test_index_release(index):
+    index.claim(["fulane", "mengane"], 10)
+    index.release(["fulane", "zutane"])
+    assert index.chat_for("fulane") is None
+    assert index.chat_for("mengane") == 10
+    assert index.claim(["fulane"], 20) == set()
+
+
+def _claim_in_child(index, usernames, chat_id):
+    index.claim(usernames, chat_id)
+
+
+def test_index_shared_between_processes():
+    with multiprocessing.Manager() as manager:
+        index = PlayerIndex.shared(manager)
+        process = multiprocessing.get_context("fork").Process(
+            target=_claim_in_child, args=(index, ["fulane"], 10))
+        process.start()
+        process.join()
+        assert index.chat_for("fulane") == 10
+        assert index.claim(["fulane"], 20) == {"fulane"}
+
+
+# -- pruebas de lo que corre en los procesos hijos
+
+
+def test_queue_outbox():
+    async def main():
+        outbound = queue.Queue()
+        outbox = QueueOutbox(outbound)
+        future = outbox.send(10, "hola", parse_mode="Markdown")
+        assert future.done()
+        assert outbound.get_nowait() == (10, "hola", {"parse_mode": "Markdown"})
+        assert outbox.stats() == {"enqueued": 1}
+
+    asyncio.run(main())
+
+
+def test_loop_job_queue():
+    async def main():
+        calls = []
+
+        async def callback(context):
+            calls.append(context.job.data)
+
+        job_queue = LoopJobQueue()
+        repeating = job_queue.run_repeating(callback, 0.01, data="repite")
+        await asyncio.sleep(0.05)
+        await job_queue.stop()
+        assert repeating.cancelled()
+        return calls
+
+    calls = asyncio.run(main())
+    assert len(calls) >= 2
+    assert set(calls) == {"repite"}
+
+
+# -- pruebas del router
+
+
+async def _setup_echo(shard, outbound):
+    global _SHARD, _OUTBOUND
+    _SHARD = shard
+    _OUTBOUND = outbound
+
+
+async def _handle_echo(message):
+    _OUTBOUND.put((_SHARD, message))
+
+
+async def _handle_slow(message):
+    await asyncio.sleep(0.05)
+    _OUTBOUND.put((_SHARD, message))
+
+
+async def _teardown_echo(shard):
+    _OUTBOUND.put((shard, "chau"))
+
+
+def test_router_routes_by_chat():
+    router = ShardRouter(3, _setup_echo, _handle_echo)
+    router.start()
+    try:
+        chat_ids = list(range(30))
+        for chat_id in chat_ids:
+            router.route(chat_id, chat_id)
+        received = dict(router.outbound.get(timeout=10)[::-1] for _ in chat_ids)
+    finally:
+        router.stop()
+
+    assert received == {chat_id: shard_for(chat_id, 3) for chat_id in chat_ids}
+
+
+def test_router_teardown():
+    # al frenar, cada hijo termina lo que tiene en curso y recién después corre el teardown
+    router = ShardRouter(2, _setup_echo, _handle_slow, _teardown_echo)
+    router.start()
+    router.route(0, "hola")
+    router.stop()
+
+    received = [router.outbound.get(timeout=10) for _ in range(3)]
+    shard = shard_for(0, 2)
+    assert received.index((shard, "hola")) < received.index((shard, "chau"))
+    assert (1 - shard, "chau") in received
+
+
+def test_router_started_twice():
+    router = ShardRouter(1, _setup_echo, _handle_echo)
+    router.start()
+    try:
+        with pytest.raises(RuntimeError):
+            router.start()
+    finally:
+        router.stop()
+
+
+def test_router_no_shards():
+    with pytest.raises(ValueError):
+        ShardRouter(0, _setup_echo, _handle_echo)
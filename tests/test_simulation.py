@@ -0,0 +1,99 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the simulation module."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from botggle.board import Board, DICES_BY_SIZE  # NOQA: E402
+from botggle.dictionary import Dictionary  # NOQA: E402
+from botggle.simulation import BatchSolver, DiceSet, analyze, simulate  # NOQA: E402
+
+WORDS = [
+    "a", "al", "ala", "bola", "casa", "cosa", "chal", "esa", "ese", "oso", "sal", "sol", "queso",
+    "tos", "pato", "taco", "oca", "ocho", "pesa", "sopa", "mate", "tema", "meta", "asa",
+]
+
+
+@pytest.mark.parametrize("size", sorted(DICES_BY_SIZE))
+def test_roll_uses_every_dice_once(size):
+    dice_set = DiceSet(size)
+    boards = dice_set.roll(50, np.random.default_rng(7))
+    assert boards.shape == (50, size * size)
+    for board in boards:
+        faces = [dice_set.faces[face] for face in board]
+        # ninguna cara puede salir más veces que la cantidad de dados que la tienen
+        for face in set(faces):
+            dices_with_face = sum(1 for dice in DICES_BY_SIZE[size] if face in dice)
+            assert faces.count(face) <= dices_with_face
+
+
+def test_distribution_shape():
+    dice_set = DiceSet(5)
+    board = dice_set.roll(1, np.random.default_rng(1))[0]
+    distribution = dice_set.distribution(board)
+    assert len(distribution) == 5
+    assert all(len(row) == 5 for row in distribution)
+
+
+@pytest.mark.parametrize("size", sorted(DICES_BY_SIZE))
+def test_batch_solver_matches_board(size):
+    dictionary = Dictionary.from_words(WORDS)
+    words = list(dictionary)
+    dice_set = DiceSet(size)
+    solver = BatchSolver(dice_set, dictionary)
+    boards = dice_set.roll(200, np.random.default_rng(size))
+
+    found_boards, found_words, found_lengths = solver.solve(boards)
+    for index, board in enumerate(boards):
+        expected = set(Board(distribution=dice_set.distribution(board)).solve(dictionary))
+        mask = found_boards == index
+        assert {words[word] for word in found_words[mask]} == expected
+        assert sorted(found_lengths[mask]) == sorted(len(word) for word in expected)
+
+
+def test_batch_solver_first_dice_rule():
+    dictionary = Dictionary.from_words(["oso", "chach", "cha"])
+    dice_set = DiceSet(4)
+    distribution = [
+        ["o", "s", "x", "x"],
+        ["ch", "a", "x", "x"],
+        ["x", "x", "x", "x"],
+        ["x", "x", "x", "x"],
+    ]
+    index = {face: i for i, face in enumerate(dice_set.faces)}
+    boards = np.array([[index[face] for row in distribution for face in row]])
+
+    found_boards, found_words, found_lengths = BatchSolver(dice_set, dictionary).solve(boards)
+    assert sorted(list(dictionary)[word] for word in found_words) == ["cha", "oso"]
+
+
+def test_analyze():
+    dictionary = Dictionary.from_words(WORDS)
+    dice_set = DiceSet(4)
+    solver = BatchSolver(dice_set, dictionary)
+    boards = dice_set.roll(30, np.random.default_rng(3))
+
+    stats = analyze(boards, dice_set, solver)
+    assert stats.boards == 30
+    assert stats.face_histogram.sum() == 30 * 16
+    # 42 pares de vecinos en un 4x4, contados en los dos sentidos
+    assert stats.pair_counts.sum() == 30 * 42 * 2
+    assert (stats.pair_counts == stats.pair_counts.T).all()
+
+    for index, board in enumerate(boards):
+        solution = Board(distribution=dice_set.distribution(board)).solve(dictionary)
+        playable = [word for word in solution if len(word) >= 3]
+        assert stats.words[index] == len(playable)
+
+
+def test_simulate_reproducible():
+    stats_1, speed = simulate(1200, size=4, workers=1, seed=42)
+    stats_2, _ = simulate(1200, size=4, workers=1, seed=42)
+    assert stats_1.boards == 1200
+    assert len(stats_1.words) == 1200
+    assert (stats_1.words == stats_2.words).all()
+    assert speed > 0
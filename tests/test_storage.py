@@ -0,0 +1,200 @@
+# Copyright 2021 Escuelita Python
+# License: GPL-3
+# More info: https://github.com/EscuelitaPython/botggle
+
+"""Tests for the storage module."""
+
+import sqlite3
+from types import SimpleNamespace
+
+from botggle.board import Board
+from botggle.game import Game
+from botggle.languages import ENGLISH, SPANISH
+from botggle.storage import GameStore
+
+import pytest
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = GameStore(tmp_path / "state.sqlite")
+    yield store
+    store.close()
+
+
+def _active_game():
+    game = Game("chat", board_size=5)
+    fulane = game.add_player("fulane")
+    fulane.ready = True
+    fulane.chat = SimpleNamespace(id=123)
+    game.add_player("mengane")
+    game.full_scores["fulane"] = 7
+    game.start_round(Board(size=5))
+    game.add_text("fulane", "casa cosa")
+    return game
+
+
+# -- pruebas de guardar y recuperar
+
+
+def test_empty(store):
+    assert store.load_games() == []
+
+
+def test_wal_mode(store):
+    (mode,) = store._connection.execute("PRAGMA journal_mode").fetchone()
+    assert mode == "wal"
+
+
+def test_save_and_load_active(store):
+    game = _active_game()
+    store.save_game(77, game, deadline=1234.5, chat_type="group", chat_title="juego")
+
+    (snapshot,) = store.load_games()
+    assert snapshot.chat_id == 77
+    assert snapshot.chat_type == "group"
+    assert snapshot.chat_title == "juego"
+    assert snapshot.state == "ACTIVE"
+    assert snapshot.deadline == 1234.5
+    assert snapshot.board == game.board.distribution
+    assert [(p.username, p.user_id, p.ready, p.score) for p in snapshot.players] == [
+        ("fulane", 123, True, 7), ("mengane", None, False, 0)]
+    assert snapshot.round_words == {"fulane": {"casa", "cosa"}}
+
+
+def test_restore_active(store):
+    game = _active_game()
+    store.save_game(77, game)
+
+    (snapshot,) = store.load_games()
+    restored = snapshot.restore("otro chat")
+    assert restored.chat == "otro chat"
+    assert restored.state == Game.State.ACTIVE
+    assert restored.board_size == 5
+    assert restored.board.distribution == game.board.distribution
+    assert restored.full_scores == {"fulane": 7, "mengane": 0}
+    assert [p.ready for p in restored.players] == [True, False]
+    assert restored.round_words == {"fulane": {"casa", "cosa"}}
+
+
+def test_restore_stopped_as_active(store):
+    game = _active_game()
+    game.stop_round()
+    store.save_game(77, game)
+
+    (snapshot,) = store.load_games()
+    assert snapshot.restore("chat").state == Game.State.ACTIVE
+
+
+def test_restore_waiting(store):
+    game = Game("chat")
+    game.add_player("fulane")
+    store.save_game(77, game)
+
+    (snapshot,) = store.load_games()
+    assert snapshot.board is None
+    restored = snapshot.restore("chat")
+    assert restored.state == Game.State.WAITING
+    assert restored.board is None
+    assert restored.language is SPANISH
+
+
+def test_save_between_rounds(store):
+    # después de la ronda no se vuelven a escribir sus palabras
+    game = _active_game()
+    game.stop_round()
+    game.next_round()
+    store.save_game(77, game)
+
+    (snapshot,) = store.load_games()
+    assert snapshot.state == "WAITING"
+    assert snapshot.board is None
+    assert snapshot.round_words == {}
+
+
+def test_restore_language(store):
+    game = Game("chat", language=ENGLISH)
+    game.add_player("fulane")
+    store.save_game(77, game)
+
+    (snapshot,) = store.load_games()
+    assert snapshot.language == "en"
+    assert snapshot.restore("chat").language is ENGLISH
+
+
+def test_old_database_without_language(tmp_path):
+    path = tmp_path / "state.sqlite"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE games (chat_id INTEGER PRIMARY KEY, chat_type TEXT, chat_title TEXT, "
+        "state TEXT NOT NULL, board_size INTEGER NOT NULL, board TEXT, deadline REAL)")
+    connection.execute("INSERT INTO games VALUES (77, NULL, NULL, 'WAITING', 4, NULL, NULL)")
+    connection.commit()
+    connection.close()
+
+    store = GameStore(path)
+    (snapshot,) = store.load_games()
+    assert snapshot.language is None
+    assert snapshot.restore("chat").language is SPANISH
+    store.close()
+
+
+def test_save_replaces(store):
+    game = _active_game()
+    store.save_game(77, game)
+    game.stop_round()
+    game.next_round()
+    game.players.pop()
+    store.save_game(77, game)
+
+    (snapshot,) = store.load_games()
+    assert snapshot.state == "WAITING"
+    assert [p.username for p in snapshot.players] == ["fulane"]
+
+
+def test_delete(store):
+    store.save_game(77, _active_game())
+    store.save_game(88, Game("chat"))
+    store.add_words(77, "fulane", ["perro"])
+    store.delete_game(77)
+    store.flush()
+
+    (snapshot,) = store.load_games()
+    assert snapshot.chat_id == 88
+    assert snapshot.round_words == {}
+
+
+# -- pruebas de las palabras (que se escriben en lote)
+
+
+def test_words_buffered_until_flush(store):
+    store.save_game(77, _active_game())
+    store.add_words(77, "mengane", ["perro", "gato"])
+    (snapshot,) = store.load_games()
+    assert "mengane" not in snapshot.round_words
+
+    store.flush()
+    (snapshot,) = store.load_games()
+    assert snapshot.round_words["mengane"] == {"perro", "gato"}
+
+
+def test_words_repeated(store):
+    store.save_game(77, _active_game())
+    store.add_words(77, "fulane", ["casa", "perro"])
+    store.add_words(77, "fulane", ["perro"])
+    store.flush()
+    (snapshot,) = store.load_games()
+    assert snapshot.round_words["fulane"] == {"casa", "cosa", "perro"}
+
+
+def test_close_flushes(tmp_path):
+    path = tmp_path / "state.sqlite"
+    store = GameStore(path)
+    store.save_game(77, _active_game())
+    store.add_words(77, "mengane", ["perro"])
+    store.close()
+
+    store = GameStore(path)
+    (snapshot,) = store.load_games()
+    assert snapshot.round_words["mengane"] == {"perro"}
+    store.close()